@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'djangoproject.settings')
+# Serve /graphql with the async view, which runs each request in its own executor thread
+os.environ.setdefault('GRAPHQL_ASYNC', '1')
 
 application = get_asgi_application()
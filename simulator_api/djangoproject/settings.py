@@ -92,6 +92,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'djangoproject.wsgi.application'
+ASGI_APPLICATION = 'djangoproject.asgi.application'
 
 
 # Database
@@ -158,3 +159,58 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Number of worker processes a simulator run fans its datasets out to
+SIMULATOR_WORKERS = int(os.environ.get('SIMULATOR_WORKERS', os.cpu_count() or 1))
+
+# Connection and delivery settings of the kafka producer
+SIMULATOR_KAFKA = {
+    'bootstrap_servers': os.environ.get('KAFKA_BOOTSTRAP_SERVERS', 'localhost:9092'),
+    'topic': os.environ.get('KAFKA_TOPIC', 'simulator'),
+    'schema': os.environ.get('KAFKA_SCHEMA', 'json'),  # 'json', 'avro' or 'msgpack'
+    'linger_ms': 20,
+    'batch_size': 64 * 1024,
+    'compression_type': 'gzip',
+    'max_in_flight': 10000,
+    # Seconds a producer waits for its records to be acknowledged when closing
+    'delivery_timeout': float(os.environ.get('KAFKA_DELIVERY_TIMEOUT', 120.0)),
+}
+
+# Least number of seconds between two saves of the progress of a running simulator
+SIMULATOR_PROGRESS_INTERVAL = float(os.environ.get('SIMULATOR_PROGRESS_INTERVAL', 1.0))
+
+# Least number of seconds between two checks of whether a running simulator was stopped
+SIMULATOR_CANCEL_INTERVAL = float(os.environ.get('SIMULATOR_CANCEL_INTERVAL', 1.0))
+
+# Worker pool and queue of the simulator runs, see the run_simulator_workers command
+SIMULATOR_QUEUE = {
+    'concurrency': int(os.environ.get('SIMULATOR_QUEUE_CONCURRENCY', 2)),
+    # Runs are refused with 429 Too Many Requests once this many are waiting
+    'max_depth': int(os.environ.get('SIMULATOR_QUEUE_MAX_DEPTH', 1000)),
+    'poll_interval': float(os.environ.get('SIMULATOR_QUEUE_POLL_INTERVAL', 0.1)),
+}
+
+# Location and size bound of the cache of seeded dataset outputs, linked to the output path instead of generated.
+# It is relative like the 'sample_datasets/' output, so the hardlinks stay on one file system; 0 disables it
+SIMULATOR_RESULT_CACHE = {
+    'root': os.environ.get('SIMULATOR_RESULT_CACHE_ROOT', 'result_cache'),
+    'max_bytes': int(os.environ.get('SIMULATOR_RESULT_CACHE_MAX_BYTES', 10 * 1024 ** 3)),
+}
+
+# Location and chunk size of the chunk store the 'store' producer writes to
+SIMULATOR_STORE = {
+    'root': os.environ.get('SIMULATOR_STORE_ROOT', str(BASE_DIR / 'series_store')),
+    'chunk_points': int(os.environ.get('SIMULATOR_STORE_CHUNK_POINTS', 100000)),
+}
+
+# Limits and caches of the /graphql endpoint
+GRAPHQL_LIMITS = {
+    'max_depth': int(os.environ.get('GRAPHQL_MAX_DEPTH', 10)),
+    'max_cost': int(os.environ.get('GRAPHQL_MAX_COST', 20000)),
+    # Assumed number of rows of a list field without a first or last argument
+    'list_cost': int(os.environ.get('GRAPHQL_LIST_COST', 10)),
+    'document_cache_size': int(os.environ.get('GRAPHQL_DOCUMENT_CACHE_SIZE', 1000)),
+}
+
+# Whether /graphql is served by the async view, set by the ASGI entry point
+GRAPHQL_ASYNC = os.environ.get('GRAPHQL_ASYNC', '0') == '1'
@@ -1,41 +1,85 @@
-import json
+"""
+The Airflow DAG running every simulator on its interval of days.
+
+Parsing this file does no database or simulation work, so the scheduler parses it in the same time
+whatever the number of simulators. Each daily run fetches the simulators due that day in a task,
+and runs them in task instances mapped over batches of their IDs.
+"""
 import os
-import django
-os.environ.setdefault("DJANGO_SETTINGS_MODULE", "djangoproject.settings")
+from datetime import datetime
+
+from airflow.decorators import dag, task
+from airflow.exceptions import AirflowException
+
+# The day the intervals of the simulators are counted from
+START_DATE = datetime(2023, 11, 14)
+
+# The number of simulators a mapped task runs one after the other
+BATCH_SIZE = int(os.environ.get('SIMULATOR_AIRFLOW_BATCH_SIZE', 50))
+
+# The most mapped tasks of a run, below the default max_map_length of 1024 of Airflow
+MAX_BATCHES = int(os.environ.get('SIMULATOR_AIRFLOW_MAX_BATCHES', 1000))
+
+
+def setup_django():
+    import django
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "djangoproject.settings")
+    # Only in a running task, never while the file is parsed
+    django.setup()
+
+
+def split_batches(simulator_ids, batch_size=BATCH_SIZE, max_batches=MAX_BATCHES):
+    """
+    Split simulator IDs into batches, larger than batch_size when needed to stay within max_batches.
+
+    Returns:
+        list: The batches of IDs.
+    """
+    batch_size = max(batch_size, -(-len(simulator_ids) // max_batches))
+    return [simulator_ids[start:start + batch_size] for start in range(0, len(simulator_ids), batch_size)]
 
-# Initialize Django
-django.setup()
-from airflow.models import DAG
-from airflow.operators.python import PythonOperator
-from datetime import datetime, timedelta
-from simulator_api.models import *
-from simulator_api.timeseries.simulator import simulate_simulator
-from django.core.serializers import serialize
 
+@dag(dag_id='simulators', schedule='@daily', start_date=START_DATE, catchup=False, max_active_runs=1,
+     default_args={'owner': 'airflow'})
+def simulators():
+    @task
+    def due_simulators(data_interval_start=None):
+        """
+        Get the IDs of the simulators due on the day of the run, in batches.
 
-# Get all objects from the model
-all_simulators = Simulator.objects.all()
+        Returns:
+            list: The batches of simulator IDs, one mapped run task each.
+        """
+        setup_django()
+        from simulator_api.timeseries.simulator import scheduled_simulator_ids
+        return split_batches(scheduled_simulator_ids((data_interval_start.date() - START_DATE.date()).days))
 
-for row in all_simulators:
+    @task
+    def run(simulator_ids):
+        """
+        Run a batch of simulators in the task's process, failing the task when any run fails.
 
-    dag_id = f"dynamic_dag_{row['pk']}"  # Unique DAG ID for each row
-    simulate_simulator(row.id)
-    default_args = {
-            'owner': 'airflow',
-            'start_date': datetime(2023, 11, 14),
-            # Add other args as needed
-         }
+        Every simulator of the batch is run, so one failure does not hold back the others.
 
-    with DAG(dag_id=dag_id,
-        default_args=default_args,
-        schedule_interval=timedelta(days=row.interval),
-        catchup=False) as dag:
+        Returns:
+            dict: The status each run ended with, by simulator ID.
+        """
+        setup_django()
+        from django.utils import timezone
+        from simulator_api.models import Simulator
+        from simulator_api.timeseries.simulator import run_simulator
+        statuses = {}
+        for simulator_id in simulator_ids:
+            # Marked running like a queued run, so it can be stopped from the API
+            Simulator.objects.filter(id=simulator_id).update(status='Running', process_id=os.getpid(),
+                                                             updated_at=timezone.now())
+            statuses[simulator_id] = run_simulator(simulator_id)
+        failed = [simulator_id for simulator_id, status in statuses.items() if status == 'Failed']
+        if failed:
+            raise AirflowException(f'Simulators {failed} failed')
+        return statuses
 
+    run.expand(simulator_ids=due_simulators())
 
-        run_simulator = PythonOperator(
-            task_id='create_dag_for_each_row',
-            python_callable=simulate_simulator,
-            op_args=[row['pk']],
-            dag=dag)
-        run_simulator
 
+simulators()
@@ -0,0 +1,489 @@
+import hashlib
+import json
+import threading
+from collections import Counter, OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, connection, connections, transaction
+from django.http import HttpResponseNotAllowed
+from django.http.response import HttpResponseBadRequest
+from graphene.relay import Connection
+from graphene_django.constants import MUTATION_ERRORS_FLAG
+from graphene_django.settings import graphene_settings
+from graphene_django.views import GraphQLView, HttpError
+from graphql import ExecutionResult, GraphQLError, OperationType, execute, get_operation_ast, parse, specified_rules, \
+    validate_schema
+from graphql.language import FieldNode, FragmentDefinitionNode, FragmentSpreadNode, InlineFragmentNode, \
+    IntValueNode, VariableNode
+from graphql.type import GraphQLList, get_named_type, get_nullable_type
+from graphql.validation import ValidationRule, validate
+
+from simulator_api.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+
+PERSISTED_QUERY_PREFIX = 'graphql-persisted-query:'
+
+# The metrics counter of each complexity rejection code
+REJECTION_COUNTERS = {
+    'MAX_DEPTH_EXCEEDED': 'rejected_depth',
+    'MAX_COST_EXCEEDED': 'rejected_cost',
+}
+
+
+class GraphQLMetrics:
+    """
+    Process-wide counters of the /graphql endpoint.
+
+    Methods:
+        increment(name): Add one to a counter.
+        snapshot(): Get every counter.
+    """
+
+    def __init__(self):
+        self.counters = Counter()
+        self.lock = threading.Lock()
+
+    def increment(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    def snapshot(self):
+        """
+        Get every counter.
+
+        Returns:
+            dict: The value of each counter.
+        """
+        with self.lock:
+            return dict(self.counters)
+
+    def clear(self):
+        with self.lock:
+            self.counters.clear()
+
+
+graphql_metrics = GraphQLMetrics()
+
+
+def _argument_size(node, name, sizes):
+    """
+    Get the value of a page size argument, a variable counting as its value in sizes or the default page.
+
+    Returns:
+        int: The page size, or None when the argument is not given.
+    """
+    for argument in node.arguments:
+        if argument.name.value != name:
+            continue
+        if isinstance(argument.value, IntValueNode):
+            return int(argument.value.value)
+        if isinstance(argument.value, VariableNode):
+            return sizes.get(argument.value.name.value, DEFAULT_PAGE_SIZE)
+        return MAX_PAGE_SIZE
+    return None
+
+
+def _is_connection(graphql_type):
+    graphene_type = getattr(graphql_type, 'graphene_type', None)
+    return isinstance(graphene_type, type) and issubclass(graphene_type, Connection)
+
+
+def _variable_sizes(operation, variables=None):
+    """
+    Get the page size each variable of an operation stands for: its value, else its default.
+
+    A variable without a value or default is left out, and counts as the default page size.
+
+    Returns:
+        dict: The integer value of each variable.
+    """
+    variables = variables or {}
+    sizes = {}
+    for definition in operation.variable_definitions or []:
+        name = definition.variable.name.value
+        if name in variables:
+            value = variables[name]
+            if isinstance(value, int) and not isinstance(value, bool):
+                sizes[name] = value
+        elif isinstance(definition.default_value, IntValueNode):
+            sizes[name] = int(definition.default_value.value)
+    return sizes
+
+
+def _cost_error(cost, max_cost, node=None):
+    return GraphQLError(f'Query cost {cost} exceeds the maximum cost of {max_cost}', node,
+                        extensions={'code': 'MAX_COST_EXCEEDED'})
+
+
+class OperationComplexity:
+    """
+    Measure the depth and cost of an operation.
+
+    Every field costs 1, and the cost of the fields selected under a list is multiplied by the
+    number of rows the list can return: its first or last argument, the default page size for a
+    connection, or list_cost for a plain list. The edges of a connection are not multiplied again.
+
+    Each fragment is measured once however often it is spread, and a selection set stops being
+    measured as soon as it passes max_depth or max_cost, so measuring takes time linear in the size
+    of the document. A measure past a limit is then only a lower bound of the real one.
+
+    Args:
+        schema (GraphQLSchema): The schema of the operation.
+        document (DocumentNode): The document holding the operation and its fragments.
+        sizes (dict): The page size each variable stands for, see _variable_sizes().
+        list_cost (int): The number of rows assumed for a list without a page size.
+        max_depth (int): The depth past which measuring stops, None for no limit.
+        max_cost (int): The cost past which measuring stops, None for no limit.
+
+    Methods:
+        measure_operation(node): Get the depth and cost of an operation.
+    """
+
+    def __init__(self, schema, document, sizes, list_cost, max_depth=None, max_cost=None):
+        self.schema = schema
+        self.fragments = {definition.name.value: definition for definition in document.definitions
+                          if isinstance(definition, FragmentDefinitionNode)}
+        self.sizes = sizes
+        self.list_cost = list_cost
+        self.max_depth = float('inf') if max_depth is None else max_depth
+        self.max_cost = float('inf') if max_cost is None else max_cost
+        # The depth and cost of each fragment measured so far
+        self.fragment_measures = {}
+
+    def measure_operation(self, node):
+        """
+        Get the depth and cost of an operation.
+
+        Returns:
+            tuple: The depth and the cost, None when the schema has no root type for the operation.
+        """
+        root_type = {
+            OperationType.QUERY: self.schema.query_type,
+            OperationType.MUTATION: self.schema.mutation_type,
+            OperationType.SUBSCRIPTION: self.schema.subscription_type,
+        }[node.operation]
+        if root_type is None:
+            return None
+        return self.measure(node.selection_set, root_type, set())
+
+    def measure(self, selection_set, parent_type, fragments):
+        """
+        Measure the depth and cost of a selection set.
+
+        Returns:
+            tuple: The depth and the cost.
+        """
+        depth, cost = 0, 0
+        for selection in selection_set.selections:
+            if isinstance(selection, FragmentSpreadNode):
+                name = selection.name.value
+                fragment = self.fragments.get(name)
+                # Unknown and cyclic fragments are reported by the standard rules
+                if fragment is None or name in fragments:
+                    continue
+                if name not in self.fragment_measures:
+                    fragment_type = self.schema.get_type(fragment.type_condition.name.value)
+                    self.fragment_measures[name] = self.measure(fragment.selection_set, fragment_type or parent_type,
+                                                                fragments | {name})
+                child_depth, child_cost = self.fragment_measures[name]
+            elif isinstance(selection, InlineFragmentNode):
+                fragment_type = (self.schema.get_type(selection.type_condition.name.value)
+                                 if selection.type_condition else None)
+                child_depth, child_cost = self.measure(selection.selection_set, fragment_type or parent_type,
+                                                       fragments)
+            elif isinstance(selection, FieldNode):
+                child_depth, child_cost = self.measure_field(selection, parent_type, fragments)
+            else:
+                continue
+            depth, cost = max(depth, child_depth), cost + child_cost
+            if depth > self.max_depth or cost > self.max_cost:
+                break
+        return depth, cost
+
+    def measure_field(self, node, parent_type, fragments):
+        fields = getattr(parent_type, 'fields', {})
+        if node.name.value.startswith('__') or node.name.value not in fields:
+            return 0, 0
+        field = fields[node.name.value]
+        if node.selection_set is None:
+            return 1, 1
+        child_type = get_named_type(field.type)
+        child_depth, child_cost = self.measure(node.selection_set, child_type, fragments)
+        rows = _argument_size(node, 'first', self.sizes)
+        if rows is None:
+            rows = _argument_size(node, 'last', self.sizes)
+        if rows is None and _is_connection(child_type):
+            rows = DEFAULT_PAGE_SIZE
+        if rows is None:
+            is_list = isinstance(get_nullable_type(field.type), GraphQLList)
+            rows = self.list_cost if is_list and not _is_connection(parent_type) else 1
+        return child_depth + 1, 1 + rows * child_cost
+
+
+def complexity_rule(max_depth, max_cost, list_cost):
+    """
+    Create a validation rule rejecting operations nested deeper than max_depth or costing more than max_cost.
+
+    The cost is measured by OperationComplexity. A page size given by a variable counts as the
+    variable's default, or the default page size, since validation only sees the document and is
+    cached with it. The values of the variables are checked against max_cost when executing.
+
+    Args:
+        max_depth (int): The deepest nesting of fields allowed.
+        max_cost (int): The highest cost allowed.
+        list_cost (int): The number of rows assumed for a list without a page size.
+
+    Returns:
+        type: The ValidationRule class.
+    """
+
+    class ComplexityRule(ValidationRule):
+        def enter_operation_definition(self, node, *args):
+            complexity = OperationComplexity(self.context.schema, self.context.document, _variable_sizes(node),
+                                             list_cost, max_depth, max_cost)
+            measured = complexity.measure_operation(node)
+            if measured is None:
+                return
+            depth, cost = measured
+            if depth > max_depth:
+                self.report_error(GraphQLError(f'Query depth {depth} exceeds the maximum depth of {max_depth}',
+                                               node, extensions={'code': 'MAX_DEPTH_EXCEEDED'}))
+            if cost > max_cost:
+                self.report_error(_cost_error(cost, max_cost, node))
+
+    return ComplexityRule
+
+
+class DocumentCache:
+    """
+    A process-wide LRU cache of parsed and validated GraphQL documents, keyed by the query text.
+
+    Validation only depends on the document, the schema and the rules, so a cached document's
+    validation errors are reused too.
+
+    Args:
+        max_size (int): The number of documents above which the least recently used is evicted.
+
+    Methods:
+        get(query, schema, rules): Get the parsed document and its validation errors.
+        clear(): Drop every document.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.documents = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, query, schema, rules):
+        """
+        Get the parsed document of a query and its validation errors, parsing and validating on a miss.
+
+        Raises:
+            GraphQLError: When the query does not parse.
+
+        Returns:
+            tuple: The document and the list of validation errors.
+        """
+        with self.lock:
+            entry = self.documents.get(query)
+            if entry is not None:
+                self.documents.move_to_end(query)
+                graphql_metrics.increment('document_cache_hits')
+                return entry
+        graphql_metrics.increment('document_cache_misses')
+        document = parse(query)
+        errors = validate(schema, document, rules, graphene_settings.MAX_VALIDATION_ERRORS)
+        with self.lock:
+            self.documents[query] = (document, errors)
+            while len(self.documents) > self.max_size:
+                self.documents.popitem(last=False)
+        return document, errors
+
+    def clear(self):
+        with self.lock:
+            self.documents.clear()
+
+
+document_cache = DocumentCache(settings.GRAPHQL_LIMITS['document_cache_size'])
+
+
+def _extensions(request, data):
+    extensions = request.GET.get('extensions') or data.get('extensions')
+    if isinstance(extensions, str):
+        try:
+            extensions = json.loads(extensions)
+        except ValueError:
+            raise HttpError(HttpResponseBadRequest('Extensions are invalid JSON.'))
+    if extensions and not isinstance(extensions, dict):
+        raise HttpError(HttpResponseBadRequest('Extensions must be a JSON object.'))
+    return extensions or {}
+
+
+class CachedGraphQLView(GraphQLView):
+    """
+    A GraphQL view reusing validated documents, accepting persisted queries and limiting query complexity.
+
+    - Parsed and validated documents are kept in an LRU cache keyed by the query text, and the
+      cached document is executed, so a query seen before is neither parsed nor validated again.
+      GraphQLView only answers requests without a query or against an invalid schema.
+    - Automatic persisted queries: a client can send the sha256 hash of a query in
+      extensions.persistedQuery.sha256Hash instead of the query. An unknown hash answers
+      PersistedQueryNotFound, and the client then sends the query and hash together to register it.
+    - Operations deeper or costlier than settings.GRAPHQL_LIMITS allow are rejected before execution.
+      Page sizes given by variables are costed again with the values of the request.
+
+    Rejections, cache hits and persisted query hits are counted in graphql_metrics.
+
+    Methods:
+        get_validation_rules(): Get the rules the cached documents are validated with.
+        persisted_query(request, data, query): Resolve the query of a request that may be sent as a hash.
+        execute_document(request, document, variables, operation_name, show_graphiql): Execute a validated document.
+    """
+
+    def get_validation_rules(self):
+        """
+        Get the rules the cached documents are validated with: the specified rules, the rules the view
+        was created with and the complexity limits.
+
+        Returns:
+            list: The ValidationRule classes.
+        """
+        limits = settings.GRAPHQL_LIMITS
+        return list(specified_rules) + list(self.validation_rules or []) + [
+            complexity_rule(limits['max_depth'], limits['max_cost'], limits['list_cost'])]
+
+    def persisted_query(self, request, data, query):
+        """
+        Resolve the query of a request that may be sent as a persisted query hash.
+
+        Raises:
+            HttpError: When the extensions or the persisted query are malformed.
+
+        Returns:
+            tuple: The query, and the error to answer with when the hash is unknown or does not match.
+        """
+        persisted = _extensions(request, data).get('persistedQuery')
+        if not persisted:
+            return query, None
+        if not isinstance(persisted, dict) or not isinstance(persisted.get('sha256Hash'), str):
+            raise HttpError(HttpResponseBadRequest('persistedQuery must be a JSON object with a sha256Hash string.'))
+        query_hash = persisted['sha256Hash']
+        if not query:
+            query = cache.get(PERSISTED_QUERY_PREFIX + query_hash)
+            if query is None:
+                graphql_metrics.increment('persisted_query_misses')
+                return None, GraphQLError('PersistedQueryNotFound', extensions={'code': 'PERSISTED_QUERY_NOT_FOUND'})
+            graphql_metrics.increment('persisted_query_hits')
+            return query, None
+        if hashlib.sha256(query.encode('utf-8')).hexdigest() != query_hash:
+            return None, GraphQLError('provided sha does not match query', extensions={'code': 'INVALID_HASH'})
+        cache.set(PERSISTED_QUERY_PREFIX + query_hash, query, None)
+        graphql_metrics.increment('persisted_query_registrations')
+        return query, None
+
+    def execute_graphql_request(self, request, data, query, variables, operation_name, show_graphiql=False):
+        graphql_metrics.increment('requests')
+        query, error = self.persisted_query(request, data, query)
+        if error is not None:
+            return ExecutionResult(data=None, errors=[error])
+        schema = self.schema.graphql_schema
+        # A missing query and an invalid schema are answered by GraphQLView
+        if query and not validate_schema(schema):
+            try:
+                document, validation_errors = document_cache.get(query, schema, self.get_validation_rules())
+            except GraphQLError as e:
+                return ExecutionResult(errors=[e])
+            if not validation_errors and variables:
+                validation_errors = self.variables_errors(schema, document, variables, operation_name)
+            if validation_errors:
+                for validation_error in validation_errors:
+                    code = (validation_error.extensions or {}).get('code')
+                    if code in REJECTION_COUNTERS:
+                        graphql_metrics.increment(REJECTION_COUNTERS[code])
+                return ExecutionResult(data=None, errors=validation_errors)
+            return self.execute_document(request, document, variables, operation_name, show_graphiql)
+        return super().execute_graphql_request(request, data, query, variables, operation_name, show_graphiql)
+
+    def execute_document(self, request, document, variables, operation_name, show_graphiql=False):
+        """
+        Execute a parsed and validated document, the way GraphQLView.execute_graphql_request() executes
+        the document it parses: only queries from a GET request, and mutations in a transaction rolled
+        back on errors when ATOMIC_MUTATIONS is set.
+
+        Raises:
+            HttpError: When a GET request asks for another operation than a query.
+
+        Returns:
+            ExecutionResult: The result, None to show GraphiQL instead.
+        """
+        operation_ast = get_operation_ast(document, operation_name)
+        if (request.method.lower() == 'get' and operation_ast is not None
+                and operation_ast.operation != OperationType.QUERY):
+            if show_graphiql:
+                return None
+            raise HttpError(HttpResponseNotAllowed(
+                ['POST'], f'Can only perform a {operation_ast.operation.value} operation from a POST request.'))
+        try:
+            execute_options = {
+                'root_value': self.get_root_value(request),
+                'context_value': self.get_context(request),
+                'variable_values': variables,
+                'operation_name': operation_name,
+                'middleware': self.get_middleware(request),
+            }
+            if self.execution_context_class:
+                execute_options['execution_context_class'] = self.execution_context_class
+            schema = self.schema.graphql_schema
+            if (operation_ast is not None and operation_ast.operation == OperationType.MUTATION
+                    and (graphene_settings.ATOMIC_MUTATIONS is True
+                         or connection.settings_dict.get('ATOMIC_MUTATIONS', False) is True)):
+                with transaction.atomic():
+                    result = execute(schema, document, **execute_options)
+                    if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
+                        transaction.set_rollback(True)
+                return result
+            return execute(schema, document, **execute_options)
+        except Exception as e:
+            return ExecutionResult(errors=[e])
+
+    @staticmethod
+    def variables_errors(schema, document, variables, operation_name):
+        """
+        Cost the operation again with the page sizes its variables are given.
+
+        Returns:
+            list: The cost error, empty when the operation fits in the maximum cost.
+        """
+        operation = get_operation_ast(document, operation_name)
+        if operation is None or not operation.variable_definitions or not isinstance(variables, dict):
+            return []
+        limits = settings.GRAPHQL_LIMITS
+        measured = OperationComplexity(schema, document, _variable_sizes(operation, variables),
+                                       limits['list_cost'], max_cost=limits['max_cost']).measure_operation(operation)
+        if measured is None or measured[1] <= limits['max_cost']:
+            return []
+        return [_cost_error(measured[1], limits['max_cost'], operation)]
+
+
+class AsyncCachedGraphQLView(CachedGraphQLView):
+    """
+    An async CachedGraphQLView for ASGI deployments.
+
+    The resolvers use the synchronous ORM, so each request is handled in a thread of the default
+    executor instead of the single thread Django runs sync views in under ASGI. Concurrent GraphQL
+    requests then run in parallel and the event loop stays free for the other async views. Each
+    executor thread opens its own database connection, closed when the request ends.
+    """
+    view_is_async = True
+
+    def _dispatch(self, request, *args, **kwargs):
+        close_old_connections()
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            # Outside of the request thread Django does not close the connection on request_finished
+            connections.close_all()
+
+    async def dispatch(self, request, *args, **kwargs):
+        return await sync_to_async(self._dispatch, thread_sensitive=False)(request, *args, **kwargs)
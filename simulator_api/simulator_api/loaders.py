@@ -0,0 +1,227 @@
+from simulator_api.models import Simulator, Dataset, Seasonality, SimulatorProgress
+
+
+class Loader:
+    """
+    A base class for per-request loaders batching the related rows GraphQL resolvers ask for.
+
+    GraphQL resolves a field once per parent row, so loading each relation on its own costs one
+    query per row. A loader instead collects the keys of every row the request has seen so far
+    (primed by the resolvers returning those rows) and fetches all of them in one query the first
+    time any of them is asked for. The rows are cached for the rest of the request.
+
+    Args:
+        loaders (Loaders): The request's loaders, primed with the rows this loader fetches.
+
+    Methods:
+        prime(rows): Register the keys of rows the request has returned.
+        load(key): Get the row or rows of a key, fetching every registered key at once.
+    """
+
+    def __init__(self, loaders):
+        self.loaders = loaders
+        self.pending = set()
+        self.cache = {}
+
+    def keys(self, rows):
+        """
+        Get the keys this loader should fetch for rows returned to the request.
+
+        Returns:
+            list: The keys.
+        """
+        return []
+
+    def fetch(self, keys):
+        """
+        Fetch the rows of keys in one query.
+
+        Returns:
+            dict: The rows of each key.
+        """
+        return {}
+
+    def prime(self, rows):
+        self.pending.update(key for key in self.keys(rows) if key is not None and key not in self.cache)
+
+    def load(self, key):
+        if key not in self.cache:
+            self.pending.add(key)
+            keys, self.pending = self.pending, set()
+            fetched = self.fetch(keys)
+            self.cache.update(fetched)
+            # The fetched rows are returned to the request too, so their own relations can be batched
+            self.loaders.prime([row for rows in fetched.values() for row in
+                                (rows if isinstance(rows, list) else [rows]) if row is not None])
+        return self.cache[key]
+
+
+class ObjectLoader(Loader):
+    """
+    A loader of rows by primary key, for forward foreign key lookups.
+
+    Args:
+        loaders (Loaders): The request's loaders.
+        model (Model): The model of the rows.
+        foreign_keys (list): The (model, field) foreign keys pointing to the model.
+    """
+
+    def __init__(self, loaders, model, foreign_keys):
+        super().__init__(loaders)
+        self.model = model
+        self.foreign_keys = [(source, source._meta.get_field(field).attname) for source, field in foreign_keys]
+
+    def keys(self, rows):
+        keys = []
+        for row in rows:
+            if isinstance(row, self.model) and not row.get_deferred_fields():
+                # The row itself is already loaded, so a lookup of it needs no query. Rows read with only()
+                # are not reused, reading one of their deferred columns would cost a query per row
+                self.cache[row.pk] = row
+            for source, attname in self.foreign_keys:
+                if isinstance(row, source):
+                    keys.append(getattr(row, attname))
+        return keys
+
+    def fetch(self, keys):
+        rows = self.model.objects.in_bulk(keys)
+        return {key: rows.get(key) for key in keys}
+
+
+class RelationLoader(Loader):
+    """
+    A loader of the rows pointing to a parent row, for reverse foreign key relations.
+
+    Args:
+        loaders (Loaders): The request's loaders.
+        model (Model): The model of the rows.
+        field (str): The foreign key of the rows to their parent.
+    """
+
+    def __init__(self, loaders, model, field):
+        super().__init__(loaders)
+        self.model = model
+        self.field = field
+        self.attname = model._meta.get_field(field).attname
+        self.parent = model._meta.get_field(field).related_model
+
+    def keys(self, rows):
+        return [row.pk for row in rows if isinstance(row, self.parent)]
+
+    def fetch(self, keys):
+        fetched = {key: [] for key in keys}
+        for row in self.model.objects.filter(**{f'{self.field}__in': keys}).order_by('id'):
+            fetched[getattr(row, self.attname)].append(row)
+        return fetched
+
+
+class Loaders:
+    """
+    The loaders of one GraphQL request.
+
+    Attributes:
+        simulator (ObjectLoader): Simulators by id.
+        dataset (ObjectLoader): Datasets by id.
+        datasets (RelationLoader): The datasets of a simulator.
+        seasonalities (RelationLoader): The seasonality components of a dataset.
+        progress (RelationLoader): The progress of a simulator, in a list of at most one row.
+
+    Methods:
+        prime(rows): Register rows returned to the request with every loader.
+    """
+
+    def __init__(self):
+        self.simulator = ObjectLoader(self, Simulator, [(Dataset, 'simulator_id')])
+        self.dataset = ObjectLoader(self, Dataset, [(Seasonality, 'dataset_id')])
+        self.datasets = RelationLoader(self, Dataset, 'simulator_id')
+        self.seasonalities = RelationLoader(self, Seasonality, 'dataset_id')
+        self.progress = RelationLoader(self, SimulatorProgress, 'simulator_id')
+
+    def prime(self, rows):
+        """
+        Register rows returned to the request with every loader.
+
+        Args:
+            rows (list): The model instances.
+
+        Returns:
+            list: The rows.
+        """
+        rows = list(rows)
+        for loader in (self.simulator, self.dataset, self.datasets, self.seasonalities, self.progress):
+            loader.prime(rows)
+        return rows
+
+
+def get_loaders(info):
+    """
+    Get the loaders of the request a GraphQL resolver runs in, creating them on first use.
+
+    Args:
+        info (ResolveInfo): The resolver info, its context is the request.
+
+    Returns:
+        Loaders: The request's loaders.
+    """
+    loaders = getattr(info.context, 'loaders', None)
+    if loaders is None:
+        loaders = Loaders()
+        info.context.loaders = loaders
+    return loaders
+
+
+def load_reverse(info, row, accessor, loader):
+    """
+    Get the rows of a reverse relation, from the optimizer's prefetch when it ran, else from a loader.
+
+    Args:
+        info (ResolveInfo): The resolver info.
+        row (Model): The parent row.
+        accessor (str): The name of the reverse relation, e.g. 'dataset_set'.
+        loader (RelationLoader): The loader of the relation.
+
+    Returns:
+        list: The related rows.
+    """
+    if accessor in getattr(row, '_prefetched_objects_cache', {}):
+        return get_loaders(info).prime(getattr(row, accessor).all())
+    return loader.load(row.pk)
+
+
+def load_forward(info, row, field, loader):
+    """
+    Get the row a foreign key points to, from the optimizer's join when it ran, else from a loader.
+
+    Args:
+        info (ResolveInfo): The resolver info.
+        row (Model): The row holding the foreign key.
+        field (str): The name of the foreign key, e.g. 'simulator_id'.
+        loader (ObjectLoader): The loader of the related model.
+
+    Returns:
+        Model: The related row.
+    """
+    foreign_key = row._meta.get_field(field)
+    if foreign_key.is_cached(row):
+        return getattr(row, field)
+    return loader.load(getattr(row, foreign_key.attname))
+
+
+def load_one(info, row, accessor, loader):
+    """
+    Get the row of a reverse one-to-one relation, from the optimizer's prefetch when it ran, else from a loader.
+
+    Args:
+        info (ResolveInfo): The resolver info.
+        row (Model): The parent row.
+        accessor (str): The name of the reverse relation, e.g. 'progress'.
+        loader (RelationLoader): The loader of the relation.
+
+    Returns:
+        Model: The related row, or None when there is none.
+    """
+    relation = row._meta.get_field(accessor)
+    if relation.is_cached(row):
+        return relation.get_cached_value(row)
+    rows = loader.load(row.pk)
+    return rows[0] if rows else None
@@ -0,0 +1,22 @@
+import asyncio
+
+from django.core.management.base import BaseCommand
+
+from simulator_api.timeseries.realtime import serve_realtime_simulators
+
+
+class Command(BaseCommand):
+    """
+    Pace every running real-time simulator from one event loop until interrupted.
+    """
+    help = 'Emit the data of running real-time simulators on the wall clock'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--poll-interval', type=float, default=5.0,
+                            help='Seconds between two polls for started and stopped simulators')
+
+    def handle(self, *args, **options):
+        try:
+            asyncio.run(serve_realtime_simulators(options['poll_interval']))
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from simulator_api.timeseries.job_queue import serve_workers
+
+
+class Command(BaseCommand):
+    """
+    Run the queued simulator runs on a pool of worker processes until interrupted.
+    """
+    help = 'Run queued simulators on a pool of pre-started worker processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=settings.SIMULATOR_QUEUE['concurrency'],
+                            help='Number of worker processes, each running one simulator at a time')
+        parser.add_argument('--poll-interval', type=float, default=settings.SIMULATOR_QUEUE['poll_interval'],
+                            help='Seconds between two polls of an empty queue')
+
+    def handle(self, *args, **options):
+        try:
+            serve_workers(options['concurrency'], options['poll_interval'])
+        except KeyboardInterrupt:
+            pass
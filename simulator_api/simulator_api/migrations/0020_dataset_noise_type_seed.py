@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-17 06:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulator_api', '0019_simulator_data_size_simulator_interval_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataset',
+            name='noise_type',
+            field=models.CharField(choices=[('gaussian', 'gaussian'), ('fixed_gaussian', 'fixed_gaussian'), ('laplace', 'laplace'), ('student_t', 'student_t'), ('lognormal', 'lognormal')], default='gaussian', max_length=15),
+        ),
+        migrations.AddField(
+            model_name='dataset',
+            name='seed',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
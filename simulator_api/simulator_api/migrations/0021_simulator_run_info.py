@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 06:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulator_api', '0020_dataset_noise_type_seed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='simulator',
+            name='run_info',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
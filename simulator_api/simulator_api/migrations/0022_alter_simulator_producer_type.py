@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 07:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulator_api', '0021_simulator_run_info'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='simulator',
+            name='producer_type',
+            field=models.CharField(choices=[('kafka', 'kafka'), ('csv', 'CSV'), ('parquet', 'Parquet'), ('feather', 'Feather')], default='csv', max_length=10),
+        ),
+    ]
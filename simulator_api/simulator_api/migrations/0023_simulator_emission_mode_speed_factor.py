@@ -0,0 +1,24 @@
+# Generated by Django 4.2.30 on 2026-10-17 07:03
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulator_api', '0022_alter_simulator_producer_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='simulator',
+            name='emission_mode',
+            field=models.CharField(choices=[('batch', 'batch'), ('realtime', 'realtime')], default='batch', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='simulator',
+            name='speed_factor',
+            field=models.FloatField(default=1, validators=[django.core.validators.MinValueValidator(1e-06)]),
+        ),
+    ]
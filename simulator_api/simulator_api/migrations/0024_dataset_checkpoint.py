@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-17 07:07
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulator_api', '0023_simulator_emission_mode_speed_factor'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='simulator',
+            name='emission_mode',
+            field=models.CharField(choices=[('batch', 'batch'), ('realtime', 'realtime'), ('incremental', 'incremental')], default='batch', max_length=11),
+        ),
+        migrations.CreateModel(
+            name='DatasetCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_timestamp', models.DateTimeField()),
+                ('position', models.BigIntegerField()),
+                ('rng_state', models.JSONField()),
+                ('component_min', models.FloatField()),
+                ('component_max', models.FloatField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('dataset_id', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='checkpoint', to='simulator_api.dataset')),
+            ],
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-17 07:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulator_api', '0024_dataset_checkpoint'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='simulator',
+            name='end_date',
+            field=models.DateTimeField(db_index=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='simulator',
+            name='start_date',
+            field=models.DateTimeField(db_index=True),
+        ),
+        migrations.AddIndex(
+            model_name='simulator',
+            index=models.Index(fields=['status', 'id'], name='simulator_a_status_50003a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='simulator',
+            index=models.Index(fields=['series_type', 'id'], name='simulator_a_series__2cf9ac_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='simulator',
+            index=models.Index(fields=['producer_type', 'id'], name='simulator_a_produce_93423b_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 07:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulator_api', '0026_updated_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='simulator',
+            name='producer_type',
+            field=models.CharField(choices=[('kafka', 'kafka'), ('csv', 'CSV'), ('parquet', 'Parquet'), ('feather', 'Feather'), ('store', 'Store')], default='csv', max_length=10),
+        ),
+    ]
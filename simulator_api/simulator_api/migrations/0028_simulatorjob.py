@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-17 07:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulator_api', '0027_simulator_store_producer'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimulatorJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('priority', models.IntegerField(default=0)),
+                ('status', models.CharField(choices=[('Queued', 'Queued'), ('Running', 'Running'), ('Succeeded', 'Succeeded'), ('Failed', 'Failed'), ('Cancelled', 'Cancelled')], default='Queued', max_length=10)),
+                ('worker', models.CharField(blank=True, max_length=100, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('simulator_id', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='jobs', to='simulator_api.simulator')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', '-priority', 'id'], name='simulator_a_status_7879ae_idx'), models.Index(fields=['simulator_id', 'started_at'], name='simulator_a_simulat_eb6bed_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-17 07:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulator_api', '0028_simulatorjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimulatorProgress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('points_generated', models.BigIntegerField(default=0)),
+                ('points_written', models.BigIntegerField(default=0)),
+                ('current_dataset', models.IntegerField(blank=True, null=True)),
+                ('started_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('simulator_id', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='progress', to='simulator_api.simulator')),
+            ],
+        ),
+    ]
@@ -12,12 +12,18 @@ class Simulator(models.Model):
         start_date (DateTime): The start date of the simulation.
         end_date (DateTime): The end date of the simulation.
         series_type (str): The type of time series, either "multiplicative" or "additive".
-        producer_type (str): The type of producer, either "kafka" or "CSV" (default is "CSV").
+        producer_type (str): The type of producer, "kafka", "CSV", "Parquet", "Feather" or "Store", the chunk
+            store keyed by simulator, dataset and run (default is "CSV").
         use_case (str): A description of the simulator's use case.
         meta_data (str): Metadata related to the simulator.
         status (str): The current status of the simulator (e.g., "Submitted", "Running", "Succeeded", "Failed", "Stopped").
         data (JSONField): JSON data associated with the simulator.
         process_id (int): The process ID of the running simulator (nullable).
+        run_info (JSONField): The entropy, number of workers and per-dataset wall time and errors of the last run.
+        emission_mode (str): "batch" to generate the whole history at once, "realtime" to pace it on the wall clock
+            or "incremental" to append the points since the previous run on each scheduled run.
+        speed_factor (float): How much faster than the wall clock a real-time simulator emits (default is 1).
+        updated_at (datetime): When the simulator was last saved.
     """
 
     SIMULATOR_TYPES = (
@@ -27,7 +33,16 @@ class Simulator(models.Model):
 
     PRODUCER_TYPE = (
         ('kafka', 'kafka'),
-        ('csv', 'CSV')
+        ('csv', 'CSV'),
+        ('parquet', 'Parquet'),
+        ('feather', 'Feather'),
+        ('store', 'Store')
+    )
+
+    EMISSION_MODE = (
+        ('batch', 'batch'),
+        ('realtime', 'realtime'),
+        ('incremental', 'incremental')
     )
 
     SIMULATOR_STATUS = (
@@ -39,8 +54,8 @@ class Simulator(models.Model):
     )
 
     name = models.CharField(max_length=200)
-    start_date = models.DateTimeField()
-    end_date = models.DateTimeField(null=True)
+    start_date = models.DateTimeField(db_index=True)
+    end_date = models.DateTimeField(null=True, db_index=True)
     data_size = models.IntegerField(null=True, validators=[MinValueValidator(1)])
     series_type = models.CharField(max_length=15, choices=SIMULATOR_TYPES)
     producer_type = models.CharField(max_length=10, choices=PRODUCER_TYPE, default='csv')
@@ -50,6 +65,18 @@ class Simulator(models.Model):
     data = models.JSONField(null=True)
     interval = models.IntegerField(null=True)
     process_id = models.IntegerField(null=True)
+    run_info = models.JSONField(null=True, blank=True)
+    emission_mode = models.CharField(max_length=11, choices=EMISSION_MODE, default='batch')
+    speed_factor = models.FloatField(default=1, validators=[MinValueValidator(0.000001)])
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        # Filtered pages are read in id order, so the filters are indexed together with the id
+        indexes = [
+            models.Index(fields=['status', 'id']),
+            models.Index(fields=['series_type', 'id']),
+            models.Index(fields=['producer_type', 'id']),
+        ]
 
     # add validation for provide end date or data size
     def save(self, *args, **kwargs):
@@ -74,6 +101,9 @@ class Dataset(models.Model):
         missing_percentage (float): The percentage of missing data (default is 0).
         outlier_percentage (float): The percentage of outliers (default is 0).
         seasonality_components (JSONField): JSON data representing seasonality components (nullable).
+        noise_type (str): The distribution the noise is drawn from (default is "gaussian").
+        seed (int): The seed of the random generator, set it to reproduce a run exactly (nullable).
+        updated_at (datetime): When the dataset was last saved.
     """
 
     CYCLE_AMPLITUDE_CHOICES = (
@@ -81,6 +111,14 @@ class Dataset(models.Model):
         (1, '1 (Multiplicative)'),
     )
 
+    NOISE_TYPE = (
+        ('gaussian', 'gaussian'),
+        ('fixed_gaussian', 'fixed_gaussian'),
+        ('laplace', 'laplace'),
+        ('student_t', 'student_t'),
+        ('lognormal', 'lognormal')
+    )
+
     simulator_id = models.ForeignKey(Simulator, on_delete=models.CASCADE)
     cycle_amplitude = models.IntegerField(choices=CYCLE_AMPLITUDE_CHOICES)
     cycle_frequency = models.FloatField()
@@ -90,6 +128,9 @@ class Dataset(models.Model):
     missing_percentage = models.FloatField(default=0)
     outlier_percentage = models.FloatField(default=0)
     seasonality_components = models.JSONField(null=True)
+    noise_type = models.CharField(max_length=15, choices=NOISE_TYPE, default='gaussian')
+    seed = models.BigIntegerField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
 
 class Seasonality(models.Model):
@@ -102,6 +143,7 @@ class Seasonality(models.Model):
         amplitude (float): The amplitude of seasonality component.
         phase_shift (float): The phase shift of seasonality component.
         frequency_multiplier (float): The frequency multiplier of seasonality component.
+        updated_at (datetime): When the seasonality component was last saved.
     """
 
     FREQUENCY_TYPE = (
@@ -115,3 +157,101 @@ class Seasonality(models.Model):
     amplitude = models.FloatField(default=0)
     phase_shift = models.FloatField(default=0)
     frequency_multiplier = models.FloatField(default=1)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+
+class DatasetCheckpoint(models.Model):
+    """
+    Model representing where an incremental simulator run left a dataset.
+
+    Attributes:
+        dataset_id (OneToOneField): The Dataset the checkpoint belongs to.
+        last_timestamp (datetime): The timestamp of the last generated point.
+        position (int): The number of points generated so far.
+        rng_state (JSONField): The state of the dataset's random generator after the last point.
+        component_min (float): The running minimum of the components, used to scale new points.
+        component_max (float): The running maximum of the components, used to scale new points.
+        updated_at (datetime): When the checkpoint was last moved forward.
+    """
+
+    dataset_id = models.OneToOneField(Dataset, on_delete=models.CASCADE, related_name='checkpoint')
+    last_timestamp = models.DateTimeField()
+    position = models.BigIntegerField()
+    rng_state = models.JSONField()
+    component_min = models.FloatField()
+    component_max = models.FloatField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class SimulatorProgress(models.Model):
+    """
+    Model representing the progress of the current or last run of a simulator.
+
+    The counters are saved at most once per SIMULATOR_PROGRESS_INTERVAL seconds while the run goes on.
+
+    Attributes:
+        simulator_id (OneToOneField): The Simulator the progress belongs to.
+        points_generated (int): The number of points generated so far.
+        points_written (int): The number of points handed to the producers so far.
+        current_dataset (int): The number of the dataset last written to (nullable).
+        started_at (datetime): When the run started.
+        updated_at (datetime): When the counters were last saved.
+        finished_at (datetime): When the run ended, null while it is going on.
+    """
+
+    simulator_id = models.OneToOneField(Simulator, on_delete=models.CASCADE, related_name='progress')
+    points_generated = models.BigIntegerField(default=0)
+    points_written = models.BigIntegerField(default=0)
+    current_dataset = models.IntegerField(null=True, blank=True)
+    started_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    @property
+    def points_per_second(self):
+        """
+        Get the average number of points written per second since the run started.
+
+        Returns:
+            float: The throughput, 0 before anything was saved.
+        """
+        elapsed = ((self.finished_at or self.updated_at) - self.started_at).total_seconds()
+        return self.points_written / elapsed if elapsed > 0 else 0.0
+
+
+class SimulatorJob(models.Model):
+    """
+    Model representing a queued run of a simulator, picked up by the run_simulator_workers pool.
+
+    Attributes:
+        simulator_id (ForeignKey): The Simulator to run.
+        priority (int): Jobs with a higher priority are started first (default is 0).
+        status (str): "Queued", "Running", "Succeeded", "Failed" or "Cancelled".
+        worker (str): The name of the worker that claimed the job (nullable).
+        created_at (datetime): When the job was queued.
+        started_at (datetime): When a worker claimed the job (nullable).
+        finished_at (datetime): When the job ended (nullable).
+    """
+
+    JOB_STATUS = (
+        ('Queued', 'Queued'),
+        ('Running', 'Running'),
+        ('Succeeded', 'Succeeded'),
+        ('Failed', 'Failed'),
+        ('Cancelled', 'Cancelled')
+    )
+
+    simulator_id = models.ForeignKey(Simulator, on_delete=models.CASCADE, related_name='jobs')
+    priority = models.IntegerField(default=0)
+    status = models.CharField(max_length=10, choices=JOB_STATUS, default='Queued')
+    worker = models.CharField(max_length=100, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        # Workers look for the queued job with the highest priority
+        indexes = [
+            models.Index(fields=['status', '-priority', 'id']),
+            models.Index(fields=['simulator_id', 'started_at']),
+        ]
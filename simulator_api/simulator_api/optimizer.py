@@ -0,0 +1,176 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from graphene.relay import Connection
+from graphene.utils.str_converters import to_camel_case
+from graphql import get_named_type
+from graphql.language import FieldNode, FragmentSpreadNode, InlineFragmentNode
+
+
+def selected_fields(selection_sets, info):
+    """
+    Get the fields selected in selection sets, expanding fragments.
+
+    Args:
+        selection_sets (list): The GraphQL selection sets.
+        info (ResolveInfo): The resolver info, holding the fragments of the document.
+
+    Yields:
+        FieldNode: The selected fields.
+    """
+    for selection_set in selection_sets:
+        if selection_set is None:
+            continue
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                yield selection
+            elif isinstance(selection, FragmentSpreadNode):
+                yield from selected_fields([info.fragments[selection.name.value].selection_set], info)
+            elif isinstance(selection, InlineFragmentNode):
+                yield from selected_fields([selection.selection_set], info)
+
+
+def _child(graphql_type, field_nodes, name, info):
+    """
+    Get the type and the selection sets of a field selected under field_nodes.
+
+    Returns:
+        tuple: The named GraphQL type of the field and its selection sets.
+    """
+    nodes = [node for node in selected_fields([node.selection_set for node in field_nodes], info)
+             if node.name.value == name]
+    return get_named_type(graphql_type.fields[name].type), nodes
+
+
+def _python_names(graphql_type):
+    """
+    Map the GraphQL field names of a graphene type to their Python names.
+
+    Returns:
+        dict: The Python name of each GraphQL field name.
+    """
+    return {getattr(field, 'name', None) or to_camel_case(name): name
+            for name, field in graphql_type.graphene_type._meta.fields.items()}
+
+
+def _model_field(model, name):
+    """
+    Get a model field by name, reverse relations being named by their accessor, e.g. 'dataset_set'.
+
+    Returns:
+        Field: The field, or None when the model has no such field.
+    """
+    try:
+        return model._meta.get_field(name)
+    except FieldDoesNotExist:
+        pass
+    for relation in model._meta.related_objects:
+        if relation.get_accessor_name() == name:
+            return relation
+    return None
+
+
+def plan(model, graphql_type, field_nodes, info, prefix=''):
+    """
+    Derive the columns and relations a selection reads from a model.
+
+    Scalar fields become only() columns. Forward foreign keys are joined with select_related and
+    their own selection planned with the lookup prefix. Reverse relations become Prefetch objects
+    whose querysets are planned from their own selection.
+
+    A relation selected more than once, under aliases or through fragments, is planned once from
+    all its selections, as Django refuses two Prefetch objects with the same lookup.
+
+    Args:
+        model (Model): The model the selection reads.
+        graphql_type (GraphQLObjectType): The GraphQL type of the model.
+        field_nodes (list): The field nodes whose selections read the model.
+        info (ResolveInfo): The resolver info.
+        prefix (str): The lookup path from the queried model, for joined models.
+
+    Returns:
+        tuple: The only() columns, the select_related paths and the Prefetch objects.
+    """
+    names = _python_names(graphql_type)
+    only = {prefix + model._meta.pk.name}
+    select_related = []
+    prefetches = []
+    # The lookup paths of the relations planned so far
+    planned = set()
+    for node in selected_fields([node.selection_set for node in field_nodes], info):
+        name = names.get(node.name.value)
+        field = _model_field(model, name) if name else None
+        if field is None:
+            # Not a model field, e.g. a computed field or __typename, reading the columns its type lists
+            # in field_columns so only() does not defer them
+            field_columns = getattr(graphql_type.graphene_type, 'field_columns', {})
+            only |= {prefix + column for column in field_columns.get(name, ())}
+            continue
+        if not field.is_relation:
+            only.add(prefix + field.name)
+            continue
+        path = prefix + (field.name if field.concrete else field.get_accessor_name())
+        if path in planned:
+            continue
+        planned.add(path)
+        child_type, child_nodes = _child(graphql_type, field_nodes, node.name.value, info)
+        if field.concrete:
+            # A forward foreign key, joined into the same query
+            child_only, child_select, child_prefetches = plan(field.related_model, child_type, child_nodes, info,
+                                                              path + '__')
+            only.add(path)
+            only |= child_only
+            select_related += [path] + child_select
+            prefetches += child_prefetches
+        else:
+            # A reverse relation, read with one more query for every parent row
+            remote = field.remote_field.name
+            queryset = optimize_queryset(field.related_model.objects.order_by('id'), child_type, child_nodes, info,
+                                         [remote])
+            prefetches.append(Prefetch(path, queryset=queryset))
+    return only, select_related, prefetches
+
+
+def optimize_queryset(queryset, graphql_type, field_nodes, info, columns=()):
+    """
+    Restrict a queryset to the columns and relations a selection reads.
+
+    Args:
+        queryset (QuerySet): The queryset to optimize.
+        graphql_type (GraphQLObjectType): The GraphQL type of the rows.
+        field_nodes (list): The field nodes selecting the rows.
+        info (ResolveInfo): The resolver info.
+        columns (iterable): More columns to read, e.g. the key a prefetch matches rows on.
+
+    Returns:
+        QuerySet: The optimized queryset.
+    """
+    only, select_related, prefetches = plan(queryset.model, graphql_type, field_nodes, info)
+    queryset = queryset.only(*only, *columns)
+    if select_related:
+        queryset = queryset.select_related(*select_related)
+    if prefetches:
+        queryset = queryset.prefetch_related(*prefetches)
+    return queryset
+
+
+def optimize(queryset, info):
+    """
+    Restrict the queryset of a root resolver to what the query selects.
+
+    Columns that are not selected, like the potentially large Simulator.data, are never read.
+    For a connection, the selection under edges { node } is used.
+
+    Args:
+        queryset (QuerySet): The queryset the resolver returns rows from.
+        info (ResolveInfo): The resolver info.
+
+    Returns:
+        QuerySet: The optimized queryset.
+    """
+    graphql_type = get_named_type(info.return_type)
+    field_nodes = info.field_nodes
+    graphene_type = getattr(graphql_type, 'graphene_type', None)
+    if isinstance(graphene_type, type) and issubclass(graphene_type, Connection):
+        edge_type, edge_nodes = _child(graphql_type, field_nodes, 'edges', info)
+        graphql_type, field_nodes = _child(edge_type, edge_nodes, 'node', info)
+    return optimize_queryset(queryset, graphql_type, field_nodes, info)
@@ -0,0 +1,111 @@
+from graphql import GraphQLError
+from graphql_relay.utils import base64, unbase64
+from graphene.relay import PageInfo
+from rest_framework.pagination import CursorPagination
+
+# Page size of a connection queried without first or last, and the largest page a client can ask for
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+CURSOR_PREFIX = 'pk:'
+
+
+def to_cursor(pk):
+    """
+    Encode a primary key as an opaque connection cursor.
+
+    Returns:
+        str: The cursor.
+    """
+    return base64(f'{CURSOR_PREFIX}{pk}')
+
+
+def from_cursor(cursor):
+    """
+    Decode a connection cursor back to its primary key.
+
+    Returns:
+        int: The primary key.
+    """
+    try:
+        value = unbase64(cursor)
+        if not value.startswith(CURSOR_PREFIX):
+            raise ValueError(cursor)
+        return int(value[len(CURSOR_PREFIX):])
+    except (ValueError, TypeError):
+        raise GraphQLError(f'Invalid cursor: {cursor}')
+
+
+def keyset_connection(connection_type, queryset, first=None, after=None, last=None, before=None):
+    """
+    Get a page of a queryset as a Relay connection, paginating on the primary key.
+
+    The cursors are primary keys, so a page is read with an indexed pk range and a LIMIT, and
+    deep pages cost the same as the first one unlike OFFSET pagination. The total count is not
+    computed here: the connection keeps the filtered queryset so totalCount only runs a COUNT
+    when a client selects it.
+
+    Args:
+        connection_type (Connection): The connection type to build.
+        queryset (QuerySet): The filtered rows.
+        first (int): The number of rows after the after cursor.
+        after (str): The cursor the page starts after.
+        last (int): The number of rows before the before cursor.
+        before (str): The cursor the page ends before.
+
+    Returns:
+        Connection: The page, with its filtered queryset as the queryset attribute.
+    """
+    for size in (first, last):
+        if size is not None and not 0 <= size <= MAX_PAGE_SIZE:
+            raise GraphQLError(f'Page size must be between 0 and {MAX_PAGE_SIZE}')
+    page = queryset
+    if after is not None:
+        page = page.filter(pk__gt=from_cursor(after))
+    if before is not None:
+        page = page.filter(pk__lt=from_cursor(before))
+
+    if last is not None and first is None:
+        # Read backwards from the end of the range, one extra row tells whether there is an earlier page
+        rows = list(page.order_by('-pk')[:last + 1])
+        has_previous_page, has_next_page = len(rows) > last, before is not None
+        rows = rows[:last][::-1]
+    else:
+        first = DEFAULT_PAGE_SIZE if first is None else first
+        rows = list(page.order_by('pk')[:first + 1])
+        has_previous_page, has_next_page = after is not None, len(rows) > first
+        rows = rows[:first]
+        if last is not None:
+            rows = rows[-last:] if last else []
+
+    connection = connection_type(
+        edges=[connection_type.Edge(node=row, cursor=to_cursor(row.pk)) for row in rows],
+        page_info=PageInfo(
+            start_cursor=to_cursor(rows[0].pk) if rows else None,
+            end_cursor=to_cursor(rows[-1].pk) if rows else None,
+            has_previous_page=has_previous_page,
+            has_next_page=has_next_page,
+        ),
+    )
+    connection.queryset = queryset
+    return connection
+
+
+class OptionalCursorPagination(CursorPagination):
+    """
+    Cursor pagination for the REST list views that only applies when the client asks for it.
+
+    A request with a cursor or page_size query parameter gets a page of page_size rows in id order
+    with next and previous links, the cursor encoding the last id so a page is an indexed range
+    scan. A request without either keeps getting the plain list.
+    """
+    ordering = 'id'
+    page_size = DEFAULT_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = MAX_PAGE_SIZE
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param not in request.query_params and \
+                self.page_size_query_param not in request.query_params:
+            return None
+        return super().paginate_queryset(queryset, request, view)
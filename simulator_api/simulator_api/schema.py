@@ -1,23 +1,162 @@
 # Import necessary types from graphene
 import graphene
+import pandas as pd
+from django.conf import settings
 from graphene_django.types import DjangoObjectType
+from graphql import GraphQLError
 
-from simulator_api.models import Seasonality, Dataset, Simulator
+from simulator_api.models import Seasonality, Dataset, Simulator, SimulatorProgress
+from simulator_api.loaders import get_loaders, load_forward, load_reverse, load_one
+from simulator_api.optimizer import optimize
+from simulator_api.pagination import keyset_connection
+from simulator_api.serializers import bulk_create_simulators, MAX_BULK_SIMULATORS
+from simulator_api.timeseries.downsample import downsample
+from simulator_api.timeseries.series_reader import read_series, to_nanoseconds
+from simulator_api.timeseries.chunk_store import ChunkStore
 
 
 # Define GraphQL types for each Django model
+# Related rows come from the root resolver's optimized query, or else from the request's loaders,
+# so nested fields cost one query per level, not per row
 class SimulatorType(DjangoObjectType):
     class Meta:
         model = Simulator
 
+    def resolve_dataset_set(self, info):
+        return load_reverse(info, self, 'dataset_set', get_loaders(info).datasets)
+
+    def resolve_progress(self, info):
+        return load_one(info, self, 'progress', get_loaders(info).progress)
+
+class SimulatorProgressType(DjangoObjectType):
+    class Meta:
+        model = SimulatorProgress
+        exclude = ('simulator_id',)
+
+    points_per_second = graphene.Float()
+
+    # The columns the computed fields read, so the optimizer does not defer them
+    field_columns = {
+        'points_per_second': ('points_written', 'started_at', 'updated_at', 'finished_at'),
+    }
+
 class DatasetType(DjangoObjectType):
     class Meta:
         model = Dataset
 
+    def resolve_simulator_id(self, info):
+        return load_forward(info, self, 'simulator_id', get_loaders(info).simulator)
+
+    def resolve_seasonality_set(self, info):
+        return load_reverse(info, self, 'seasonality_set', get_loaders(info).seasonalities)
+
 class SeasonalityType(DjangoObjectType):
     class Meta:
         model = Seasonality
 
+    def resolve_dataset_id(self, info):
+        return load_forward(info, self, 'dataset_id', get_loaders(info).dataset)
+
+# Define Relay connections for paging through each list
+class SimulatorConnection(graphene.relay.Connection):
+    class Meta:
+        node = SimulatorType
+
+    total_count = graphene.Int()
+
+    def resolve_total_count(self, info):
+        # Only counted when selected, the page itself never needs it
+        return self.queryset.count()
+
+class DatasetConnection(graphene.relay.Connection):
+    class Meta:
+        node = DatasetType
+
+    total_count = graphene.Int()
+
+    def resolve_total_count(self, info):
+        return self.queryset.count()
+
+# Filter arguments of the connection fields and their ORM lookups
+SIMULATOR_FILTERS = {
+    'status': 'status',
+    'series_type': 'series_type',
+    'producer_type': 'producer_type',
+    'start_date_from': 'start_date__gte',
+    'start_date_to': 'start_date__lte',
+    'end_date_from': 'end_date__gte',
+    'end_date_to': 'end_date__lte',
+}
+
+DATASET_FILTERS = {
+    'simulator_id': 'simulator_id',
+    'frequency': 'frequency',
+    'noise_type': 'noise_type',
+}
+
+def paginate(info, connection_type, queryset, filters, first=None, after=None, last=None, before=None, **args):
+    """
+    Filter a queryset by the given connection arguments and get the requested page.
+
+    Returns:
+        Connection: The page.
+    """
+    queryset = optimize(queryset, info).filter(
+        **{filters[name]: value for name, value in args.items() if value is not None})
+    connection = keyset_connection(connection_type, queryset, first, after, last, before)
+    get_loaders(info).prime([edge.node for edge in connection.edges])
+    return connection
+
+# Define the types of the stored series data
+class SeriesAggregation(graphene.Enum):
+    LTTB = 'lttb'
+    MINMAX = 'minmax'
+
+class SeriesPointType(graphene.ObjectType):
+    timestamp = graphene.DateTime()
+    value = graphene.Float()
+    anomaly = graphene.Boolean()
+    anomaly_count = graphene.Int()
+
+class SeriesType(graphene.ObjectType):
+    dataset_id = graphene.Int()
+    total_points = graphene.Int()
+    anomaly_count = graphene.Int()
+    points = graphene.List(SeriesPointType)
+
+def load_series(dataset_id, start, end, max_points, aggregation, run_id=None):
+    """
+    Read the stored output of a dataset between two timestamps and downsample it to max_points points.
+
+    The output of the store producer is read from the chunk store, from run_id or else the latest run.
+
+    Returns:
+        SeriesType: The downsampled series.
+    """
+    dataset = Dataset.objects.select_related('simulator_id').only(
+        'simulator_id__name', 'simulator_id__producer_type').get(pk=dataset_id)
+    simulator = dataset.simulator_id
+    # Datasets are numbered in id order within their simulator, like in their output file names
+    dataset_number = Dataset.objects.filter(simulator_id=simulator, id__lte=dataset.id).count()
+    try:
+        if simulator.producer_type == 'store':
+            stored = ChunkStore(settings.SIMULATOR_STORE['root']).read(
+                simulator.id, dataset.id, run_id, to_nanoseconds(start), to_nanoseconds(end))
+        else:
+            stored = read_series(simulator.name, dataset_number, simulator.producer_type, start, end)
+        series = downsample(stored, max_points, aggregation)
+    except (ValueError, FileNotFoundError, ImportError) as e:
+        raise GraphQLError(str(e))
+    timestamps = pd.DatetimeIndex(series.timestamps.view('M8[ns]'))
+    if series.tz is not None:
+        timestamps = timestamps.tz_localize('UTC').tz_convert(series.tz)
+    points = [SeriesPointType(timestamp=timestamp, value=None if value != value else value, anomaly=anomaly,
+                              anomaly_count=count)
+              for timestamp, value, anomaly, count in zip(timestamps.to_pydatetime(), series.values.tolist(),
+                                                          series.anomaly.tolist(), series.anomaly_count.tolist())]
+    return SeriesType(dataset_id=dataset.id, total_points=series.total_points,
+                      anomaly_count=int(series.anomaly_count.sum()), points=points)
+
 # Define input types for creating/updating each model
 class SimulatorInput(graphene.InputObjectType):
     name = graphene.String()
@@ -32,6 +171,8 @@ class SimulatorInput(graphene.InputObjectType):
     data = graphene.JSONString()
     interval = graphene.Int()
     process_id = graphene.Int()
+    emission_mode = graphene.String()
+    speed_factor = graphene.Float()
 
 class DatasetInput(graphene.InputObjectType):
     cycle_amplitude = graphene.Int()
@@ -42,6 +183,8 @@ class DatasetInput(graphene.InputObjectType):
     missing_percentage = graphene.Float()
     outlier_percentage = graphene.Float()
     seasonality_components = graphene.JSONString()
+    noise_type = graphene.String()
+    seed = graphene.BigInt()
 
 class SeasonalityInput(graphene.InputObjectType):
     frequency_type = graphene.String()
@@ -61,6 +204,27 @@ class CreateSimulatorMutation(graphene.Mutation):
         simulator.save()
         return CreateSimulatorMutation(simulator=simulator)
 
+class SimulatorErrorType(graphene.ObjectType):
+    index = graphene.Int()
+    errors = graphene.JSONString()
+
+class BulkCreateSimulatorsMutation(graphene.Mutation):
+    class Arguments:
+        input_data = graphene.List(graphene.NonNull(SimulatorInput), required=True)
+
+    simulators = graphene.List(SimulatorType)
+    errors = graphene.List(SimulatorErrorType)
+
+    def mutate(self, info, input_data):
+        # Like the REST bulk endpoint, the simulators are all created in one transaction or none is
+        if len(input_data) > MAX_BULK_SIMULATORS:
+            raise GraphQLError(f'At most {MAX_BULK_SIMULATORS} simulators can be created at once')
+        simulators, errors = bulk_create_simulators([dict(simulator) for simulator in input_data])
+        return BulkCreateSimulatorsMutation(
+            simulators=get_loaders(info).prime(simulators),
+            errors=[SimulatorErrorType(index=index, errors=item_errors)
+                    for index, item_errors in enumerate(errors) if item_errors])
+
 class CreateDatasetMutation(graphene.Mutation):
     class Arguments:
         simulator_id = graphene.Int(required=True)
@@ -97,24 +261,48 @@ class Query(graphene.ObjectType):
     simulators = graphene.List(SimulatorType)
     datasets = graphene.List(DatasetType, simulator_id=graphene.Int())
     simulatorsWithDatasets = graphene.List(SimulatorType)
-
+    all_simulators = graphene.Field(
+        SimulatorConnection, first=graphene.Int(), after=graphene.String(), last=graphene.Int(),
+        before=graphene.String(), status=graphene.String(), series_type=graphene.String(),
+        producer_type=graphene.String(), start_date_from=graphene.DateTime(), start_date_to=graphene.DateTime(),
+        end_date_from=graphene.DateTime(), end_date_to=graphene.DateTime())
+    all_datasets = graphene.Field(
+        DatasetConnection, first=graphene.Int(), after=graphene.String(), last=graphene.Int(),
+        before=graphene.String(), simulator_id=graphene.Int(), frequency=graphene.String(),
+        noise_type=graphene.String())
+    series = graphene.Field(
+        SeriesType, dataset_id=graphene.Int(required=True), from_=graphene.DateTime(name='from'),
+        to=graphene.DateTime(), run_id=graphene.String(), max_points=graphene.Int(default_value=1000),
+        aggregation=SeriesAggregation(default_value=SeriesAggregation.LTTB.value))
+
+    # Every root resolver only reads the columns and relations the query selects
     def resolve_simulator(self, info, id):
-        return Simulator.objects.get(pk=id)
+        return get_loaders(info).prime([optimize(Simulator.objects.all(), info).get(pk=id)])[0]
 
     def resolve_dataset(self, info, id):
-        return Dataset.objects.get(pk=id)
+        return get_loaders(info).prime([optimize(Dataset.objects.all(), info).get(pk=id)])[0]
 
     def resolve_seasonality(self, info, id):
-        return Seasonality.objects.get(pk=id)
+        return get_loaders(info).prime([optimize(Seasonality.objects.all(), info).get(pk=id)])[0]
 
     def resolve_simulators(self, info):
-        return Simulator.objects.all()
+        return get_loaders(info).prime(optimize(Simulator.objects.all(), info))
 
     def resolve_datasets(self, info, simulator_id):
-        return Dataset.objects.filter(simulator_id=simulator_id)
+        return get_loaders(info).prime(optimize(Dataset.objects.filter(simulator_id=simulator_id), info))
 
     def resolve_simulatorsWithDatasets(self, info):
-        return Simulator.objects.prefetch_related('dataset_set').all()
+        # The datasets are prefetched by the optimizer like in every other query
+        return get_loaders(info).prime(optimize(Simulator.objects.all(), info))
+
+    def resolve_all_simulators(self, info, **args):
+        return paginate(info, SimulatorConnection, Simulator.objects.all(), SIMULATOR_FILTERS, **args)
+
+    def resolve_all_datasets(self, info, **args):
+        return paginate(info, DatasetConnection, Dataset.objects.all(), DATASET_FILTERS, **args)
+
+    def resolve_series(self, info, dataset_id, max_points, aggregation, from_=None, to=None, run_id=None):
+        return load_series(dataset_id, from_, to, max_points, getattr(aggregation, 'value', aggregation), run_id)
 class UpdateSimulatorStatusMutation(graphene.Mutation):
     class Arguments:
         simulator_id = graphene.Int(required=True)
@@ -149,6 +337,7 @@ class CreateDatasetWithSeasonalityMutation(graphene.Mutation):
 # Define the mutation root
 class Mutation(graphene.ObjectType):
     create_simulator = CreateSimulatorMutation.Field()
+    bulk_create_simulators = BulkCreateSimulatorsMutation.Field()
     create_dataset = CreateDatasetMutation.Field()
     create_seasonality = CreateSeasonalityMutation.Field()
     update_simulator_status = UpdateSimulatorStatusMutation.Field()
@@ -1,6 +1,29 @@
+from django.db import transaction
+from django.db.models import Prefetch
 from rest_framework import serializers
 from .models import Simulator, Dataset, Seasonality
 
+# The largest number of simulators one bulk request can create
+MAX_BULK_SIMULATORS = 1000
+
+
+def prefetch_simulators(queryset):
+    """
+    Prefetch the datasets and seasonality components SimulatorSerializer represents.
+
+    Listing simulators then costs three queries whatever their number, instead of one per
+    simulator and one per dataset.
+
+    Args:
+        queryset (QuerySet): The simulators to prefetch for.
+
+    Returns:
+        QuerySet: The simulators with their datasets and seasonality components prefetched.
+    """
+    seasonalities = Seasonality.objects.order_by('id')
+    datasets = Dataset.objects.order_by('id').prefetch_related(Prefetch('seasonality_set', queryset=seasonalities))
+    return queryset.prefetch_related(Prefetch('dataset_set', queryset=datasets))
+
 class SeasonalitySerializer(serializers.ModelSerializer):
     """
     Serializer for Seasonality model.
@@ -12,6 +35,35 @@ class SeasonalitySerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+class SeasonalityComponentSerializer(serializers.ModelSerializer):
+    """
+    Serializer validating a seasonality component before its dataset exists.
+    """
+    class Meta:
+        model = Seasonality
+        exclude = ('dataset_id',)
+
+
+def validate_seasonality_components(seasonality_components):
+    """
+    Validate every seasonality component of a dataset.
+
+    Args:
+        seasonality_components (list): The seasonality components data.
+
+    Returns:
+        list: The validated data of each component.
+    """
+    validated = []
+    for seasonality_component in seasonality_components or []:
+        seasonality_serializer = SeasonalityComponentSerializer(data=seasonality_component)
+        if not seasonality_serializer.is_valid():
+            # If validation fails, raise a ValidationError with the error messages
+            raise serializers.ValidationError(seasonality_serializer.errors)
+        validated.append(seasonality_serializer.validated_data)
+    return validated
+
+
 class DatasetSerializer(serializers.ModelSerializer):
     """
     Serializer for Dataset model.
@@ -28,23 +80,20 @@ class DatasetSerializer(serializers.ModelSerializer):
         """
         Create a new Dataset instance with related Seasonality components.
 
+        Every component is validated before anything is written, then they are inserted in one
+        query in the same transaction as the dataset.
+
         Args:
             validated_data (dict): The validated data for creating the Dataset.
 
         Returns:
             Dataset: The created Dataset instance.
         """
-        seasonality_components = validated_data.pop('seasonality_components')
-        dataset = Dataset.objects.create(**validated_data)
-        for seasonality_component in seasonality_components:
-            # Validate seasonality_component before creating a Seasonality instance
-            seasonality_component['dataset_id'] = dataset.id
-            seasonality_serializer = SeasonalitySerializer(data=seasonality_component)
-            if seasonality_serializer.is_valid():
-                seasonality_serializer.save()
-            else:
-                # If validation fails, raise a ValidationError with the error messages
-                raise serializers.ValidationError(seasonality_serializer.errors)
+        seasonality_components = validate_seasonality_components(validated_data.pop('seasonality_components', None))
+        with transaction.atomic():
+            dataset = Dataset.objects.create(**validated_data)
+            Seasonality.objects.bulk_create([Seasonality(dataset_id=dataset, **seasonality_component)
+                                             for seasonality_component in seasonality_components])
         return dataset
 
     def to_representation(self, instance):
@@ -59,12 +108,113 @@ class DatasetSerializer(serializers.ModelSerializer):
         """
         representation = super().to_representation(instance)
 
-        # Include related seasonality components as JSON in the serialized representation
-        seasonality_components = Seasonality.objects.filter(dataset_id=instance.id)
+        # Include related seasonality components as JSON, prefetched by prefetch_simulators() when listing
+        seasonality_components = instance.seasonality_set.all()
         representation['seasonality_components'] = SeasonalitySerializer(seasonality_components, many=True).data
         return representation
 
 
+class DatasetComponentSerializer(DatasetSerializer):
+    """
+    Serializer validating a dataset before its simulator exists.
+    """
+    class Meta:
+        model = Dataset
+        exclude = ('simulator_id',)
+
+
+def validate_datasets(datasets_data):
+    """
+    Validate every dataset of a simulator and its seasonality components.
+
+    Args:
+        datasets_data (list): The datasets data, each with its seasonality_components.
+
+    Raises:
+        ValidationError: With the errors of the first invalid dataset or component.
+
+    Returns:
+        list: The validated data of each dataset and the validated data of its components.
+    """
+    datasets = []
+    for dataset_data in datasets_data or []:
+        # Validate dataset_data before creating a Dataset instance
+        dataset_serializer = DatasetComponentSerializer(data=dataset_data)
+        if not dataset_serializer.is_valid():
+            # If validation fails, raise a ValidationError with the error messages
+            raise serializers.ValidationError(dataset_serializer.errors)
+        dataset = dict(dataset_serializer.validated_data)
+        seasonality_components = validate_seasonality_components(dataset.pop('seasonality_components', None))
+        datasets.append((dataset, seasonality_components))
+    return datasets
+
+
+def insert_datasets(simulators):
+    """
+    Insert the validated datasets of saved simulators and their components, one query per table.
+
+    Args:
+        simulators (list): The saved Simulator instances, each with its validated datasets.
+
+    Returns:
+        None
+    """
+    datasets = [(simulator, dataset, seasonality_components)
+                for simulator, simulator_datasets in simulators
+                for dataset, seasonality_components in simulator_datasets]
+    created = Dataset.objects.bulk_create([Dataset(simulator_id=simulator, **dataset)
+                                           for simulator, dataset, _ in datasets])
+    Seasonality.objects.bulk_create([
+        Seasonality(dataset_id=dataset, **seasonality_component)
+        for dataset, (_, _, seasonality_components) in zip(created, datasets)
+        for seasonality_component in seasonality_components])
+
+
+def bulk_create_simulators(simulators_data):
+    """
+    Create many simulators with their datasets and seasonality components in one transaction.
+
+    Every simulator, dataset and component is validated before anything is written. If any is
+    invalid nothing is created, else the simulators, the datasets and the components are each
+    inserted with bulk_create, so the number of queries does not grow with the number of simulators.
+
+    Args:
+        simulators_data (list): The data of each simulator, as posted to SimulatorSerializer.
+
+    Returns:
+        tuple: The created Simulator instances and the errors of each simulator, empty when it is valid.
+            No simulator is created when any has errors.
+    """
+    # One serializer validates every simulator, like a ListSerializer does, but the errors of each are kept
+    serializer = SimulatorSerializer()
+    errors = []
+    validated = []
+    for simulator_data in simulators_data:
+        try:
+            simulator_data = dict(serializer.run_validation(simulator_data))
+        except serializers.ValidationError as e:
+            errors.append(e.detail)
+            continue
+        try:
+            datasets = validate_datasets(simulator_data.pop('data', None))
+        except serializers.ValidationError as e:
+            errors.append({'data': e.detail})
+            continue
+        # bulk_create skips Simulator.save(), so its validation is repeated here
+        if not simulator_data.get('end_date') and not simulator_data.get('data_size'):
+            errors.append({'end_date': ['Please provide either end date or data size']})
+            continue
+        errors.append({})
+        validated.append((Simulator(**simulator_data), datasets))
+    if any(errors):
+        return [], errors
+
+    with transaction.atomic():
+        simulators = Simulator.objects.bulk_create([simulator for simulator, _ in validated])
+        insert_datasets(list(zip(simulators, [datasets for _, datasets in validated])))
+    return simulators, errors
+
+
 class SimulatorSerializer(serializers.ModelSerializer):
     """
     Serializer for Simulator model.
@@ -76,29 +226,26 @@ class SimulatorSerializer(serializers.ModelSerializer):
     class Meta:
         model = Simulator
         fields = '__all__'
+        read_only_fields = ('run_info',)
 
     def create(self, validated_data):
         """
         Create a new Simulator instance with related Datasets.
 
+        Every dataset and seasonality component is validated before anything is written, then the
+        datasets and the components are each inserted in one query, all in one transaction.
+        Use bulk_create_simulators() to create many simulators at once.
+
         Args:
             validated_data (dict): The validated data for creating the Simulator.
 
         Returns:
             Simulator: The created Simulator instance.
         """
-        datasets_data = validated_data.pop('data')
-        simulator = Simulator.objects.create(**validated_data)
-
-        for dataset_data in datasets_data:
-            # Validate dataset_data before creating a Dataset instance
-            dataset_data['simulator_id'] = simulator.id
-            dataset_serializer = DatasetSerializer(data=dataset_data)
-            if dataset_serializer.is_valid():
-               dataset_serializer.save()
-            else:
-                # If validation fails, raise a ValidationError with the error messages
-                raise serializers.ValidationError(dataset_serializer.errors)
+        datasets = validate_datasets(validated_data.pop('data'))
+        with transaction.atomic():
+            simulator = Simulator.objects.create(**validated_data)
+            insert_datasets([(simulator, datasets)])
         return simulator
 
     def to_representation(self, instance):
@@ -113,8 +260,8 @@ class SimulatorSerializer(serializers.ModelSerializer):
         """
         representation = super().to_representation(instance)
 
-        # Include related datasets as JSON in the serialized representation
-        datasets = Dataset.objects.filter(simulator_id=instance.id)
+        # Include related datasets as JSON, prefetched by prefetch_simulators() when listing
+        datasets = instance.dataset_set.all()
         representation['data'] = DatasetSerializer(datasets, many=True).data
 
         return representation
@@ -2,11 +2,62 @@ from django.test import TestCase
 
 # Create your tests here.
 
-from django.test import TestCase, Client
+from django.test import TestCase, TransactionTestCase, Client, AsyncRequestFactory, override_settings
 from django.urls import reverse
-from .models import Simulator
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.exceptions import ValidationError
+from .models import Simulator, Dataset, Seasonality, DatasetCheckpoint, SimulatorJob, SimulatorProgress
 from .serializers import SimulatorSerializer
+from .timeseries.edit_data import EditData
+from .timeseries.generate_time_series import TimeSeries, BatchTimeSeries
+from .timeseries.noise import NOISE_TYPES
+from .timeseries.series_data import SeriesData
+from .timeseries.calendar_features import CalendarCache, calendar_cache
+from .timeseries.data_producer import DataProducerParquet, DataProducerFeather, DataProducerKafka, pa
+from .timeseries.kafka_transport import InMemoryKafkaTransport, KafkaTransport, get_serializer, \
+    get_chunk_serializer, get_shared_transport
+from .timeseries import simulator
+from .timeseries.realtime import PacedEmitter
+from .timeseries.downsample import downsample
+from .timeseries.chunk_store import ChunkStore
+from .timeseries.data_producer import DataProducerStore
+from .timeseries import job_queue
+from .timeseries.progress import ProgressReporter
+from .timeseries.cancellation import CancelToken
+from .timeseries.data_producer import DataProducerCSV
+from .timeseries.result_cache import ResultCache
+from .graphql_view import graphql_metrics, document_cache, AsyncCachedGraphQLView
+from .schema import schema
+from .views import RunSimulatorView, StopSimulatorView, SimulatorStatusView
+import asyncio
+import numpy as np
+import pandas as pd
+import hashlib
+import queue
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+import copy
 import json
+import os
+
+DATASET = {
+    "cycle_amplitude": 1,
+    "cycle_frequency": 2.0,
+    "frequency": "1h",
+    "noise_level": 0.0,
+    "trend_coefficient": [0.001, 0.5, 3],
+    "missing_percentage": 0.0,
+    "outlier_percentage": 0.0,
+    "seed": 7,
+    "seasonality_components": [
+        {"frequency_type": "daily", "amplitude": 1.0, "phase_shift": 0.0, "frequency_multiplier": 1},
+        {"frequency_type": "weekly", "amplitude": 2.0, "phase_shift": 0.5, "frequency_multiplier": 2}
+    ]
+}
 
 class SimulatorAPITest(TestCase):
     def setUp(self):
@@ -109,3 +160,1481 @@ class SimulatorAPITest(TestCase):
 
     # Add more test cases as needed for other views and scenarios
 
+
+class SerializerQueryTest(TestCase):
+    def _create(self, count):
+        for i in range(count):
+            serializer = SimulatorSerializer(data={
+                "name": f"Simulator {i}",
+                "use_case": "Use Case",
+                "meta_data": "Meta Data",
+                "start_date": "2020-01-01T00:00:00Z",
+                "end_date": "2020-01-02T00:00:00Z",
+                "series_type": "additive",
+                "data": [DATASET, dict(DATASET, frequency="1D")]
+            })
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+            serializer.save()
+
+    def test_create_inserts_in_bulk(self):
+        # The simulator, its datasets and their seasonality components, plus the savepoint
+        with self.assertNumQueries(5):
+            self._create(1)
+        data = SimulatorSerializer(Simulator.objects.get()).data
+        self.assertEqual([dataset['frequency'] for dataset in data['data']], ['1h', '1D'])
+        self.assertEqual(len(data['data'][1]['seasonality_components']), 2)
+
+    def test_invalid_dataset_writes_nothing(self):
+        serializer = SimulatorSerializer(data={
+            "name": "Invalid",
+            "use_case": "Use Case",
+            "meta_data": "Meta Data",
+            "start_date": "2020-01-01T00:00:00Z",
+            "end_date": "2020-01-02T00:00:00Z",
+            "series_type": "additive",
+            "data": [DATASET, dict(DATASET, seasonality_components=[{"frequency_type": "yearly"}])]
+        })
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        with self.assertRaises(ValidationError):
+            serializer.save()
+        self.assertFalse(Simulator.objects.exists())
+
+    def test_listing_uses_constant_queries(self):
+        self._create(2)
+        # The version of each table for the ETag, then the simulators, datasets and seasonality components
+        with self.assertNumQueries(6):
+            response = self.client.get(reverse('simulator-list-create'))
+        self.assertEqual(len(response.data), 2)
+        self._create(5)
+        with self.assertNumQueries(6):
+            response = self.client.get(reverse('simulator-list-create'))
+        self.assertEqual(len(response.data), 7)
+        self.assertTrue(all(len(simulator['data'][0]['seasonality_components']) == 2 for simulator in response.data))
+
+
+class ConditionalListTest(TestCase):
+    _create = SerializerQueryTest._create
+
+    def test_unchanged_list_is_not_modified(self):
+        self._create(2)
+        url = reverse('simulator-list-create')
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertIn('Last-Modified', response)
+        with self.assertNumQueries(3):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+
+        seasonality = Seasonality.objects.first()
+        seasonality.amplitude = 5
+        seasonality.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        Dataset.objects.first().delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_cursor_pagination(self):
+        self._create(5)
+        url = reverse('simulator-list-create')
+        self.assertEqual(len(self.client.get(url).data), 5)
+        response = self.client.get(url, {'page_size': 2})
+        names = [simulator['name'] for simulator in response.data['results']]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            names += [simulator['name'] for simulator in response.data['results']]
+        self.assertEqual(names, [f'Simulator {i}' for i in range(5)])
+        self.assertEqual(len(self.client.get(url, {'page_size': 5000}).data['results']), 5)
+
+
+class BulkCreateTest(TestCase):
+    def _simulators(self, count):
+        return [{
+            "name": f"Bulk {i}",
+            "use_case": "Use Case",
+            "meta_data": "Meta Data",
+            "start_date": "2020-01-01T00:00:00Z",
+            "end_date": "2020-01-02T00:00:00Z",
+            "series_type": "additive",
+            "data": [DATASET, dict(DATASET, frequency="1D")]
+        } for i in range(count)]
+
+    def test_queries_do_not_grow_with_simulators(self):
+        url = reverse('simulator-bulk-create')
+        # The simulators, datasets and components, the savepoints, then reading the three tables back
+        with self.assertNumQueries(8):
+            response = self.client.post(url, self._simulators(3), content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, self._simulators(50), content_type='application/json')
+        # SQLite binds at most 999 parameters per statement, so the larger inserts are split into a few batches
+        self.assertLess(len(queries), 15)
+        self.assertEqual([simulator['name'] for simulator in response.data], [f'Bulk {i}' for i in range(50)])
+        self.assertEqual(Dataset.objects.count(), 106)
+        self.assertEqual(Seasonality.objects.filter(dataset_id__simulator_id__name='Bulk 49').count(), 4)
+
+    def test_per_item_errors_create_nothing(self):
+        simulators = self._simulators(4)
+        simulators[1]['series_type'] = 'exponential'
+        simulators[2]['data'][1] = dict(DATASET, seasonality_components=[{"frequency_type": "yearly"}])
+        del simulators[3]['end_date']
+        response = self.client.post(reverse('simulator-bulk-create'), simulators, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()['errors']
+        self.assertEqual(errors[0], {})
+        self.assertIn('series_type', errors[1])
+        self.assertIn('frequency_type', errors[2]['data'])
+        self.assertIn('end_date', errors[3])
+        self.assertFalse(Simulator.objects.exists())
+
+    def test_mutation(self):
+        query = """mutation ($simulators: [SimulatorInput!]!) {
+            bulkCreateSimulators(inputData: $simulators) {
+                simulators { name datasetSet { frequency seasonalitySet { frequencyType } } }
+                errors { index errors } } }"""
+        simulators = [dict(simulator, startDate=simulator.pop('start_date'), endDate=simulator.pop('end_date'),
+                           seriesType=simulator.pop('series_type'), useCase=simulator.pop('use_case'),
+                           metaData=simulator.pop('meta_data'), data=json.dumps(simulator.pop('data')))
+                      for simulator in self._simulators(2)]
+        response = self.client.post('/simulator/graphql', json.dumps({'query': query,
+                                                                      'variables': {'simulators': simulators}}),
+                                    content_type='application/json').json()
+        result = response['data']['bulkCreateSimulators']
+        self.assertEqual(result['errors'], [])
+        self.assertEqual([simulator['name'] for simulator in result['simulators']], ['Bulk 0', 'Bulk 1'])
+        self.assertEqual(len(result['simulators'][1]['datasetSet'][0]['seasonalitySet']), 2)
+
+        simulators[1]['seriesType'] = 'exponential'
+        response = self.client.post('/simulator/graphql', json.dumps({'query': query,
+                                                                      'variables': {'simulators': simulators}}),
+                                    content_type='application/json').json()
+        result = response['data']['bulkCreateSimulators']
+        self.assertEqual(result['simulators'], [])
+        self.assertEqual(result['errors'][0]['index'], 1)
+        self.assertIn('series_type', json.loads(result['errors'][0]['errors']))
+        self.assertEqual(Simulator.objects.count(), 2)
+
+
+class GraphQLQueryTest(TestCase):
+    QUERY = """
+        query {
+            simulators {
+                name
+                datasetSet {
+                    frequency
+                    simulatorId { name }
+                    seasonalitySet { frequencyType datasetId { frequency } }
+                }
+            }
+        }
+    """
+
+    def _create(self, count):
+        for i in range(count):
+            serializer = SimulatorSerializer(data={
+                "name": f"Simulator {i}",
+                "use_case": "Use Case",
+                "meta_data": "Meta Data",
+                "start_date": "2020-01-01T00:00:00Z",
+                "end_date": "2020-01-02T00:00:00Z",
+                "series_type": "additive",
+                "data": [DATASET, dict(DATASET, frequency="1D")]
+            })
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+            serializer.save()
+
+    def _query(self, query):
+        response = self.client.post('/simulator/graphql', json.dumps({'query': query}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()['data']
+
+    def test_nested_query_uses_constant_queries(self):
+        self._create(2)
+        with self.assertNumQueries(3):
+            data = self._query(self.QUERY)
+        self.assertEqual(len(data['simulators']), 2)
+        self._create(6)
+        with self.assertNumQueries(3):
+            data = self._query(self.QUERY)
+        self.assertEqual(len(data['simulators']), 8)
+        dataset = data['simulators'][7]['datasetSet'][1]
+        self.assertEqual(dataset['simulatorId']['name'], 'Simulator 5')
+        self.assertEqual([seasonality['datasetId']['frequency'] for seasonality in dataset['seasonalitySet']],
+                         ['1D', '1D'])
+
+    def test_forward_lookups_are_joined(self):
+        self._create(3)
+        simulator_id = Simulator.objects.order_by('id').last().id
+        # The simulator is joined into the datasets query
+        with self.assertNumQueries(1):
+            data = self._query('query { datasets(simulatorId: %d) { frequency simulatorId { name } } }'
+                               % simulator_id)
+        self.assertEqual([dataset['simulatorId']['name'] for dataset in data['datasets']], ['Simulator 2'] * 2)
+
+    def test_unselected_columns_are_not_read(self):
+        self._create(2)
+        Simulator.objects.update(data={'points': list(range(1000))})
+        query = """
+            fragment Status on SimulatorType { status }
+            query {
+                simulators { id ...Status }
+                allSimulators(first: 1) { edges { node { name ... on SimulatorType { seriesType } } } }
+            }
+        """
+        with CaptureQueriesContext(connection) as queries:
+            data = self._query(query)
+        self.assertEqual(data['simulators'][0]['status'], 'SUBMITTED')
+        self.assertEqual(data['allSimulators']['edges'][0]['node']['seriesType'], 'ADDITIVE')
+        self.assertEqual(len(queries), 2)
+        for captured in queries:
+            self.assertNotIn('"data"', captured['sql'])
+            self.assertNotIn('"use_case"', captured['sql'])
+        self.assertIn('"status"', queries[0]['sql'])
+        self.assertIn('"series_type"', queries[1]['sql'])
+
+    def test_relations_selected_twice_are_prefetched_once(self):
+        self._create(2)
+        aliased = 'query { simulators { a: datasetSet { frequency } b: datasetSet { noiseType } } }'
+        with self.assertNumQueries(2):
+            data = self._query(aliased)
+        self.assertEqual([dataset['frequency'] for dataset in data['simulators'][1]['a']], ['1h', '1D'])
+        self.assertEqual(len(data['simulators'][1]['b']), 2)
+        fragment = """
+            fragment Seasonality on DatasetType { seasonalitySet { frequencyType } }
+            query { simulators { datasetSet { frequency seasonalitySet { amplitude } ...Seasonality } } }
+        """
+        with self.assertNumQueries(3):
+            data = self._query(fragment)
+        seasonality = data['simulators'][0]['datasetSet'][0]['seasonalitySet'][0]
+        self.assertEqual(set(seasonality), {'amplitude', 'frequencyType'})
+
+
+class GraphQLConnectionTest(TestCase):
+    def setUp(self):
+        for i in range(7):
+            Simulator.objects.create(name=f"Simulator {i}", start_date=f"2020-01-0{i + 1}T00:00:00Z",
+                                     end_date="2020-02-01T00:00:00Z", series_type="additive",
+                                     status="Running" if i % 2 else "Submitted", use_case="Use Case",
+                                     meta_data="Meta Data")
+
+    def _query(self, query):
+        response = self.client.post('/simulator/graphql', json.dumps({'query': query}),
+                                    content_type='application/json')
+        return response.json()
+
+    def _page(self, arguments):
+        return self._query('query { allSimulators(%s) { edges { cursor node { name } } '
+                           'pageInfo { hasNextPage hasPreviousPage endCursor startCursor } } }'
+                           % arguments)['data']['allSimulators']
+
+    def test_pages_follow_cursors(self):
+        names = []
+        after = ''
+        while True:
+            page = self._page(f'first: 3{after}')
+            names += [edge['node']['name'] for edge in page['edges']]
+            if not page['pageInfo']['hasNextPage']:
+                break
+            after = f', after: "{page["pageInfo"]["endCursor"]}"'
+        self.assertEqual(names, [f'Simulator {i}' for i in range(7)])
+        page = self._page(f'last: 2, before: "{self._page("first: 5")["pageInfo"]["endCursor"]}"')
+        self.assertEqual([edge['node']['name'] for edge in page['edges']], ['Simulator 2', 'Simulator 3'])
+        self.assertTrue(page['pageInfo']['hasPreviousPage'])
+
+    def test_filters_and_total_count(self):
+        query = ('query { allSimulators(first: 2, status: "Running", startDateFrom: "2020-01-03T00:00:00Z") '
+                 '{ totalCount edges { node { name } } } }')
+        data = self._query(query)['data']['allSimulators']
+        self.assertEqual(data['totalCount'], 2)
+        self.assertEqual([edge['node']['name'] for edge in data['edges']], ['Simulator 3', 'Simulator 5'])
+
+    def test_total_count_is_lazy(self):
+        # Only the page is read when totalCount is not selected
+        with self.assertNumQueries(1):
+            self._page('first: 3')
+
+    def test_invalid_arguments(self):
+        self.assertIn('Invalid cursor', self._query('query { allSimulators(after: "x") { totalCount } }')
+                      ['errors'][0]['message'])
+        self.assertIn('Page size', self._query('query { allSimulators(first: 5000) { totalCount } }')
+                      ['errors'][0]['message'])
+
+
+class CachedGraphQLViewTest(TestCase):
+    def setUp(self):
+        graphql_metrics.clear()
+        document_cache.clear()
+        Simulator.objects.create(name="Simulator", start_date="2020-01-01T00:00:00Z", end_date="2020-02-01T00:00:00Z",
+                                 series_type="additive", use_case="Use Case", meta_data="Meta Data")
+
+    def _post(self, body):
+        return self.client.post('/simulator/graphql', json.dumps(body), content_type='application/json').json()
+
+    def test_documents_are_cached(self):
+        for _ in range(3):
+            self.assertEqual(self._post({'query': '{ simulators { name } }'})['data']['simulators'][0]['name'],
+                             'Simulator')
+        metrics = graphql_metrics.snapshot()
+        self.assertEqual((metrics['document_cache_misses'], metrics['document_cache_hits']), (1, 2))
+
+    def test_cached_documents_are_not_parsed_again(self):
+        query = '{ simulators { name } }'
+        self._post({'query': query})
+        with mock.patch('simulator_api.graphql_view.parse') as cache_parse, \
+                mock.patch('graphene_django.views.parse') as view_parse:
+            self.assertEqual(self._post({'query': query})['data'], {'simulators': [{'name': 'Simulator'}]})
+        cache_parse.assert_not_called()
+        view_parse.assert_not_called()
+
+    def test_mutations_are_refused_over_get(self):
+        response = self.client.get('/simulator/graphql', {'query': 'mutation { __typename }'})
+        self.assertEqual(response.status_code, 405)
+
+    def test_persisted_queries(self):
+        query = '{ simulators { status } }'
+        extensions = {'persistedQuery': {'version': 1,
+                                         'sha256Hash': hashlib.sha256(query.encode('utf-8')).hexdigest()}}
+        response = self._post({'extensions': extensions})
+        self.assertEqual(response['errors'][0]['message'], 'PersistedQueryNotFound')
+        self.assertEqual(self._post({'query': query, 'extensions': extensions})['data'],
+                         {'simulators': [{'status': 'SUBMITTED'}]})
+        self.assertEqual(self._post({'extensions': extensions})['data'], {'simulators': [{'status': 'SUBMITTED'}]})
+        wrong_hash = {'persistedQuery': {'version': 1, 'sha256Hash': '0' * 64}}
+        self.assertEqual(self._post({'query': query, 'extensions': wrong_hash})['errors'][0]['extensions']['code'],
+                         'INVALID_HASH')
+
+    def test_malformed_extensions_are_bad_requests(self):
+        for extensions in ([1], '[1]', {'persistedQuery': 'abc'}, {'persistedQuery': {'sha256Hash': 1}}):
+            response = self.client.post('/simulator/graphql', json.dumps({'query': '{ simulators { name } }',
+                                                                          'extensions': extensions}),
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 400, extensions)
+
+    @override_settings(GRAPHQL_LIMITS={'max_depth': 4, 'max_cost': 5000, 'list_cost': 10, 'document_cache_size': 10})
+    def test_complex_queries_are_rejected(self):
+        deep = '{ simulators { datasetSet { seasonalitySet { datasetId { simulatorId { name } } } } } }'
+        response = self.client.post('/simulator/graphql', json.dumps({'query': deep}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'][0]['extensions']['code'], 'MAX_DEPTH_EXCEEDED')
+        wide = '{ allSimulators(first: 1000) { edges { node { name status seriesType } } } }'
+        self.assertEqual(self._post({'query': wide})['errors'][0]['extensions']['code'], 'MAX_COST_EXCEEDED')
+        self.assertIn('data', self._post({'query': '{ allSimulators(first: 100) { edges { node { name } } } }'}))
+        metrics = self.client.get(reverse('graphql-metrics')).json()
+        self.assertEqual((metrics['rejected_depth'], metrics['rejected_cost']), (1, 1))
+
+    def test_fragment_doubling_is_rejected_quickly(self):
+        # Each fragment spreads the previous one twice, doubling the cost 40 times in a 2 KB document
+        fragments = ['fragment F0 on SimulatorType { name }'] + [
+            f'fragment F{i} on SimulatorType {{ ...F{i - 1} ...F{i - 1} }}' for i in range(1, 41)]
+        query = '{ simulators { ...F40 } } ' + ' '.join(fragments)
+        start = time.perf_counter()
+        response = self._post({'query': query})
+        self.assertLess(time.perf_counter() - start, 1.0)
+        self.assertEqual(response['errors'][0]['extensions']['code'], 'MAX_COST_EXCEEDED')
+
+    @override_settings(GRAPHQL_LIMITS={'max_depth': 4, 'max_cost': 5000, 'list_cost': 10, 'document_cache_size': 10})
+    def test_variable_page_sizes_are_costed_with_their_values(self):
+        query = 'query($first: Int) { allSimulators(first: $first) { edges { node { name status seriesType } } } }'
+        # Costed at the default page size when validated, so the document is accepted and cached
+        self.assertIn('data', self._post({'query': query}))
+        self.assertIn('data', self._post({'query': query, 'variables': {'first': 100}}))
+        response = self._post({'query': query, 'variables': {'first': 1000}})
+        self.assertEqual(response['errors'][0]['extensions']['code'], 'MAX_COST_EXCEEDED')
+        self.assertNotIn('data', response)
+        metrics = graphql_metrics.snapshot()
+        self.assertEqual((metrics['document_cache_misses'], metrics['document_cache_hits']), (1, 2))
+        self.assertEqual(metrics['rejected_cost'], 1)
+
+
+class AsyncViewTest(TestCase):
+    def setUp(self):
+        self.simulator = Simulator.objects.create(name="Simulator", start_date="2020-01-01T00:00:00Z",
+                                                  end_date="2020-02-01T00:00:00Z", series_type="additive",
+                                                  use_case="Use Case", meta_data="Meta Data")
+
+    def test_views_are_async(self):
+        for view in (RunSimulatorView, StopSimulatorView, SimulatorStatusView, AsyncCachedGraphQLView):
+            self.assertTrue(view.view_is_async)
+
+    def test_simulator_status(self):
+        response = self.client.get(reverse('simulator-status', args=[self.simulator.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'id': self.simulator.pk, 'status': 'Submitted', 'process_id': None,
+                                           'run_info': self.simulator.run_info})
+        response = self.client.get(reverse('simulator-status', args=[self.simulator.pk + 1]))
+        self.assertEqual(response.status_code, 404)
+
+
+class AsyncGraphQLViewTest(TransactionTestCase):
+    # The async view queries from an executor thread with its own connection, so the data must be committed
+    def test_query(self):
+        Simulator.objects.create(name="Simulator", start_date="2020-01-01T00:00:00Z", end_date="2020-02-01T00:00:00Z",
+                                 series_type="additive", use_case="Use Case", meta_data="Meta Data")
+        view = AsyncCachedGraphQLView.as_view(schema=schema)
+        request = AsyncRequestFactory().post('/simulator/graphql', json.dumps({'query': '{ simulators { name } }'}),
+                                             content_type='application/json')
+        response = asyncio.run(view(request))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['data'], {'simulators': [{'name': 'Simulator'}]})
+
+
+class JobQueueTest(TestCase):
+    def setUp(self):
+        self.simulators = [Simulator.objects.create(name=f"Simulator {i}", start_date="2020-01-01T00:00:00Z",
+                                                    end_date="2020-02-01T00:00:00Z", series_type="additive",
+                                                    use_case="Use Case", meta_data="Meta Data") for i in range(3)]
+
+    @override_settings(SIMULATOR_QUEUE={'concurrency': 1, 'max_depth': 1, 'poll_interval': 0.1})
+    def test_run_is_queued_with_backpressure(self):
+        first, second = self.simulators[:2]
+        response = self.client.post(reverse('run-simulator', args=[first.pk]) + '?priority=3')
+        self.assertEqual(response.status_code, 200)
+        job = SimulatorJob.objects.get(id=response.json()['job_id'])
+        self.assertEqual((job.simulator_id_id, job.priority, job.status), (first.pk, 3, 'Queued'))
+        self.assertEqual(Simulator.objects.get(pk=first.pk).status, 'Running')
+
+        response = self.client.post(reverse('run-simulator', args=[second.pk]))
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+        self.assertEqual(Simulator.objects.get(pk=second.pk).status, 'Submitted')
+        self.assertEqual(self.client.post(reverse('run-simulator', args=[second.pk]) + '?priority=high').status_code,
+                         400)
+
+        self.client.post(reverse('stop-simulator', args=[first.pk]))
+        self.assertEqual(SimulatorJob.objects.get(id=job.id).status, 'Cancelled')
+        self.assertEqual(self.client.post(reverse('run-simulator', args=[second.pk])).status_code, 200)
+
+    def test_claim_order(self):
+        a, b, c = (simulator.pk for simulator in self.simulators)
+        a1, a2 = job_queue.enqueue(a), job_queue.enqueue(a)
+        b1 = job_queue.enqueue(b)
+        c1 = job_queue.enqueue(c, priority=5)
+        # Priority first, then oldest, never two runs of one simulator at once
+        self.assertEqual([job_queue.claim_job('worker').id for _ in range(3)], [c1.id, a1.id, b1.id])
+        self.assertIsNone(job_queue.claim_job('worker'))
+        job_queue.finish_job(a1, 'Succeeded')
+        self.assertEqual(job_queue.claim_job('worker').id, a2.id)
+
+    def test_fair_between_simulators(self):
+        a, b = self.simulators[0].pk, self.simulators[1].pk
+        job_queue.enqueue(a)
+        job_queue.finish_job(job_queue.claim_job('worker'), 'Succeeded')
+        job_queue.enqueue(a)
+        later = job_queue.enqueue(b)
+        # b has never started, so it goes before a although it was queued later
+        self.assertEqual(job_queue.claim_job('worker').id, later.id)
+
+    def test_work(self):
+        a, b = self.simulators[0].pk, self.simulators[1].pk
+        job_queue.enqueue(a)
+        job_queue.enqueue(b)
+        queued_at = Simulator.objects.get(pk=a).updated_at
+        with mock.patch('simulator_api.timeseries.simulator.run_simulator', side_effect=['Succeeded', Exception('boom')]):
+            self.assertEqual(job_queue.work('worker', drain=True), 2)
+        self.assertEqual(dict(SimulatorJob.objects.values_list('simulator_id', 'status')),
+                         {a: 'Succeeded', b: 'Failed'})
+        self.assertEqual(Simulator.objects.get(pk=a).process_id, os.getpid())
+        # The process_id is in the simulator list, so its version moves with it
+        self.assertGreater(Simulator.objects.get(pk=a).updated_at, queued_at)
+        for simulator_id in (a, b):
+            if os.path.exists(f'simulate_simulator_{simulator_id}.log'):
+                os.remove(f'simulate_simulator_{simulator_id}.log')
+
+    def test_dead_worker_jobs_fail(self):
+        a, b = self.simulators[0].pk, self.simulators[1].pk
+        job_queue.enqueue(a)
+        job_queue.enqueue(b)
+        job_queue.claim_job('dead')
+        job_queue.claim_job('dead')
+        Simulator.objects.filter(pk=b).update(status='Stopped')
+        job_queue.fail_worker_jobs('dead')
+        self.assertEqual(dict(SimulatorJob.objects.values_list('simulator_id', 'status')),
+                         {a: 'Failed', b: 'Cancelled'})
+        self.assertEqual(Simulator.objects.get(pk=a).status, 'Failed')
+
+
+class ScheduleTest(TestCase):
+    def test_due_simulators_by_interval(self):
+        ids = {}
+        for name, interval, status, emission_mode in [('daily', 1, 'Succeeded', 'batch'),
+                                                      ('weekly', 7, 'Submitted', 'incremental'),
+                                                      ('running', 1, 'Running', 'batch'),
+                                                      ('stopped', 1, 'Stopped', 'batch'),
+                                                      ('realtime', 1, 'Submitted', 'realtime'),
+                                                      ('unscheduled', None, 'Submitted', 'batch')]:
+            ids[name] = Simulator.objects.create(name=name, start_date="2020-01-01T00:00:00Z",
+                                                 end_date="2020-02-01T00:00:00Z", series_type="additive",
+                                                 use_case="Use Case", meta_data="Meta Data", interval=interval,
+                                                 status=status, emission_mode=emission_mode).pk
+        self.assertEqual(simulator.scheduled_simulator_ids(3), [ids['daily'], ids['stopped']])
+        with self.assertNumQueries(2):
+            self.assertEqual(simulator.scheduled_simulator_ids(14), [ids['daily'], ids['weekly'], ids['stopped']])
+
+
+class EditDataNoiseTest(TestCase):
+    def setUp(self):
+        self.data = pd.Series(np.linspace(-1, 1, 1000))
+
+    def _apply(self, noise_type, seed):
+        edit = EditData(self.data.copy(), 0.1, 0.2, 0.05, noise_type, np.random.default_rng(seed))
+        return edit.apply()
+
+    def test_seeded_run_is_reproducible(self):
+        for noise_type in NOISE_TYPES:
+            data, anomaly_mask = self._apply(noise_type, 42)
+            same_data, same_mask = self._apply(noise_type, 42)
+            np.testing.assert_array_equal(data.values, same_data.values)
+            np.testing.assert_array_equal(anomaly_mask, same_mask)
+
+    def test_percentages_are_applied(self):
+        data, anomaly_mask = self._apply('laplace', 1)
+        self.assertEqual(int(data.isna().sum()), 100)
+        self.assertEqual(int(anomaly_mask.sum()), 50)
+
+    def test_no_noise_keeps_data(self):
+        edit = EditData(self.data.copy(), 0, 0, 0, 'gaussian', np.random.default_rng(0))
+        edit.add_noise()
+        np.testing.assert_array_equal(edit.data.values, self.data.values)
+
+    def test_unsupported_noise_type(self):
+        with self.assertRaises(ValueError):
+            EditData(self.data.copy(), 0, 0.1, 0, 'pink').add_noise()
+
+
+class TimeSeriesChunksTest(TestCase):
+    def setUp(self):
+        self.dataset = copy.deepcopy(DATASET)
+
+    def _generate(self, series_type, chunk_size, end_date='2020-03-01', data_size=None):
+        time_series = TimeSeries('2020-01-01', end_date, series_type, data_size, self.dataset)
+        date_time_series, data, anomaly_mask = time_series.generate_data()
+        chunks = list(time_series.generate_chunks(chunk_size))
+        return date_time_series, data, anomaly_mask, chunks, SeriesData.concatenate(chunks)
+
+    def test_chunks_match_generate_data(self):
+        for series_type in ('additive', 'multiplicative'):
+            date_time_series, data, _, chunks, series = self._generate(series_type, 100)
+            self.assertTrue(all(len(chunk) <= 100 for chunk in chunks))
+            self.assertTrue(series.date_rng().equals(date_time_series))
+            np.testing.assert_allclose(series.values, data.values)
+
+    def test_chunks_with_data_size(self):
+        date_time_series, _, _, _, series = self._generate('additive', 64, end_date=None, data_size=1000)
+        self.assertEqual(len(series), 1000)
+        self.assertEqual(series.date_rng()[-1], date_time_series[-1])
+
+    def test_chunks_keep_anomaly_totals(self):
+        self.dataset.update(missing_percentage=0.1, outlier_percentage=0.05, noise_level=0.1)
+        _, _, _, _, series = self._generate('additive', 100)
+        self.assertEqual(int(np.isnan(series.values).sum()), int(1441 * 0.1))
+        self.assertEqual(int(series.anomaly.sum()), int(1441 * 0.05))
+
+    def test_batch_matches_single_datasets(self):
+        self.dataset.update(missing_percentage=0.1, outlier_percentage=0.05, noise_level=0.1)
+        other = dict(self.dataset, seed=8, trend_coefficient=[1, -0.2], seasonality_components=[
+            {"frequency_type": "monthly", "amplitude": 3.0, "phase_shift": 0.0, "frequency_multiplier": 1}])
+        for series_type in ('additive', 'multiplicative'):
+            time_series = [TimeSeries('2020-01-01', '2020-03-01', series_type, None, dataset)
+                           for dataset in (self.dataset, other)]
+            batch = list(BatchTimeSeries(time_series).generate_chunks(100))
+            for row, series in enumerate(time_series):
+                single = SeriesData.concatenate(series.generate_chunks(100))
+                batched = SeriesData.concatenate(chunks[row] for chunks in batch)
+                np.testing.assert_array_equal(batched.timestamps, single.timestamps)
+                np.testing.assert_allclose(batched.values, single.values)
+                np.testing.assert_array_equal(batched.anomaly, single.anomaly)
+
+    def test_batch_requires_shared_frequency(self):
+        with self.assertRaises(ValueError):
+            BatchTimeSeries([TimeSeries('2020-01-01', '2020-03-01', 'additive', None, self.dataset),
+                             TimeSeries('2020-01-01', '2020-03-01', 'additive', None,
+                                        dict(self.dataset, frequency='1D'))])
+
+
+class SeriesDataTest(TestCase):
+    def setUp(self):
+        self.date_rng = pd.date_range('2020-01-01T00:00:00Z', periods=21, freq='1h')
+        self.anomaly = np.arange(21) % 3 == 0
+        self.series = SeriesData.from_arrays(self.date_rng, np.arange(21.0), self.anomaly)
+
+    def test_columns(self):
+        self.assertEqual(self.series.timestamps.dtype, np.int64)
+        self.assertEqual(self.series.packed_anomaly.nbytes, 3)
+        np.testing.assert_array_equal(self.series.anomaly, self.anomaly)
+        self.assertTrue(self.series.date_rng().equals(self.date_rng))
+
+    def test_slicing_is_zero_copy(self):
+        part = self.series[5:18]
+        self.assertEqual(len(part), 13)
+        self.assertTrue(np.shares_memory(part.values, self.series.values))
+        self.assertTrue(np.shares_memory(part.packed_anomaly, self.series.packed_anomaly))
+        np.testing.assert_array_equal(part.anomaly, self.anomaly[5:18])
+        np.testing.assert_array_equal(part[2:4].anomaly, self.anomaly[7:9])
+
+    def test_format_timestamps(self):
+        self.assertEqual(self.series.format_timestamps()[1], '2020-01-01 01:00:00+00:00')
+        naive = SeriesData.from_arrays(pd.date_range('2020-01-01', periods=2, freq='500ms'), [0, 1], [0, 0])
+        self.assertEqual(list(naive.format_timestamps()), ['2020-01-01 00:00:00.000', '2020-01-01 00:00:00.500'])
+
+
+class CalendarCacheTest(TestCase):
+    def test_hits_and_misses(self):
+        cache = CalendarCache()
+        features = cache.get('2020-01-01', periods=48, freq='1h')
+        self.assertIs(cache.get(pd.Timestamp('2020-01-01'), periods=48, freq='h'), features)
+        np.testing.assert_array_equal(features.hour, features.index.hour)
+        self.assertFalse(features.dayofyear.flags.writeable)
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+
+    def test_memory_based_eviction(self):
+        size = CalendarCache().get('2020-01-01', periods=100, freq='1D').nbytes
+        cache = CalendarCache(max_bytes=2 * size)
+        for day in ('2020-01-01', '2021-01-01', '2020-01-01', '2022-01-01'):
+            cache.get(day, periods=100, freq='1D')
+        stats = cache.stats()
+        self.assertEqual((stats['entries'], stats['evictions'], stats['hits']), (2, 1, 1))
+        self.assertLessEqual(stats['bytes'], 2 * size)
+        # The least recently used range was evicted, the one used again was kept
+        cache.get('2020-01-01', periods=100, freq='1D')
+        self.assertEqual(cache.stats()['hits'], 2)
+
+    def test_sibling_datasets_reuse_chunks(self):
+        calendar_cache.clear()
+        time_series = [TimeSeries('2020-01-01', '2020-03-01', 'additive', None, DATASET) for _ in range(3)]
+        for series in time_series:
+            list(series.generate_chunks(100))
+        # 15 chunks are built once, every other pass over them is a hit
+        self.assertEqual(calendar_cache.stats()['misses'], 15)
+        self.assertEqual(calendar_cache.stats()['hits'], 75)
+
+
+class SimulatorWorkersTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.directory.name)
+        dataset = dict(DATASET, missing_percentage=0.1, outlier_percentage=0.05, noise_level=0.1, seed=None)
+        self.simulator_data = {
+            "name": "Workers",
+            "start_date": "2020-01-01T00:00:00Z",
+            "end_date": "2020-03-01T00:00:00Z",
+            "data_size": None,
+            "series_type": "additive",
+            "producer_type": "csv",
+            "data": [dataset, dict(dataset, frequency="1D"), dataset, dataset]
+        }
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.directory.cleanup()
+
+    def _run(self, workers, entropy=1234):
+        return simulator.Simulator(json.dumps(self.simulator_data), chunk_size=100).generate_data(workers, entropy)
+
+    def _outputs(self):
+        return [pd.read_csv(f'sample_datasets/Workers{i}.csv') for i in range(1, 5)]
+
+    def test_output_does_not_depend_on_workers(self):
+        run_info = self._run(1)
+        outputs = self._outputs()
+        self.assertEqual(run_info['workers'], 1)
+        parallel_info = self._run(3)
+        parallel_outputs = self._outputs()
+        self.assertEqual(parallel_info['workers'], 3)
+        self.assertEqual(parallel_info['entropy'], '1234')
+        for output, parallel_output in zip(outputs, parallel_outputs):
+            pd.testing.assert_frame_equal(output, parallel_output)
+        # Datasets without a stored seed get independent streams
+        self.assertFalse(outputs[0]['value'].equals(outputs[2]['value']))
+
+    def test_failures_are_reported_per_dataset(self):
+        self.simulator_data['data'][2] = dict(self.simulator_data['data'][2], seasonality_components=[
+            {"frequency_type": "yearly", "amplitude": 1.0, "phase_shift": 0.0, "frequency_multiplier": 1}])
+        run_info = self._run(1)
+        errors = {result['dataset']: result['error'] for result in run_info['datasets']}
+        self.assertEqual(errors, {1: None, 2: None, 3: 'Unsupported frequency_type', 4: None})
+
+    def test_wall_time_is_per_dataset(self):
+        write = DataProducerCSV.write
+
+        def slow_write(producer, chunk):
+            if producer.dataset_number == 3:
+                time.sleep(0.01)
+            write(producer, chunk)
+
+        with mock.patch.object(DataProducerCSV, 'write', autospec=True, side_effect=slow_write):
+            run_info = self._run(1)
+        wall_times = {result['dataset']: result['wall_time'] for result in run_info['datasets']}
+        # Datasets 1, 3 and 4 are one batch, 15 chunks of which dataset 3 writes slowly
+        self.assertGreater(wall_times[3], 0.15)
+        self.assertLess(wall_times[1], wall_times[3] - 0.1)
+        self.assertLess(wall_times[4], wall_times[3] - 0.1)
+
+
+@unittest.skipIf(pa is None, 'pyarrow is not installed')
+class ArrowProducerTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.directory.name)
+        dataset = dict(DATASET, missing_percentage=0.1, outlier_percentage=0.05, noise_level=0.1)
+        self.time_series = TimeSeries('2020-01-01T00:00:00Z', '2020-03-01T00:00:00Z', 'additive', None, dataset)
+        self.series = SeriesData.concatenate(self.time_series.generate_chunks(100))
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.directory.cleanup()
+
+    def _assert_written(self, table):
+        self.assertEqual(table.schema.field('timestamp').type, pa.timestamp('ns', tz='UTC'))
+        self.assertEqual(table.schema.field('anomaly').type, pa.bool_())
+        np.testing.assert_array_equal(table.column('timestamp').cast(pa.int64()).to_numpy(), self.series.timestamps)
+        np.testing.assert_array_equal(table.column('anomaly').to_numpy(), self.series.anomaly)
+        np.testing.assert_allclose(table.column('value').to_numpy(zero_copy_only=False), self.series.values)
+
+    def test_parquet_row_groups(self):
+        producer = DataProducerParquet(file_name='Arrow', dataset_number=1, row_group_size=500)
+        producer.save_chunks(self.time_series.generate_chunks(100))
+        parquet_file = pa.parquet.ParquetFile('sample_datasets/Arrow1.parquet')
+        self.assertEqual([parquet_file.metadata.row_group(i).num_rows for i in range(parquet_file.num_row_groups)],
+                         [500, 500, 441])
+        self.assertEqual(parquet_file.metadata.row_group(0).column(0).compression, 'ZSTD')
+        self._assert_written(parquet_file.read())
+
+    def test_feather(self):
+        DataProducerFeather(file_name='Arrow', dataset_number=1).save_chunks(self.time_series.generate_chunks(100))
+        self._assert_written(pa.ipc.open_file('sample_datasets/Arrow1.feather').read_all())
+
+    def test_abort_keeps_previous_file(self):
+        for producer_class in (DataProducerParquet, DataProducerFeather):
+            producer_class(file_name='Arrow', dataset_number=1).save_chunks(self.time_series.generate_chunks(100))
+            producer = producer_class(file_name='Arrow', dataset_number=1)
+            producer.open()
+            producer.write(next(iter(self.time_series.generate_chunks(10))))
+            producer.abort()
+        self.assertEqual(sorted(os.listdir('sample_datasets')), ['Arrow1.feather', 'Arrow1.parquet'])
+        self._assert_written(pa.ipc.open_file('sample_datasets/Arrow1.feather').read_all())
+        self._assert_written(pa.parquet.read_table('sample_datasets/Arrow1.parquet'))
+
+
+class SlowKafkaTransport(KafkaTransport):
+    """Acknowledges records from another thread, one at a time, like a slow broker."""
+
+    def __init__(self):
+        self.pending = []
+        self.condition = threading.Condition()
+        self.sent = 0
+        self.max_pending = 0
+        self.done = False
+        self.thread = threading.Thread(target=self._acknowledge)
+        self.thread.start()
+
+    def _acknowledge(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.pending or self.done)
+                if not self.pending:
+                    return
+                on_delivery = self.pending.pop(0)
+            on_delivery(None)
+
+    def send(self, topic, key, value, on_delivery):
+        with self.condition:
+            self.pending.append(on_delivery)
+            self.sent += 1
+            self.max_pending = max(self.max_pending, len(self.pending))
+            self.condition.notify()
+
+    def close(self):
+        with self.condition:
+            self.done = True
+            self.condition.notify()
+        self.thread.join()
+
+
+class FailingKafkaTransport(InMemoryKafkaTransport):
+    """Raises on every send after the first sent records, like a client whose metadata is unavailable."""
+
+    def __init__(self, sent):
+        super().__init__()
+        self.sent = sent
+
+    def send(self, topic, key, value, on_delivery):
+        if self.sent == 0:
+            raise TimeoutError('Failed to update metadata')
+        self.sent -= 1
+        super().send(topic, key, value, on_delivery)
+
+
+class KafkaProducerTest(TestCase):
+    def setUp(self):
+        self.time_series = TimeSeries('2020-01-01T00:00:00Z', '2020-01-10T00:00:00Z', 'additive', None,
+                                      dict(DATASET, missing_percentage=0.1))
+
+    def test_records_are_keyed_by_dataset(self):
+        transport = InMemoryKafkaTransport()
+        for dataset_number in (1, 2):
+            producer = DataProducerKafka(dataset_number=dataset_number, simulator_id=5, transport=transport,
+                                         topic='points')
+            producer.save_chunks(self.time_series.generate_chunks(50))
+            self.assertEqual(producer.throughput()['records'], 217)
+        records = transport.records('points')
+        self.assertEqual(len(records), 434)
+        for key in (b'5:1', b'5:2'):
+            partition = transport.topics['points'][transport.partition(key)]
+            points = [json.loads(value) for record_key, value in partition if record_key == key]
+            self.assertEqual(len(points), 217)
+            self.assertEqual(points[0]['timestamp'], pd.Timestamp('2020-01-01T00:00:00Z').value)
+            self.assertEqual(sum(point['value'] is None for point in points), 21)
+
+    def test_in_flight_records_are_bounded(self):
+        transport = SlowKafkaTransport()
+        try:
+            producer = DataProducerKafka(dataset_number=1, transport=transport, max_in_flight=4)
+            producer.save_chunks(self.time_series.generate_chunks(50))
+        finally:
+            transport.close()
+        self.assertEqual(transport.sent, 217)
+        self.assertLessEqual(transport.max_pending, 4)
+
+    def test_failed_send_releases_its_permit(self):
+        producer = DataProducerKafka(dataset_number=1, transport=FailingKafkaTransport(10), max_in_flight=4)
+        producer.open()
+        with self.assertRaises(TimeoutError):
+            producer.write(SeriesData.concatenate(self.time_series.generate_chunks(50)))
+        # Returns at once, every permit being back
+        producer.close()
+
+    def test_close_waits_for_at_most_delivery_timeout(self):
+        # A transport never acknowledging anything
+        producer = DataProducerKafka(dataset_number=1, transport=KafkaTransport(), delivery_timeout=0.1)
+        producer.open()
+        producer.write(SeriesData.concatenate(self.time_series.generate_chunks(50)))
+        with self.assertRaisesRegex(RuntimeError, 'timed out: 217 records'):
+            producer.close()
+        producer.abort()
+
+    def test_failed_batch_is_not_sent_again(self):
+        failing = mock.Mock(producer_type='kafka')
+        failing.generate_batch.side_effect = RuntimeError('Kafka delivery failed')
+        results = simulator._generate_datasets(failing, [0, 1], [1, 2])
+        failing.generate_batch.assert_called_once()
+        self.assertEqual([(result['dataset'], result['error']) for result in results],
+                         [(1, 'Kafka delivery failed'), (2, 'Kafka delivery failed')])
+
+    def test_unsupported_schema(self):
+        with self.assertRaises(ValueError):
+            DataProducerKafka(dataset_number=1, transport=InMemoryKafkaTransport(), schema='xml')
+
+    def test_chunk_records_match_point_records(self):
+        chunk = SeriesData.concatenate(self.time_series.generate_chunks(50))
+        serialize = get_serializer('json')
+        for simulator_id in (5, None):
+            expected = [serialize({'simulator': simulator_id, 'dataset': 2, 'timestamp': timestamp,
+                                   'value': None if np.isnan(value) else value, 'anomaly': anomaly})
+                        for timestamp, value, anomaly in zip(chunk.timestamps.tolist(), chunk.values.tolist(),
+                                                             chunk.anomaly.tolist())]
+            self.assertEqual(get_chunk_serializer('json')(simulator_id, 2, chunk.timestamps.tolist(),
+                                                          chunk.values.tolist(), chunk.anomaly.tolist()), expected)
+
+    def test_producers_share_one_client(self):
+        with mock.patch('simulator_api.timeseries.kafka_transport.KafkaPythonTransport') as transport_class, \
+                mock.patch('simulator_api.timeseries.kafka_transport.atexit'):
+            transport_class.return_value.send.side_effect = \
+                lambda topic, key, value, on_delivery: on_delivery(None)
+            producers = [DataProducerKafka(dataset_number=number, simulator_id=5, bootstrap_servers='shared:9092')
+                         for number in (1, 2)]
+            for producer in producers:
+                producer.save_chunks(self.time_series.generate_chunks(50))
+        transport_class.assert_called_once_with('shared:9092', 20, 64 * 1024, 'gzip')
+        self.assertIs(producers[0].transport, producers[1].transport)
+        self.assertEqual(transport_class.return_value.send.call_count, 434)
+        transport_class.return_value.close.assert_not_called()
+
+
+class RecordingProducer:
+    """
+    A producer stand-in recording the wall-clock time each chunk is written at, taking delay seconds per write.
+    """
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.writes = []
+        self.closed = False
+
+    def open(self):
+        pass
+
+    def write(self, chunk):
+        # The clock of the event loop, as writes run in its executor
+        self.writes.append((time.monotonic(), chunk.timestamps.copy()))
+        time.sleep(self.delay)
+
+    def close(self):
+        self.closed = True
+
+
+class PacedEmitterTest(TestCase):
+    def setUp(self):
+        # 121 points one simulated minute apart, emitted 240 points per second
+        self.simulator_data = {
+            "name": "Realtime",
+            "start_date": "2020-01-01T00:00:00Z",
+            "end_date": "2020-01-01T02:00:00Z",
+            "data_size": None,
+            "series_type": "additive",
+            "producer_type": "csv",
+            "emission_mode": "realtime",
+            "speed_factor": 60 * 240,
+            "data": [dict(DATASET, frequency="1min"), dict(DATASET, frequency="1min", seed=8)]
+        }
+
+    def _emitter(self, producers, delay=0.0):
+        def producer_factory(dataset_number):
+            producers[dataset_number] = RecordingProducer(delay)
+            return producers[dataset_number]
+        return PacedEmitter(simulator.Simulator(json.dumps(self.simulator_data)), producer_factory=producer_factory,
+                            chunk_size=32)
+
+    def assertOnTime(self, emitter, producers, wall_origin):
+        origin = pd.Timestamp('2020-01-01T00:00:00Z').value
+        expected = pd.date_range('2020-01-01', '2020-01-01 02:00', freq='1min', tz='UTC').as_unit('ns').asi8
+        for producer in producers.values():
+            self.assertTrue(producer.closed)
+            np.testing.assert_array_equal(np.concatenate([timestamps for _, timestamps in producer.writes]),
+                                          expected)
+            for wall_time, timestamps in producer.writes:
+                due = wall_origin + (timestamps - origin) / 1e9 / emitter.speed_factor
+                # Never early, and late by no more than a scheduling hiccup
+                self.assertTrue(np.all(wall_time >= due - 0.005))
+                self.assertTrue(np.all(wall_time - due < 0.1))
+        self.assertEqual(emitter.points, 242)
+
+    def test_points_are_emitted_on_time(self):
+        producers = {}
+        emitter = self._emitter(producers)
+
+        async def run():
+            wall_origin = asyncio.get_running_loop().time()
+            await emitter.run()
+            return wall_origin
+
+        self.assertOnTime(emitter, producers, asyncio.run(run()))
+
+    def test_slow_producer_does_not_delay_other_emitters(self):
+        producers, slow_producers = {}, {}
+        emitter = self._emitter(producers)
+        # Each blocking write would make the other emitter later than the 0.1 s tolerance
+        slow_emitter = self._emitter(slow_producers, delay=0.2)
+
+        async def run():
+            wall_origin = asyncio.get_running_loop().time()
+            await asyncio.gather(emitter.run(), slow_emitter.run())
+            return wall_origin
+
+        self.assertOnTime(emitter, producers, asyncio.run(run()))
+        self.assertTrue(all(producer.closed for producer in slow_producers.values()))
+
+    def test_many_simulators_share_one_loop(self):
+        producers = [{} for _ in range(50)]
+        emitters = [self._emitter(emitter_producers) for emitter_producers in producers]
+
+        async def run():
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            await asyncio.gather(*[emitter.run() for emitter in emitters])
+            return loop.time() - start
+
+        elapsed = asyncio.run(run())
+        # The 0.5 s of simulated time is not stretched by pacing 100 datasets concurrently
+        self.assertLess(elapsed, 1.5)
+        self.assertTrue(all(emitter.points == 242 for emitter in emitters))
+
+    def test_stop(self):
+        producers = {}
+        emitter = self._emitter(producers)
+
+        async def run():
+            asyncio.get_running_loop().call_later(0.1, emitter.stop)
+            await emitter.run()
+
+        asyncio.run(run())
+        self.assertLess(emitter.points, 242)
+        self.assertTrue(all(producer.closed for producer in producers.values()))
+
+
+class IncrementalRunTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.directory.name)
+        serializer = SimulatorSerializer(data={
+            "name": "Incremental",
+            "use_case": "Incremental Use Case",
+            "meta_data": "Incremental Meta Data",
+            "start_date": "2020-01-01T00:00:00Z",
+            "end_date": "2020-01-20T00:00:00Z",
+            "series_type": "additive",
+            "producer_type": "csv",
+            "emission_mode": "incremental",
+            "data": [dict(DATASET, missing_percentage=0.1, noise_level=0.1),
+                     dict(DATASET, frequency="1D", seed=None)]
+        })
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        self.model = serializer.save()
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.directory.cleanup()
+
+    def _run(self, until):
+        time_series_simulator = simulator.Simulator(json.dumps(SimulatorSerializer(self.model).data), chunk_size=50)
+        checkpoints = simulator.load_checkpoints(time_series_simulator.datasets)
+        run_info = time_series_simulator.generate_data(checkpoints=checkpoints, until=until)
+        simulator.save_checkpoints(time_series_simulator.datasets, run_info['datasets'])
+        return run_info
+
+    def test_runs_append_only_new_points(self):
+        self._run('2020-01-05T00:00:00Z')
+        first = pd.read_csv('sample_datasets/Incremental1.csv')
+        self.assertEqual(len(first), 4 * 24 + 1)
+        checkpoint = DatasetCheckpoint.objects.get(dataset_id__simulator_id=self.model, position=len(first))
+        self.assertEqual(checkpoint.last_timestamp, pd.Timestamp('2020-01-05T00:00:00Z'))
+
+        run_info = self._run('2020-01-12T00:00:00Z')
+        self.assertNotIn('checkpoint', run_info['datasets'][0])
+        self._run(None)
+        # Nothing is left to generate after the end date
+        self._run(None)
+        output = pd.read_csv('sample_datasets/Incremental1.csv')
+        expected = pd.date_range('2020-01-01', '2020-01-20', freq='1h', tz='UTC')
+        pd.testing.assert_index_equal(pd.DatetimeIndex(pd.to_datetime(output['timestamp'])), expected,
+                                      check_names=False)
+        pd.testing.assert_frame_equal(output[:len(first)], first)
+        # The missing values are spread over each run's new points
+        self.assertEqual(output['value'].isna().sum(), 9 + 16 + 19)
+        daily = pd.read_csv('sample_datasets/Incremental2.csv')
+        self.assertEqual(len(daily), 20)
+        self.assertEqual(set(DatasetCheckpoint.objects.values_list('position', flat=True)), {len(output), 20})
+
+    def test_seeded_runs_are_reproducible(self):
+        # The generator state goes through the database between runs, so it must round trip exactly
+        for until in ('2020-01-05T00:00:00Z', '2020-01-09T12:00:00Z', None):
+            self._run(until)
+        output = pd.read_csv('sample_datasets/Incremental1.csv')
+        DatasetCheckpoint.objects.all().delete()
+        os.remove('sample_datasets/Incremental1.csv')
+        for until in ('2020-01-05T00:00:00Z', '2020-01-09T12:00:00Z', None):
+            self._run(until)
+        pd.testing.assert_frame_equal(pd.read_csv('sample_datasets/Incremental1.csv'), output)
+
+
+class ProgressTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.directory.name)
+        serializer = SimulatorSerializer(data={
+            "name": "Progress",
+            "use_case": "Progress Use Case",
+            "meta_data": "Progress Meta Data",
+            "start_date": "2020-01-01T00:00:00Z",
+            "end_date": "2020-01-20T00:00:00Z",
+            "series_type": "additive",
+            "producer_type": "csv",
+            "data": [DATASET, dict(DATASET, frequency="1D")]
+        })
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        self.model = serializer.save()
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.directory.cleanup()
+
+    def test_updates_are_throttled(self):
+        reporter = ProgressReporter(self.model.id, interval=3600)
+        reporter.start()
+        for _ in range(10):
+            reporter.add(1, generated=100, written=100)
+        self.assertEqual(SimulatorProgress.objects.get(simulator_id=self.model).points_written, 0)
+        reporter.flush()
+        self.assertEqual(SimulatorProgress.objects.get(simulator_id=self.model).points_written, 1000)
+
+        # Worker processes queue their counts, the simulator's process saves them
+        reporter.queue = queue.Queue()
+        worker = copy.copy(reporter)
+        worker.add(2, generated=5)
+        worker.flush()
+        self.assertEqual(SimulatorProgress.objects.get(simulator_id=self.model).points_generated, 1000)
+        reporter.drain()
+        progress = SimulatorProgress.objects.get(simulator_id=self.model)
+        self.assertEqual((progress.points_generated, progress.current_dataset), (1005, 2))
+
+    def test_workers_report_progress(self):
+        time_series_simulator = simulator.Simulator(json.dumps(SimulatorSerializer(self.model).data), chunk_size=50)
+        time_series_simulator.progress = ProgressReporter(self.model.id, interval=0)
+        time_series_simulator.progress.start()
+        time_series_simulator.generate_data(workers=2)
+        time_series_simulator.progress.finish()
+        progress = SimulatorProgress.objects.get(simulator_id=self.model)
+        self.assertEqual((progress.points_generated, progress.points_written), (19 * 24 + 1 + 20, 19 * 24 + 1 + 20))
+        self.assertIsNone(time_series_simulator.progress.queue)
+
+    @override_settings(SIMULATOR_WORKERS=1, SIMULATOR_PROGRESS_INTERVAL=0)
+    def test_run_progress_over_rest_and_graphql(self):
+        self.assertEqual(self.client.get(reverse('simulator-progress', args=[self.model.id])).status_code, 404)
+        self.assertEqual(simulator.run_simulator(self.model.id), 'Succeeded')
+        response = self.client.get(reverse('simulator-progress', args=[self.model.id])).json()
+        self.assertEqual((response['points_generated'], response['points_written'], response['current_dataset']),
+                         (19 * 24 + 1 + 20, 19 * 24 + 1 + 20, 2))
+        self.assertIsNotNone(response['finished_at'])
+        self.assertGreater(response['points_per_second'], 0)
+
+        Simulator.objects.create(name="Never Run", start_date="2020-01-01T00:00:00Z",
+                                 end_date="2020-02-01T00:00:00Z", series_type="additive", use_case="Use Case",
+                                 meta_data="Meta Data")
+        query = '{ simulators { name progress { pointsWritten pointsPerSecond } } }'
+        with CaptureQueriesContext(connection) as queries:
+            result = self.client.post('/simulator/graphql', json.dumps({'query': query}),
+                                      content_type='application/json').json()
+        simulators = {row['name']: row['progress'] for row in result['data']['simulators']}
+        self.assertEqual(simulators['Progress']['pointsWritten'], 19 * 24 + 1 + 20)
+        self.assertGreater(simulators['Progress']['pointsPerSecond'], 0)
+        self.assertIsNone(simulators['Never Run'])
+        # The simulators and their progress, whatever the number of simulators
+        self.assertEqual(len(queries), 2)
+
+
+class CancellationTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.directory.name)
+        serializer = SimulatorSerializer(data={
+            "name": "Cancel",
+            "use_case": "Cancel Use Case",
+            "meta_data": "Cancel Meta Data",
+            "start_date": "2020-01-01T00:00:00Z",
+            "end_date": "2020-01-20T00:00:00Z",
+            "series_type": "additive",
+            "producer_type": "csv",
+            "data": [DATASET, dict(DATASET, frequency="1D")]
+        })
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        self.model = serializer.save()
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.directory.cleanup()
+
+    def _simulator(self):
+        return simulator.Simulator(json.dumps(SimulatorSerializer(self.model).data), chunk_size=50)
+
+    def _read(self):
+        return [pd.read_csv(f'sample_datasets/Cancel{number}.csv') for number in (1, 2)]
+
+    def test_stopped_run_resumes(self):
+        self._simulator().generate_data()
+        expected = self._read()
+        for number in (1, 2):
+            os.remove(f'sample_datasets/Cancel{number}.csv')
+
+        stopping = self._simulator()
+        stopping.cancel = CancelToken(self.model.id, interval=0)
+        write = DataProducerCSV.write
+
+        def write_and_stop(producer, chunk):
+            write(producer, chunk)
+            if producer.dataset_number == 1:
+                Simulator.objects.filter(pk=self.model.pk).update(status='Stopped')
+
+        checkpoints = [{}, {}]
+        with mock.patch.object(DataProducerCSV, 'write', autospec=True, side_effect=write_and_stop):
+            run_info = stopping.generate_data(checkpoints=checkpoints)
+        self.assertTrue(all(result['cancelled'] for result in run_info['datasets']))
+        # The hourly dataset was stopped after its first chunk, the daily one never started
+        self.assertEqual(len(pd.read_csv('sample_datasets/Cancel1.csv')), 50)
+        self.assertEqual(os.listdir('sample_datasets'), ['Cancel1.csv'])
+        simulator.save_checkpoints(stopping.datasets, run_info['datasets'])
+        self.assertEqual(list(DatasetCheckpoint.objects.values_list('position', flat=True)), [50])
+
+        Simulator.objects.filter(pk=self.model.pk).update(status='Running')
+        resuming = self._simulator()
+        resuming.cancel = CancelToken(self.model.id, interval=0)
+        run_info = resuming.generate_data(checkpoints=simulator.load_checkpoints(resuming.datasets))
+        self.assertFalse(any(result.get('cancelled') for result in run_info['datasets']))
+        for frame, expected_frame in zip(self._read(), expected):
+            pd.testing.assert_frame_equal(frame, expected_frame)
+
+    def test_failed_run_keeps_previous_output(self):
+        self._simulator().generate_data()
+        expected = open('sample_datasets/Cancel1.csv').read()
+        write = DataProducerCSV.write
+        writes = []
+
+        def write_and_fail(producer, chunk):
+            writes.append(chunk)
+            if len(writes) == 3:
+                raise OSError('disk full')
+            write(producer, chunk)
+
+        with mock.patch.object(DataProducerCSV, 'write', autospec=True, side_effect=write_and_fail):
+            run_info = self._simulator().generate_data()
+        self.assertEqual(run_info['datasets'][0]['error'], 'disk full')
+        self.assertEqual(open('sample_datasets/Cancel1.csv').read(), expected)
+        self.assertEqual(sorted(os.listdir('sample_datasets')), ['Cancel1.csv', 'Cancel2.csv'])
+
+    @override_settings(SIMULATOR_WORKERS=1, SIMULATOR_CANCEL_INTERVAL=0)
+    def test_stop_view_does_not_kill_the_run(self):
+        Simulator.objects.filter(pk=self.model.pk).update(status='Running', process_id=os.getpid())
+        response = self.client.post(reverse('stop-simulator', args=[self.model.pk]))
+        self.assertEqual(response.json(), {'message': f'Simulator {self.model.pk} has been stopped.'})
+        self.assertEqual(Simulator.objects.get(pk=self.model.pk).status, 'Stopped')
+
+        # The run sees the status before writing anything, and the next run starts from the beginning
+        self.assertEqual(simulator.run_simulator(self.model.id), 'Stopped')
+        self.assertFalse(os.path.exists('sample_datasets/Cancel1.csv'))
+        Simulator.objects.filter(pk=self.model.pk).update(status='Running')
+        self.assertEqual(simulator.run_simulator(self.model.id), 'Succeeded')
+        self.assertEqual([len(frame) for frame in self._read()], [19 * 24 + 1, 20])
+        self.assertFalse(DatasetCheckpoint.objects.exists())
+
+
+class ResultCacheTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.directory.name)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.directory.cleanup()
+
+    def _run(self, name, data, cache):
+        serializer = SimulatorSerializer(data={
+            "name": name, "use_case": "Use Case", "meta_data": "Meta Data",
+            "start_date": "2020-01-01T00:00:00Z", "end_date": "2020-01-20T00:00:00Z", "series_type": "additive",
+            "producer_type": "csv", "data": data
+        })
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        time_series_simulator = simulator.Simulator(json.dumps(SimulatorSerializer(serializer.save()).data))
+        time_series_simulator.result_cache = cache
+        return time_series_simulator.generate_data()
+
+    def test_identical_specs_are_linked_from_the_cache(self):
+        cache = ResultCache('cache')
+        data = [dict(DATASET, noise_level=0.1), dict(DATASET, frequency="1D"), dict(DATASET, seed=None)]
+        run_info = self._run('First', data, cache)
+        self.assertEqual(run_info['result_cache'], {'hits': 0, 'misses': 2, 'hit_rate': 0.0})
+        # The id of the dataset and the name of the simulator are not part of the spec
+        run_info = self._run('Second', data, cache)
+        self.assertEqual(run_info['result_cache'], {'hits': 2, 'misses': 0, 'hit_rate': 1.0})
+        self.assertEqual([result.get('cached') for result in run_info['datasets']], [True, True, None])
+        for number in (1, 2):
+            self.assertEqual(os.stat(f'sample_datasets/Second{number}.csv').st_ino,
+                             os.stat(f'sample_datasets/First{number}.csv').st_ino)
+        self.assertNotEqual(os.stat('sample_datasets/Second3.csv').st_ino,
+                            os.stat('sample_datasets/First3.csv').st_ino)
+
+        run_info = self._run('Third', [dict(DATASET, noise_level=0.2)], cache)
+        self.assertEqual(run_info['result_cache']['misses'], 1)
+        self.assertEqual({key: value for key, value in cache.stats().items() if key != 'bytes'},
+                         {'hits': 2, 'misses': 3, 'hit_rate': 0.4, 'evictions': 0, 'entries': 3,
+                          'max_bytes': 10 * 1024 ** 3})
+
+    def test_least_recently_used_entries_are_evicted(self):
+        self._run('Sized', [DATASET], ResultCache('sizing'))
+        cache = ResultCache('cache', max_bytes=int(os.path.getsize('sample_datasets/Sized1.csv') * 2.5))
+        self._run('A', [dict(DATASET, seed=1)], cache)
+        self._run('B', [dict(DATASET, seed=2)], cache)
+        self.assertEqual(self._run('A', [dict(DATASET, seed=1)], cache)['result_cache']['hits'], 1)
+        # B is the least recently used entry when a third one is added
+        self._run('D', [dict(DATASET, seed=3)], cache)
+        self.assertEqual((cache.stats()['entries'], cache.evictions), (2, 1))
+        self.assertEqual(self._run('B', [dict(DATASET, seed=2)], cache)['result_cache']['misses'], 1)
+
+        # An output linked from the cache is copied before it is appended to
+        self._run('C', [dict(DATASET, seed=1)], cache)
+        cached = open('sample_datasets/A1.csv').read()
+        producer = DataProducerCSV(file_name='C', dataset_number=1, append=True)
+        producer.save_chunks(TimeSeries("2020-02-01T00:00:00Z", "2020-02-02T00:00:00Z", "additive", None,
+                                        DATASET).generate_chunks())
+        self.assertEqual(open('sample_datasets/A1.csv').read(), cached)
+        self.assertGreater(os.path.getsize('sample_datasets/C1.csv'), len(cached))
+
+
+class DownsampleTest(TestCase):
+    def setUp(self):
+        dataset = dict(DATASET, missing_percentage=0.05, outlier_percentage=0.05, noise_level=0.1)
+        time_series = TimeSeries('2020-01-01T00:00:00Z', '2020-07-01T00:00:00Z', 'additive', None, dataset)
+        self.series = SeriesData.concatenate(time_series.generate_chunks(1000))
+
+    def test_lttb(self):
+        downsampled = downsample(self.series, 200, 'lttb')
+        self.assertEqual(len(downsampled), 200)
+        self.assertEqual(downsampled.total_points, len(self.series))
+        self.assertEqual((downsampled.timestamps[0], downsampled.timestamps[-1]),
+                         (self.series.timestamps[0], self.series.timestamps[-1]))
+        self.assertTrue(np.all(np.diff(downsampled.timestamps) > 0))
+        self.assertEqual(downsampled.anomaly_count.sum(), self.series.anomaly.sum())
+
+    def test_min_max_keeps_extremes(self):
+        downsampled = downsample(self.series, 101, 'minmax')
+        self.assertEqual(len(downsampled), 100)
+        self.assertEqual(np.nanmax(downsampled.values), np.nanmax(self.series.values))
+        self.assertEqual(np.nanmin(downsampled.values), np.nanmin(self.series.values))
+        self.assertEqual(downsampled.anomaly_count.sum(), self.series.anomaly.sum())
+
+    def test_short_series_is_kept(self):
+        downsampled = downsample(self.series[:50], 200)
+        np.testing.assert_array_equal(downsampled.values, self.series.values[:50])
+        np.testing.assert_array_equal(downsampled.anomaly_count, self.series.anomaly[:50])
+        with self.assertRaises(ValueError):
+            downsample(self.series, 2, 'lttb')
+
+
+class SeriesQueryTest(TestCase):
+    QUERY = """query ($id: Int!, $from: DateTime, $to: DateTime, $aggregation: SeriesAggregation) {
+        series(datasetId: $id, from: $from, to: $to, maxPoints: 50, aggregation: $aggregation) {
+            totalPoints anomalyCount points { timestamp value anomaly anomalyCount } } }"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.directory.name)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.directory.cleanup()
+
+    def _generate(self, producer_type, until=None):
+        serializer = SimulatorSerializer(data={
+            "name": "Series", "use_case": "Series Use Case", "meta_data": "Series Meta Data",
+            "start_date": "2020-01-01T00:00:00Z", "end_date": "2020-01-31T00:00:00Z", "series_type": "additive",
+            "producer_type": producer_type, "emission_mode": "incremental",
+            "data": [dict(DATASET, frequency="1D"), dict(DATASET, outlier_percentage=0.05, noise_level=0.1)]
+        })
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        model = serializer.save()
+        for run_until in ('2020-01-10T00:00:00Z', None):
+            time_series_simulator = simulator.Simulator(json.dumps(SimulatorSerializer(model).data))
+            checkpoints = simulator.load_checkpoints(time_series_simulator.datasets)
+            run_info = time_series_simulator.generate_data(checkpoints=checkpoints, until=run_until)
+            simulator.save_checkpoints(time_series_simulator.datasets, run_info['datasets'])
+        return model.dataset_set.order_by('id').last()
+
+    def _query(self, **variables):
+        response = self.client.post('/simulator/graphql', json.dumps({'query': self.QUERY, 'variables': variables}),
+                                    content_type='application/json')
+        return response.json()
+
+    def _assert_series(self, dataset, full):
+        series = self._query(id=dataset.id)['data']['series']
+        self.assertEqual(series['totalPoints'], len(full))
+        self.assertEqual(len(series['points']), 50)
+        self.assertEqual(series['anomalyCount'], full['anomaly'].sum())
+        self.assertEqual(pd.Timestamp(series['points'][-1]['timestamp']), pd.Timestamp('2020-01-31T00:00:00Z'))
+
+        series = self._query(id=dataset.id, aggregation='MINMAX', **{
+            'from': '2020-01-05T00:00:00+00:00', 'to': '2020-01-06T00:00:00+00:00'})['data']['series']
+        # A day of hourly points fits in maxPoints, so every point is returned
+        self.assertEqual(series['totalPoints'], 25)
+        self.assertEqual([point['value'] for point in series['points']],
+                         full['value'][4 * 24:5 * 24 + 1].tolist())
+
+    def test_csv(self):
+        dataset = self._generate('csv')
+        self._assert_series(dataset, pd.read_csv('sample_datasets/Series2.csv'))
+
+    @unittest.skipIf(pa is None, 'pyarrow is not installed')
+    def test_parquet_parts(self):
+        dataset = self._generate('parquet')
+        self.assertTrue(os.path.exists('sample_datasets/Series2-1.parquet'))
+        full = pd.concat([pd.read_parquet('sample_datasets/Series2.parquet'),
+                          pd.read_parquet('sample_datasets/Series2-1.parquet')], ignore_index=True)
+        self._assert_series(dataset, full)
+
+    def test_not_generated(self):
+        dataset = self._generate('csv')
+        os.remove('sample_datasets/Series2.csv')
+        self.assertIn('has not been generated', self._query(id=dataset.id)['errors'][0]['message'])
+
+
+class ChunkStoreTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = ChunkStore(self.directory.name)
+        dataset = dict(DATASET, missing_percentage=0.1, outlier_percentage=0.05, noise_level=0.1)
+        self.time_series = TimeSeries('2020-01-01T00:00:00Z', '2020-03-01T00:00:00Z', 'additive', None, dataset)
+        self.series = SeriesData.concatenate(self.time_series.generate_chunks(100))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _producer(self, **kwargs):
+        return DataProducerStore(simulator_id=1, dataset_id=2, root=self.directory.name, chunk_points=500, **kwargs)
+
+    def test_range_reads_only_overlapping_chunks(self):
+        producer = self._producer(run_id='run')
+        producer.save_chunks(self.time_series.generate_chunks(100))
+        index = self.store.read_index(1, 2, 'run')
+        self.assertEqual([chunk['points'] for chunk in index['chunks']], [500, 500, 441])
+        self.assertEqual(sum(chunk['anomalies'] for chunk in index['chunks']), self.series.anomaly.sum())
+
+        stored = self.store.read(1, 2)
+        np.testing.assert_array_equal(stored.timestamps, self.series.timestamps)
+        np.testing.assert_array_equal(stored.anomaly, self.series.anomaly)
+        np.testing.assert_allclose(stored.values, self.series.values)
+        self.assertEqual(stored.tz, 'UTC')
+
+        start, end = self.series.timestamps[600], self.series.timestamps[700]
+        with mock.patch.object(ChunkStore, '_read_chunk', wraps=self.store._read_chunk) as read_chunk:
+            window = self.store.read(1, 2, 'run', start, end)
+        self.assertEqual(read_chunk.call_count, 1)
+        np.testing.assert_array_equal(window.timestamps, self.series.timestamps[600:701])
+
+    def test_append_and_rollback(self):
+        chunks = list(self.time_series.generate_chunks(100))
+        self._producer(run_id='first').save_chunks(chunks[:6])
+        self._producer(run_id='second', append=True).save_chunks(chunks[6:])
+        self.assertEqual(self.store.runs(1, 2), ['first'])
+        np.testing.assert_array_equal(self.store.read(1, 2).timestamps, self.series.timestamps)
+
+        producer = self._producer(append=True)
+        producer.save_chunks(chunks[:7])
+        producer.rollback()
+        np.testing.assert_array_equal(self.store.read(1, 2).timestamps, self.series.timestamps)
+        # The index and the chunks of both runs, each run starting a new chunk
+        self.assertEqual(sorted(os.listdir(self.store.run_path(1, 2, 'first'))),
+                         [f'{sequence:08d}.npz' for sequence in range(4)] + ['index.json'])
+
+    def test_simulators_sharing_a_name_are_kept_apart(self):
+        models = []
+        for seed in (1, 2):
+            serializer = SimulatorSerializer(data={
+                "name": "Shared", "use_case": "Use Case", "meta_data": "Meta Data",
+                "start_date": "2020-01-01T00:00:00Z", "end_date": "2020-01-10T00:00:00Z", "series_type": "additive",
+                "producer_type": "store", "data": [dict(DATASET, noise_level=0.1, seed=seed)]
+            })
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+            models.append(serializer.save())
+        with override_settings(SIMULATOR_STORE={'root': self.directory.name, 'chunk_points': 100}):
+            for model in models:
+                run_info = simulator.Simulator(json.dumps(SimulatorSerializer(model).data)).generate_data()
+                self.assertEqual(run_info['datasets'][0]['error'], None)
+                self.assertEqual(self.store.runs(model.id, model.dataset_set.get().id), [run_info['run_id']])
+            first, second = [self.store.read(model.id, model.dataset_set.get().id) for model in models]
+            self.assertEqual(len(first), 9 * 24 + 1)
+            self.assertFalse(np.allclose(first.values, second.values))
+
+            dataset = models[1].dataset_set.get()
+            query = """query ($id: Int!) { series(datasetId: $id, from: "2020-01-02T00:00:00+00:00",
+                                                  to: "2020-01-02T05:00:00+00:00") { totalPoints points { value } } }"""
+            series = self.client.post('/simulator/graphql', json.dumps({'query': query, 'variables': {'id': dataset.id}}),
+                                      content_type='application/json').json()['data']['series']
+        self.assertEqual(series['totalPoints'], 6)
+        np.testing.assert_allclose([point['value'] for point in series['points']], second.values[24:30])
@@ -0,0 +1,157 @@
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Upper bound of the memory held by the process-wide calendar cache
+CALENDAR_CACHE_MAX_BYTES = int(os.environ.get('CALENDAR_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+
+
+class CalendarFeatures:
+    """
+    Precomputed calendar fields of a date-time index.
+
+    It exposes the same field names as pandas.DatetimeIndex, so the seasonality and cycle
+    components can use it in place of the index. The arrays are read-only because they are
+    shared by every user of the cache.
+
+    Args:
+        index (pandas.DatetimeIndex): The date-time index.
+
+    Attributes:
+        index (pandas.DatetimeIndex): The date-time index.
+        timestamps (numpy.ndarray): The int64 epoch nanosecond timestamps.
+        tz (str): The time zone of the index, None for naive timestamps.
+        dayofyear, hour, dayofweek, day (numpy.ndarray): The calendar fields.
+    """
+
+    FIELDS = ('dayofyear', 'hour', 'dayofweek', 'day')
+
+    def __init__(self, index, timestamps=None, fields=None):
+        self.index = index.as_unit('ns')
+        self.tz = str(self.index.tz) if self.index.tz is not None else None
+        self.timestamps = timestamps if timestamps is not None else self.index.asi8
+        self.timestamps.flags.writeable = False
+        if fields is None:
+            fields = {field: np.asarray(getattr(self.index, field)) for field in self.FIELDS}
+        for field, values in fields.items():
+            values.flags.writeable = False
+            setattr(self, field, values)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            raise TypeError("CalendarFeatures only supports slicing")
+        return CalendarFeatures(self.index[key], self.timestamps[key],
+                                {field: getattr(self, field)[key] for field in self.FIELDS})
+
+    @property
+    def nbytes(self):
+        return self.index.nbytes + sum(getattr(self, field).nbytes for field in self.FIELDS)
+
+
+class CalendarCache:
+    """
+    A process-wide LRU cache of calendar features, bounded by the memory the arrays use.
+
+    Args:
+        max_bytes (int): The memory above which the least recently used entries are evicted.
+
+    Methods:
+        get(start, end, periods, freq): Get the calendar features of a date range, building them on a miss.
+        stats(): Get the hit, miss and eviction counters and the memory in use.
+        clear(): Drop every entry and reset the counters.
+    """
+
+    def __init__(self, max_bytes=CALENDAR_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(start, end, periods, freq):
+        offset = pd.tseries.frequencies.to_offset(freq)
+        end = pd.Timestamp(end).isoformat() if end is not None else None
+        return pd.Timestamp(start).isoformat(), end, periods, offset.freqstr
+
+    def get(self, start, end=None, periods=None, freq=None):
+        """
+        Get the calendar features of a date range, building them on a miss.
+
+        Args:
+            start: The first timestamp of the range.
+            end: The last timestamp of the range, or None when periods is given.
+            periods (int): The number of timestamps when there is no end.
+            freq (str): The frequency of the range.
+
+        Returns:
+            CalendarFeatures: The calendar features of the range.
+        """
+        key = self._key(start, end, periods, freq)
+        with self.lock:
+            features = self.entries.get(key)
+            if features is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return features
+            self.misses += 1
+
+        features = CalendarFeatures(pd.date_range(start=start, end=end, periods=periods, freq=freq))
+        with self.lock:
+            if key not in self.entries and features.nbytes <= self.max_bytes:
+                self.entries[key] = features
+                self.bytes += features.nbytes
+                while self.bytes > self.max_bytes:
+                    _, evicted = self.entries.popitem(last=False)
+                    self.bytes -= evicted.nbytes
+                    self.evictions += 1
+        return features
+
+    def stats(self):
+        """
+        Get the hit, miss and eviction counters and the memory in use.
+
+        Returns:
+            dict: The cache statistics.
+        """
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self.entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+            }
+
+    def clear(self):
+        """
+        Drop every entry and reset the counters.
+
+        Returns:
+            None
+        """
+        with self.lock:
+            self.entries.clear()
+            self.bytes = self.hits = self.misses = self.evictions = 0
+
+
+calendar_cache = CalendarCache()
+
+
+def get_calendar_features(start, end=None, periods=None, freq=None):
+    """
+    Get the calendar features of a date range from the process-wide cache.
+
+    Returns:
+        CalendarFeatures: The calendar features of the range.
+    """
+    return calendar_cache.get(start, end, periods, freq)
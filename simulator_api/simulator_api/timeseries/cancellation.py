@@ -0,0 +1,48 @@
+import time
+
+from simulator_api import models
+
+
+class CancelToken:
+    """
+    Tell a running simulator it was stopped, so it can end cleanly between two chunks.
+
+    A simulator is stopped by setting its status to 'Stopped'. The run checks the token after every
+    chunk, and the token looks the status up at most once per interval, so checking costs no query
+    per chunk.
+
+    Worker processes of a run are given an event instead: they only read it, and the process running
+    the simulator polls the database and sets it, so the workers never use the database.
+
+    Args:
+        simulator_id (int): The ID of the simulator.
+        interval (float): The least number of seconds between two status lookups.
+        event: The event shared with the worker processes, None to look the status up directly.
+
+    Methods:
+        cancelled(): Whether the run should stop.
+        poll(): Look the status up now, setting the event when the simulator was stopped.
+    """
+
+    def __init__(self, simulator_id, interval=1.0, event=None):
+        self.simulator_id = simulator_id
+        self.interval = interval
+        self.event = event
+        self.stopped = False
+        self.checked_at = None
+
+    def cancelled(self):
+        if self.stopped:
+            return True
+        if self.event is not None:
+            self.stopped = self.event.is_set()
+        elif self.checked_at is None or time.monotonic() - self.checked_at >= self.interval:
+            self.poll()
+        return self.stopped
+
+    def poll(self):
+        self.checked_at = time.monotonic()
+        self.stopped = models.Simulator.objects.filter(id=self.simulator_id, status='Stopped').exists()
+        if self.stopped and self.event is not None:
+            self.event.set()
+        return self.stopped
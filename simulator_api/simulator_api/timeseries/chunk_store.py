@@ -0,0 +1,180 @@
+import json
+import os
+import shutil
+from datetime import datetime, timezone
+
+import numpy as np
+
+from simulator_api.timeseries.series_data import SeriesData
+
+INDEX_FILE = 'index.json'
+
+
+def new_run_id():
+    """
+    Create the id of a new run, sortable in the order the runs started.
+
+    Returns:
+        str: The run id, e.g. '20240101T120000123456'.
+    """
+    return datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%f')
+
+
+class ChunkStore:
+    """
+    A persistent store of generated time series, kept as compressed fixed-size chunks of points.
+
+    The output of every run of a dataset lives in its own directory, keyed by simulator id, dataset id
+    and run id, so simulators sharing a name never overwrite each other:
+
+        <root>/<simulator id>/<dataset id>/<run id>/index.json
+        <root>/<simulator id>/<dataset id>/<run id>/<sequence>.npz
+
+    Each chunk holds at most chunk_points points, its timestamps delta encoded so regular series
+    compress to almost nothing, its values as float64 and its anomaly mask packed eight points to a
+    byte. The index lists the first and last timestamp of every chunk, so reading a time range only
+    opens the chunks overlapping it. The index is replaced atomically, so readers never see a chunk
+    before it is complete.
+
+    Args:
+        root (str): The directory of the store.
+
+    Methods:
+        runs(simulator_id, dataset_id): Get the ids of the stored runs of a dataset.
+        read_index(simulator_id, dataset_id, run_id): Get the index of a run.
+        write_index(simulator_id, dataset_id, run_id, index): Replace the index of a run.
+        write_chunk(simulator_id, dataset_id, run_id, index, chunk): Write a chunk file and describe it in index.
+        read(simulator_id, dataset_id, run_id, start, end): Read the points of a run between two timestamps.
+        delete(simulator_id, dataset_id, run_id): Remove a run.
+    """
+
+    def __init__(self, root):
+        self.root = str(root)
+
+    def run_path(self, simulator_id, dataset_id, run_id):
+        return os.path.join(self.root, str(simulator_id), str(dataset_id), str(run_id))
+
+    def runs(self, simulator_id, dataset_id):
+        """
+        Get the ids of the stored runs of a dataset, oldest first.
+
+        Returns:
+            list: The run ids.
+        """
+        path = os.path.join(self.root, str(simulator_id), str(dataset_id))
+        if not os.path.isdir(path):
+            return []
+        return sorted(run_id for run_id in os.listdir(path)
+                      if os.path.exists(os.path.join(path, run_id, INDEX_FILE)))
+
+    def read_index(self, simulator_id, dataset_id, run_id):
+        """
+        Get the index of a run, an empty one for a run not written yet.
+
+        Returns:
+            dict: The time zone of the run and the sequence, first and last timestamp, points and
+                anomalies of each chunk.
+        """
+        path = os.path.join(self.run_path(simulator_id, dataset_id, run_id), INDEX_FILE)
+        if not os.path.exists(path):
+            return {'tz': None, 'chunks': []}
+        with open(path, encoding='utf-8') as file:
+            return json.load(file)
+
+    def write_index(self, simulator_id, dataset_id, run_id, index):
+        """
+        Replace the index of a run atomically.
+
+        Returns:
+            None
+        """
+        path = self.run_path(simulator_id, dataset_id, run_id)
+        os.makedirs(path, exist_ok=True)
+        temporary = os.path.join(path, INDEX_FILE + '.tmp')
+        with open(temporary, 'w', encoding='utf-8') as file:
+            json.dump(index, file)
+        os.replace(temporary, os.path.join(path, INDEX_FILE))
+
+    def write_chunk(self, simulator_id, dataset_id, run_id, index, chunk):
+        """
+        Write a chunk to a new file of the run and describe it in the index, which is not saved here.
+
+        Args:
+            simulator_id (int): The ID of the simulator.
+            dataset_id (int): The ID of the dataset.
+            run_id (str): The ID of the run.
+            index (dict): The index of the run, the chunk is appended to it.
+            chunk (SeriesData): The points, not empty.
+
+        Returns:
+            str: The path of the chunk file.
+        """
+        path = self.run_path(simulator_id, dataset_id, run_id)
+        os.makedirs(path, exist_ok=True)
+        sequence = index['chunks'][-1]['sequence'] + 1 if index['chunks'] else 0
+        file_path = os.path.join(path, f'{sequence:08d}.npz')
+        timestamps = chunk.timestamps
+        np.savez_compressed(file_path, first=timestamps[:1], deltas=np.diff(timestamps), values=chunk.values,
+                            anomaly=np.packbits(chunk.anomaly))
+        index['tz'] = index.get('tz') or chunk.tz
+        index['chunks'].append({
+            'sequence': sequence,
+            'start': int(timestamps[0]),
+            'end': int(timestamps[-1]),
+            'points': len(chunk),
+            'anomalies': int(chunk.anomaly.sum()),
+        })
+        return file_path
+
+    def _read_chunk(self, path, tz):
+        with np.load(path) as arrays:
+            timestamps = np.concatenate([arrays['first'], arrays['first'][0] + np.cumsum(arrays['deltas'])])
+            return SeriesData(timestamps, arrays['values'], arrays['anomaly'], tz)
+
+    def read(self, simulator_id, dataset_id, run_id=None, start=None, end=None):
+        """
+        Read the points of a run between two timestamps, opening only the chunks overlapping the range.
+
+        Args:
+            simulator_id (int): The ID of the simulator.
+            dataset_id (int): The ID of the dataset.
+            run_id (str): The ID of the run, the latest run when None.
+            start (int): The first epoch nanosecond timestamp to read, from the beginning when None.
+            end (int): The last epoch nanosecond timestamp to read, to the end when None.
+
+        Raises:
+            FileNotFoundError: When the dataset has no such run.
+
+        Returns:
+            SeriesData: The points in the range, in time order.
+        """
+        if run_id is None:
+            runs = self.runs(simulator_id, dataset_id)
+            if not runs:
+                raise FileNotFoundError(f"Dataset {dataset_id} of simulator {simulator_id} has not been stored")
+            run_id = runs[-1]
+        elif run_id not in self.runs(simulator_id, dataset_id):
+            raise FileNotFoundError(f"Dataset {dataset_id} of simulator {simulator_id} has no run {run_id}")
+        index = self.read_index(simulator_id, dataset_id, run_id)
+        chunks = index['chunks']
+        # The chunks are in time order, so the overlapping ones are found by binary search on the index
+        first = np.searchsorted([chunk['end'] for chunk in chunks], start, side='left') if start is not None else 0
+        last = np.searchsorted([chunk['start'] for chunk in chunks], end, side='right') if end is not None \
+            else len(chunks)
+        path = self.run_path(simulator_id, dataset_id, run_id)
+        series = []
+        for chunk in chunks[first:last]:
+            data = self._read_chunk(os.path.join(path, f"{chunk['sequence']:08d}.npz"), index['tz'])
+            low = np.searchsorted(data.timestamps, start, side='left') if start is not None else 0
+            high = np.searchsorted(data.timestamps, end, side='right') if end is not None else len(data)
+            series.append(data[low:high])
+        return SeriesData.concatenate(chunk for chunk in series if len(chunk))
+
+    def delete(self, simulator_id, dataset_id, run_id):
+        """
+        Remove a run.
+
+        Returns:
+            None
+        """
+        shutil.rmtree(self.run_path(simulator_id, dataset_id, run_id), ignore_errors=True)
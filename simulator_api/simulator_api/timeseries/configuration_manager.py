@@ -11,6 +11,15 @@ class ConfigurationManager():
 
 class SimulatorConfigurationManager(ConfigurationManager):
 
+    def get_id(self):
+        """
+        Get the ID of the simulator.
+
+        Returns:
+            int: The ID of the simulator, None for a simulator that is not saved.
+        """
+        return self.json.get('id')
+
     def get_name(self):
         """
         Get the name of the simulator.
@@ -60,10 +69,28 @@ class SimulatorConfigurationManager(ConfigurationManager):
         Get producer type for the time series.
 
         Returns:
-            str: 'kafka' or 'csv'
+            str: 'kafka', 'csv', 'parquet' or 'feather'
         """
         return self.json['producer_type']
 
+    def get_emission_mode(self):
+        """
+        Get how the simulator emits its data.
+
+        Returns:
+            str: 'batch' to generate the whole history at once or 'realtime' to pace it on the wall clock
+        """
+        return self.json.get('emission_mode') or 'batch'
+
+    def get_speed_factor(self):
+        """
+        Get how much faster than the wall clock a real-time simulator emits its data.
+
+        Returns:
+            float: speed factor, 1 emits at wall-clock pace
+        """
+        return self.json.get('speed_factor') or 1.0
+
     def get_datasets(self):
         """
         Get datasets for the time series.
@@ -149,6 +176,24 @@ class DatasetConfigurationManager(ConfigurationManager):
         """
         return self.json['outlier_percentage']
 
+    def get_noise_type(self):
+        """
+        Get noise type for the dataset.
+
+        Returns:
+            str: noise distribution, 'gaussian' when not configured
+        """
+        return self.json.get('noise_type') or 'gaussian'
+
+    def get_seed(self):
+        """
+        Get the random seed for the dataset.
+
+        Returns:
+            int: seed, or None to draw fresh entropy on every run
+        """
+        return self.json.get('seed')
+
 
 class SeasonalityConfigurationManager(ConfigurationManager):
 
@@ -1,6 +1,22 @@
+import copy
+import logging
+import threading
+import shutil
+import time
 import pandas as pd
 import os
 
+from simulator_api.timeseries.series_data import SeriesData
+from simulator_api.timeseries.chunk_store import ChunkStore, new_run_id
+from simulator_api.timeseries.kafka_transport import get_shared_transport, get_chunk_serializer
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
 
 class DataProducer:
     """
@@ -12,6 +28,7 @@ class DataProducer:
         anomaly (numpy.ndarray): An anomaly mask indicating the positions of anomalies in the data.
         file_name (str): The base file name for saving the data.
         dataset_number (int): The dataset number.
+        append (bool): Whether to add to the output of a previous run instead of replacing it.
 
     Attributes:
         data (numpy.ndarray): The time series data.
@@ -22,26 +39,131 @@ class DataProducer:
 
     Methods:
         save(): Save the time series data and associated metadata.
+        save_chunks(chunks): Save time series data streamed as SeriesData chunks.
+        open(): Prepare the destination before the first chunk is written.
+        write(chunk): Write one SeriesData chunk.
+        close(): Finish writing after the last chunk.
+        rollback(): Undo the writes of a failed run after closing.
+        abort(): Stop writing after a failure and undo the writes, in place of close().
+        output_path(): Get the path of the output file, None when the producer does not write a file.
     """
 
-    def __init__(self, data, date_rng, anomaly, file_name, dataset_number):
+    # The extension of the output file of producers writing one
+    extension = None
+
+    def __init__(self, data=None, date_rng=None, anomaly=None, file_name=None, dataset_number=None, append=False):
         self.data = data
         self.date_rng = date_rng
         self.anomaly = anomaly
         self.file_name = file_name
         self.dataset_number = dataset_number
+        self.append = append
 
-    def save(self):
+    def _path(self, extension):
         """
-        Save the time series data and associated metadata.
+        Get the path of the output file, creating the 'sample_datasets/' directory if needed.
+
+        Returns:
+            str: The path of the output file.
+        """
+        # Check if 'sample_datasets/' directory exists, and create it if not
+        if not os.path.exists('sample_datasets/'):
+            os.makedirs('sample_datasets/')
+        return 'sample_datasets/' + self.file_name + str(self.dataset_number) + extension
+
+    def output_path(self):
+        return self._path(self.extension) if self.extension is not None else None
+
+    @staticmethod
+    def _staging_path(path):
+        """
+        Get the temporary path a new file is written to, moved to path when the producer closes.
+
+        Readers and a run stopped half way never see a partly written file at path, only the previous
+        complete one or the new complete one.
+
+        Returns:
+            str: The temporary path.
+        """
+        return path + '.tmp'
+
+    def open(self):
+        """
+        Prepare the destination before the first chunk is written.
+
+        Returns:
+            None
+        """
+        pass
+
+    def write(self, chunk):
+        """
+        Write one chunk of time series data.
 
         This method should be implemented by subclasses to specify the data-saving mechanism.
 
+        Args:
+            chunk (SeriesData): The chunk to write.
+
         Returns:
             None
         """
         pass
 
+    def close(self):
+        """
+        Finish writing after the last chunk.
+
+        Returns:
+            None
+        """
+        pass
+
+    def rollback(self):
+        """
+        Undo the writes of a failed run after closing, so a retry does not duplicate points.
+
+        Returns:
+            None
+        """
+        pass
+
+    def abort(self):
+        """
+        Stop writing after a failure and undo the writes of the run, in place of close().
+
+        Returns:
+            None
+        """
+        self.close()
+        self.rollback()
+
+    def save_chunks(self, chunks):
+        """
+        Save time series data streamed as SeriesData chunks.
+
+        Args:
+            chunks (iterable): The chunks, as yielded by TimeSeries.generate_chunks().
+
+        Returns:
+            None
+        """
+        self.open()
+        try:
+            for chunk in chunks:
+                self.write(chunk)
+        finally:
+            self.close()
+
+    def save(self):
+        """
+        Save the time series data and associated metadata.
+
+        Returns:
+            None
+        """
+        self.save_chunks([SeriesData.from_arrays(self.date_rng, self.data, self.anomaly)])
+
 
 class DataProducerCSV(DataProducer):
     """
@@ -53,20 +175,527 @@ class DataProducerCSV(DataProducer):
         save(): Save the time series data to a CSV file with associated metadata.
     """
 
-    def __init__(self, data, date_rng, anomaly, file_name, dataset_number):
+    extension = '.csv'
+
+    def __init__(self, data=None, date_rng=None, anomaly=None, file_name=None, dataset_number=None, append=False):
+        super().__init__(data, date_rng, anomaly, file_name, dataset_number, append)
+        self.file = None
+        self.header = True
+        self.start_size = 0
+        self.staging = None
+
+    def open(self):
+        """
+        Open the CSV file, the header is written with the first chunk unless appending to an existing file.
+
+        A new file is written to a temporary path and only replaces the previous file when closed.
+
+        Returns:
+            None
+        """
+        path = self._path(self.extension)
+        self.start_size = os.path.getsize(path) if self.append and os.path.exists(path) else 0
+        if self.start_size and os.stat(path).st_nlink > 1:
+            # The file is shared with the result cache, appending to a copy leaves the cached output as it was
+            shutil.copyfile(path, self._staging_path(path))
+            os.replace(self._staging_path(path), path)
+        if self.start_size:
+            self.file = open(path, 'a', encoding='utf-8', newline='')
+        else:
+            self.staging = self._staging_path(path)
+            self.file = open(self.staging, 'w', encoding='utf-8', newline='')
+        self.header = self.start_size == 0
+
+    def write(self, chunk):
+        """
+        Append one chunk of time series data to the CSV file.
+
+        Returns:
+            None
+        """
+        # Timestamps are only formatted as text here, in one vectorized call per chunk
+        df = pd.DataFrame({'value': chunk.values, 'timestamp': chunk.format_timestamps(), 'anomaly': chunk.anomaly})
+        df.to_csv(self.file, header=self.header, index=False)
+        self.header = False
+
+    def close(self):
+        """
+        Close the CSV file, moving a new file to its path.
+
+        Returns:
+            None
+        """
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        if self.staging is not None:
+            os.replace(self.staging, self._path(self.extension))
+            self.staging = None
+
+    def rollback(self):
+        """
+        Truncate the CSV file back to its size before this run.
+
+        Returns:
+            None
+        """
+        path = self._path(self.extension)
+        if os.path.exists(path):
+            os.truncate(path, self.start_size)
+
+    def abort(self):
+        """
+        Close the CSV file without publishing a new one, so the previous complete file stays in place.
+
+        Returns:
+            None
+        """
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        if self.staging is not None:
+            os.remove(self.staging)
+            self.staging = None
+        else:
+            self.rollback()
+
+
+class DataProducerArrow(DataProducer):
+    """
+    A base class for producers writing time series data in an Arrow based binary format.
+
+    Timestamps stay as int64 nanoseconds since the epoch (an Arrow timestamp), values as float64 with
+    missing values as nulls and anomaly flags as booleans. Requires the optional pyarrow package.
+
+    These formats cannot be appended to in place, so an appending producer writes a new part file
+    next to the first one, e.g. 'name1-1.parquet', 'name1-2.parquet'.
+
+    Inherits from DataProducer.
+    """
+
+    def __init__(self, data=None, date_rng=None, anomaly=None, file_name=None, dataset_number=None,
+                 compression='zstd', append=False):
+        super().__init__(data, date_rng, anomaly, file_name, dataset_number, append)
+        if pa is None:
+            raise ImportError("The pyarrow package is required for the parquet and feather producers")
+        self.compression = compression
+        self.writer = None
+        self.path = None
+
+    def _output_path(self):
+        """
+        Get the path to write to, the first free part file when appending.
+
+        The file is written to a temporary path, moved to the output path by _publish() once closed.
+
+        Returns:
+            str: The temporary path of the output file.
+        """
+        path = self._path(self.extension)
+        part = 0
+        while self.append and os.path.exists(path):
+            part += 1
+            path = self._path(f'-{part}{self.extension}')
+        self.path = path
+        return self._staging_path(path)
+
+    def _publish(self):
+        self.writer.close()
+        self.writer = None
+        os.replace(self._staging_path(self.path), self.path)
+
+    def abort(self):
+        """
+        Close the file without publishing it, so the previous complete file stays in place.
+
+        Returns:
+            None
+        """
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        if self.path is not None and os.path.exists(self._staging_path(self.path)):
+            os.remove(self._staging_path(self.path))
+
+    def rollback(self):
+        """
+        Remove the file written by this run.
+
+        Returns:
+            None
+        """
+        if self.path is None:
+            return
+        for path in (self.path, self._staging_path(self.path)):
+            if os.path.exists(path):
+                os.remove(path)
+
+    @staticmethod
+    def _schema(tz):
+        return pa.schema([('value', pa.float64()), ('timestamp', pa.timestamp('ns', tz=tz)),
+                          ('anomaly', pa.bool_())])
+
+    @staticmethod
+    def _table(chunks):
+        """
+        Convert SeriesData chunks to an Arrow table without formatting the timestamps.
+
+        Returns:
+            pyarrow.Table: The chunks as one table.
+        """
+        tz = chunks[0].tz
+        return pa.Table.from_arrays([
+            pa.chunked_array([pa.array(chunk.values, from_pandas=True) for chunk in chunks], pa.float64()),
+            pa.chunked_array([pa.array(chunk.timestamps, pa.timestamp('ns', tz=tz)) for chunk in chunks],
+                             pa.timestamp('ns', tz=tz)),
+            pa.chunked_array([pa.array(chunk.anomaly) for chunk in chunks], pa.bool_()),
+        ], schema=DataProducerArrow._schema(tz))
+
+
+class DataProducerParquet(DataProducerArrow):
+    """
+    A class for producing and saving time series data to a Parquet file.
+
+    Chunks are buffered until a full row group is available, so a streamed series is written as
+    row groups of row_group_size points whatever the generation chunk size.
+
+    Inherits from DataProducerArrow.
+    """
+
+    extension = '.parquet'
+
+    def __init__(self, data=None, date_rng=None, anomaly=None, file_name=None, dataset_number=None,
+                 compression='zstd', row_group_size=1000000, append=False):
+        super().__init__(data, date_rng, anomaly, file_name, dataset_number, compression, append)
+        self.row_group_size = row_group_size
+        self.buffer = []
+        self.buffered = 0
+
+    def open(self):
+        self.buffer, self.buffered = [], 0
+
+    def write(self, chunk):
+        """
+        Buffer one chunk and write every full row group.
+
+        Returns:
+            None
+        """
+        if len(chunk) == 0:
+            return
+        self.buffer.append(chunk)
+        self.buffered += len(chunk)
+        if self.buffered >= self.row_group_size:
+            self._flush(final=False)
+
+    def _flush(self, final):
+        buffered = SeriesData.concatenate(self.buffer)
+        # Keep the rows past the last full row group for the next write, unless this is the last flush
+        rows = len(buffered) if final else len(buffered) - len(buffered) % self.row_group_size
+        table = self._table([buffered[:rows]])
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self._output_path(), table.schema, compression=self.compression)
+        self.writer.write_table(table, row_group_size=self.row_group_size)
+        rest = buffered[rows:]
+        self.buffer = [rest] if len(rest) else []
+        self.buffered = len(rest)
+
+    def close(self):
+        """
+        Write the last, possibly partial, row group and close the file.
+
+        Returns:
+            None
+        """
+        if self.buffer:
+            self._flush(final=True)
+        if self.writer is None:
+            if self.append:
+                # Nothing new was generated, so there is no part to add
+                return
+            # Nothing was generated, still leave a valid empty file behind
+            self.writer = pq.ParquetWriter(self._output_path(), self._schema(None),
+                                           compression=self.compression)
+        self._publish()
+
+
+class DataProducerFeather(DataProducerArrow):
+    """
+    A class for producing and saving time series data to a Feather (Arrow IPC) file.
+
+    Every chunk is written as a record batch as soon as it arrives.
+
+    Inherits from DataProducerArrow.
+    """
+
+    extension = '.feather'
+
+    def write(self, chunk):
+        """
+        Write one chunk as a record batch.
+
+        Returns:
+            None
+        """
+        table = self._table([chunk])
+        if self.writer is None:
+            options = pa.ipc.IpcWriteOptions(compression=self.compression)
+            self.writer = pa.ipc.new_file(self._output_path(), table.schema, options=options)
+        self.writer.write_table(table)
+
+    def close(self):
+        """
+        Close the file.
+
+        Returns:
+            None
+        """
+        if self.writer is None:
+            if self.append:
+                # Nothing new was generated, so there is no part to add
+                return
+            # Nothing was generated, still leave a valid empty file behind
+            self.writer = pa.ipc.new_file(self._output_path(), self._schema(None))
+        self._publish()
+
+
+class DataProducerStore(DataProducer):
+    """
+    A class for producing and saving time series data to a ChunkStore.
+
+    The points are written as chunks of chunk_points points as soon as a full chunk is buffered,
+    and the index of the run is saved when the producer closes. An appending producer adds its
+    chunks to the latest run of the dataset, or starts run_id when the dataset has no run yet.
+
+    Inherits from DataProducer.
+
+    Args:
+        simulator_id (int): The ID of the simulator.
+        dataset_id (int): The ID of the dataset.
+        run_id (str): The ID of the run, a new one when None.
+        root (str): The directory of the store.
+        chunk_points (int): The largest number of points of a chunk.
+    """
+
+    def __init__(self, data=None, date_rng=None, anomaly=None, file_name=None, dataset_number=None,
+                 simulator_id=None, dataset_id=None, run_id=None, root='series_store', chunk_points=100000,
+                 append=False):
+        super().__init__(data, date_rng, anomaly, file_name, dataset_number, append)
+        self.store = ChunkStore(root)
+        self.simulator_id = simulator_id
+        self.dataset_id = dataset_id
+        self.run_id = run_id or new_run_id()
+        self.chunk_points = chunk_points
+        self.index = None
+        self.previous_index = None
+        self.written = []
+        self.buffer = []
+        self.buffered = 0
+
+    def open(self):
+        """
+        Load the index of the run to append to, or start a new run.
+
+        Returns:
+            None
+        """
+        runs = self.store.runs(self.simulator_id, self.dataset_id)
+        if self.append and runs:
+            self.run_id = runs[-1]
+        self.index = self.store.read_index(self.simulator_id, self.dataset_id, self.run_id)
+        self.previous_index = copy.deepcopy(self.index) if self.index['chunks'] else None
+        self.written, self.buffer, self.buffered = [], [], 0
+
+    def write(self, chunk):
+        """
+        Buffer one chunk and write every full store chunk.
+
+        Returns:
+            None
+        """
+        if len(chunk) == 0:
+            return
+        self.buffer.append(chunk)
+        self.buffered += len(chunk)
+        if self.buffered >= self.chunk_points:
+            self._flush(final=False)
+
+    def _flush(self, final):
+        buffered = SeriesData.concatenate(self.buffer)
+        # Keep the points past the last full chunk for the next write, unless this is the last flush
+        points = len(buffered) if final else len(buffered) - len(buffered) % self.chunk_points
+        for start in range(0, points, self.chunk_points):
+            self.written.append(self.store.write_chunk(self.simulator_id, self.dataset_id, self.run_id, self.index,
+                                                       buffered[start:min(start + self.chunk_points, points)]))
+        rest = buffered[points:]
+        self.buffer = [rest] if len(rest) else []
+        self.buffered = len(rest)
+
+    def close(self):
+        """
+        Write the last, possibly partial, chunk and save the index of the run.
+
+        Returns:
+            None
+        """
+        if self.index is None:
+            return
+        if self.buffer:
+            self._flush(final=True)
+        if self.written or not self.append:
+            self.store.write_index(self.simulator_id, self.dataset_id, self.run_id, self.index)
+
+    def rollback(self):
+        """
+        Remove the chunks written by this run and restore the index it started from.
+
+        Returns:
+            None
+        """
+        for path in self.written:
+            if os.path.exists(path):
+                os.remove(path)
+        if self.previous_index is not None:
+            self.store.write_index(self.simulator_id, self.dataset_id, self.run_id, self.previous_index)
+        else:
+            self.store.delete(self.simulator_id, self.dataset_id, self.run_id)
+
+
+class DataProducerKafka(DataProducer):
+    """
+    A class for producing time series data to a Kafka topic, one record per point.
+
+    Records are keyed by simulator and dataset, so all the points of a dataset land in the same
+    partition in time order. At most max_in_flight records are sent without being acknowledged,
+    so a slow broker slows generation down instead of growing the client buffer.
+
+    Records cannot be taken back once sent, so rollback() does nothing and the records a failed run
+    sent stay in the topic; consumers should expect the points of a run retried after a failure twice.
+
+    Inherits from DataProducer.
+
+    Args:
+        simulator_id (int): The ID of the simulator, part of the record key.
+        transport (KafkaTransport): The transport to send records through, the KafkaPythonTransport the
+            process shares for the connection settings when None.
+        topic (str): The topic to produce to.
+        schema (str): The message schema, 'json', 'avro' or 'msgpack'.
+        max_in_flight (int): The maximum number of records sent but not acknowledged.
+        delivery_timeout (float): The most seconds close() waits for the records to be acknowledged.
+        bootstrap_servers, linger_ms, batch_size, compression_type: The KafkaPythonTransport settings.
+
+    Methods:
+        throughput(): Get the records, bytes and records per second sent so far.
+    """
+
+    def __init__(self, data=None, date_rng=None, anomaly=None, file_name=None, dataset_number=None,
+                 simulator_id=None, transport=None, topic='simulator', schema='json', max_in_flight=10000,
+                 delivery_timeout=120.0, bootstrap_servers='localhost:9092', linger_ms=20, batch_size=64 * 1024, compression_type='gzip'):
         super().__init__(data, date_rng, anomaly, file_name, dataset_number)
+        self.simulator_id = simulator_id
+        self.transport = transport if transport is not None else get_shared_transport(
+            bootstrap_servers, linger_ms, batch_size, compression_type)
+        self.topic = topic
+        self.serialize_chunk = get_chunk_serializer(schema)
+        self.key = f'{simulator_id}:{dataset_number}'.encode('utf-8')
+        self.max_in_flight = max_in_flight
+        self.in_flight = threading.BoundedSemaphore(max_in_flight)
+        self.delivery_timeout = delivery_timeout
+        self.error = None
+        self.records = 0
+        self.bytes = 0
+        self.started = None
+        self.elapsed = 0.0
 
-    def save(self):
+    def _on_delivery(self, error):
+        if error is not None and self.error is None:
+            self.error = error
+        self.in_flight.release()
+
+    def _raise_error(self):
+        if self.error is not None:
+            raise RuntimeError(f'Kafka delivery failed: {self.error}')
+
+    def open(self):
+        self.started = time.perf_counter()
+
+    def write(self, chunk):
         """
-        Save the time series data to a CSV file with associated metadata.
+        Send every point of the chunk as a record, the records of the chunk being encoded together.
 
         Returns:
             None
         """
-        # Check if 'sample_datasets/' directory exists, and create it if not
-        if not os.path.exists('sample_datasets/'):
-            os.makedirs('sample_datasets/')
+        messages = self.serialize_chunk(self.simulator_id, self.dataset_number, chunk.timestamps.tolist(),
+                                        chunk.values.tolist(), chunk.anomaly.tolist())
+        send = self.transport.send
+        for message in messages:
+            # Block while max_in_flight records wait for an acknowledgement
+            self.in_flight.acquire()
+            try:
+                send(self.topic, self.key, message, self._on_delivery)
+            except Exception:
+                # Never delivered, so its callback will not give the permit back
+                self.in_flight.release()
+                raise
+        self.records += len(messages)
+        self.bytes += sum(map(len, messages))
+        self._raise_error()
+
+    def close(self):
+        """
+        Wait for every record to be acknowledged and report the throughput.
+
+        Raises:
+            RuntimeError: When a record failed, or was not acknowledged within delivery_timeout seconds.
+
+        Returns:
+            None
+        """
+        deadline = time.monotonic() + self.delivery_timeout
+        self.transport.flush(self.delivery_timeout)
+        # Every permit is back once the last record is acknowledged
+        acquired = 0
+        try:
+            while acquired < self.max_in_flight:
+                if not self.in_flight.acquire(timeout=max(0.0, deadline - time.monotonic())):
+                    raise RuntimeError(f'Kafka delivery timed out: {self.max_in_flight - acquired} records not '
+                                       f'acknowledged after {self.delivery_timeout} seconds')
+                acquired += 1
+        finally:
+            for _ in range(acquired):
+                self.in_flight.release()
+        if self.started is not None:
+            self.elapsed = time.perf_counter() - self.started
+        logging.info(f'Kafka producer for dataset {self.dataset_number} of simulator {self.simulator_id}: '
+                     f'{self.throughput()}')
+        self._raise_error()
+
+    def throughput(self):
+        """
+        Get the records, bytes and records per second sent so far.
+
+        Returns:
+            dict: The throughput of the producer.
+        """
+        elapsed = self.elapsed or (time.perf_counter() - self.started if self.started is not None else 0.0)
+        return {
+            'records': self.records,
+            'bytes': self.bytes,
+            'seconds': elapsed,
+            'records_per_second': self.records / elapsed if elapsed else 0.0,
+        }
+
+    def abort(self):
+        """
+        Wait for the records already sent like close(), without raising over the failure of the run.
+
+        Returns:
+            None
+        """
+        try:
+            self.close()
+        except Exception as e:
+            logging.warning(f'Kafka producer for dataset {self.dataset_number} of simulator {self.simulator_id} '
+                            f'failed to deliver after the run failed: {str(e)}')
 
-        df = pd.DataFrame({'value': self.data, 'timestamp': self.date_rng, 'anomaly': self.anomaly})
-        df.to_csv('sample_datasets/' + self.file_name + str(self.dataset_number) + '.csv', encoding='utf-8',
-                  index=False)
@@ -0,0 +1,171 @@
+import numpy as np
+
+# The largest number of points a downsampled series can have
+MAX_POINTS = 10000
+
+
+class DownsampledSeries:
+    """
+    The points kept from a series to draw it with at most max_points points.
+
+    The series is split into consecutive buckets and every kept point stands for a bucket: anomaly_count
+    holds the number of anomalies in the bucket it was picked from, so the counts add up to the anomalies
+    of the whole series even when the anomalous points themselves are dropped.
+
+    Args:
+        timestamps (numpy.ndarray): The int64 epoch nanosecond timestamps of the kept points.
+        values (numpy.ndarray): The values of the kept points, missing values are NaN.
+        anomaly (numpy.ndarray): Whether each kept point is itself an anomaly.
+        anomaly_count (numpy.ndarray): The number of anomalies each kept point stands for.
+        total_points (int): The number of points of the series before downsampling.
+        tz (str): The time zone of the timestamps, None for naive timestamps.
+    """
+
+    def __init__(self, timestamps, values, anomaly, anomaly_count, total_points, tz=None):
+        self.timestamps = timestamps
+        self.values = values
+        self.anomaly = anomaly
+        self.anomaly_count = anomaly_count
+        self.total_points = total_points
+        self.tz = tz
+
+    def __len__(self):
+        return len(self.timestamps)
+
+
+def bucket_edges(size, buckets):
+    """
+    Split size points into consecutive buckets of nearly equal size.
+
+    Returns:
+        numpy.ndarray: The buckets + 1 edges, bucket i covers the points edges[i] to edges[i + 1].
+    """
+    return np.linspace(0, size, buckets + 1).astype(np.int64)
+
+
+def _pick(values, start, stop, scores):
+    """
+    Get the position of the best scored point between start and stop, skipping missing values.
+
+    Returns:
+        int: The position of the point, start when every value is missing.
+    """
+    scores = np.where(np.isnan(values[start:stop]), -np.inf, scores)
+    best = int(np.argmax(scores))
+    return start + best if np.isfinite(scores[best]) else start
+
+
+def lttb(timestamps, values, max_points):
+    """
+    Select the points of a series with the Largest-Triangle-Three-Buckets algorithm.
+
+    The first and last points are always kept. The points in between are split into max_points - 2
+    buckets and each bucket keeps the point forming the largest triangle with the point kept from the
+    previous bucket and the average of the next bucket, which preserves the visual shape of the series.
+
+    Args:
+        timestamps (numpy.ndarray): The int64 epoch nanosecond timestamps.
+        values (numpy.ndarray): The values, missing values are only kept when a whole bucket is missing.
+        max_points (int): The number of points to keep, at least 3.
+
+    Returns:
+        tuple: The positions of the kept points and the bucket edges, kept point i standing for the
+            points edges[i] to edges[i + 1].
+    """
+    size = len(values)
+    # The first and last points are buckets of their own
+    edges = np.concatenate([[0], 1 + bucket_edges(size - 2, max_points - 2), [size]])
+    # Distances are measured from the first timestamp in float64, nanoseconds since the epoch would lose precision
+    x = (timestamps - timestamps[0]).astype(float)
+    y = values
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0], selected[-1] = 0, size - 1
+    previous = 0
+    for bucket in range(1, max_points - 1):
+        start, stop = edges[bucket], edges[bucket + 1]
+        next_start, next_stop = edges[bucket + 1], edges[bucket + 2]
+        next_y = y[next_start:next_stop]
+        next_x = x[next_start:next_stop][~np.isnan(next_y)]
+        next_y = next_y[~np.isnan(next_y)]
+        if len(next_y):
+            average_x, average_y = next_x.mean(), next_y.mean()
+        else:
+            average_x, average_y = x[next_start], y[previous]
+        previous_y = y[previous] if not np.isnan(y[previous]) else 0.0
+        # Twice the area of the triangle of the previous point, each candidate and the next average
+        areas = np.abs((x[previous] - average_x) * (y[start:stop] - previous_y)
+                       - (x[previous] - x[start:stop]) * (average_y - previous_y))
+        previous = _pick(y, start, stop, areas)
+        selected[bucket] = previous
+    return selected, edges
+
+
+def min_max(values, max_points):
+    """
+    Select the minimum and the maximum of each bucket of a series.
+
+    The series is split into max_points // 2 buckets, keeping both extremes of each so spikes stay
+    visible whatever the zoom level.
+
+    Args:
+        values (numpy.ndarray): The values, missing values are only kept when a whole bucket is missing.
+        max_points (int): The number of points to keep, at least 2.
+
+    Returns:
+        tuple: The positions of the kept points, two per bucket in time order, and the bucket edges.
+    """
+    edges = bucket_edges(len(values), max_points // 2)
+    selected = []
+    for start, stop in zip(edges[:-1], edges[1:]):
+        low = _pick(values, start, stop, -values[start:stop])
+        high = _pick(values, start, stop, values[start:stop])
+        selected += sorted({low, high})
+    return np.array(selected, dtype=np.int64), edges
+
+
+# The smallest max_points of each aggregation
+AGGREGATIONS = {
+    'lttb': 3,
+    'minmax': 2,
+}
+
+
+def downsample(series, max_points, aggregation='lttb'):
+    """
+    Downsample a series to at most max_points points, carrying the anomaly count of every bucket.
+
+    A series that already fits is returned whole, every point standing for itself.
+
+    Args:
+        series (SeriesData): The series.
+        max_points (int): The largest number of points to return, at most MAX_POINTS.
+        aggregation (str): 'lttb' or 'minmax'.
+
+    Raises:
+        ValueError: When the aggregation is unknown or max_points is out of range.
+
+    Returns:
+        DownsampledSeries: The kept points.
+    """
+    if aggregation not in AGGREGATIONS:
+        raise ValueError(f"Unknown aggregation: {aggregation}")
+    if not AGGREGATIONS[aggregation] <= max_points <= MAX_POINTS:
+        raise ValueError(f"maxPoints must be between {AGGREGATIONS[aggregation]} and {MAX_POINTS} "
+                         f"for the {aggregation} aggregation")
+    anomaly = series.anomaly
+    if len(series) <= max_points:
+        return DownsampledSeries(series.timestamps, series.values, anomaly, anomaly.astype(np.int64), len(series),
+                                 series.tz)
+
+    if aggregation == 'lttb':
+        selected, edges = lttb(series.timestamps, series.values, max_points)
+        counts = np.add.reduceat(anomaly.astype(np.int64), edges[:-1])
+    else:
+        selected, edges = min_max(series.values, max_points)
+        bucket_counts = np.add.reduceat(anomaly.astype(np.int64), edges[:-1])
+        # A bucket's count goes on its first kept point, so the counts still add up to the series' anomalies
+        bucket = np.searchsorted(edges, selected, side='right') - 1
+        first = np.concatenate([[True], bucket[1:] != bucket[:-1]])
+        counts = np.where(first, bucket_counts[bucket], 0)
+    return DownsampledSeries(series.timestamps[selected], series.values[selected], anomaly[selected], counts,
+                             len(series), series.tz)
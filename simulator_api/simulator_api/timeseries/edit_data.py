@@ -1,5 +1,6 @@
 import numpy as np
 import pandas as pd
+from simulator_api.timeseries.noise import calculate_noise
 
 
 class EditData:
@@ -13,8 +14,10 @@ class EditData:
     Attributes:
         data (pandas.Series): The time series data to be edited.
         percentage_missing (float): The percentage of missing values to be added to the data.
-        noise_level (str): The noise level configuration from the ConfigurationManager ('small', 'large', or 'no_noise').
+        noise_level (float): The scale of the noise added to the data.
         percentage_outliers (float): The percentage of outliers to be added to the data.
+        noise_type (str): The distribution of the noise (see timeseries.noise.NOISE_TYPES).
+        rng (numpy.random.Generator): The generator used for every random draw.
 
     Methods:
         add_missing_values(): Add missing values to the time series data.
@@ -23,21 +26,27 @@ class EditData:
         apply(): Apply the data editing operations and return the edited data along with an anomaly mask.
     """
 
-    def __init__(self,data, percentage_missing, noise_level, percentage_outliers):
+    def __init__(self,data, percentage_missing, noise_level, percentage_outliers, noise_type='gaussian', rng=None):
         self.data = data
         self.percentage_missing = percentage_missing
         self.noise_level = noise_level
         self.percentage_outliers = percentage_outliers
+        self.noise_type = noise_type
+        self.rng = rng if rng is not None else np.random.default_rng()
 
-    def add_missing_values(self):
+    def add_missing_values(self, num_missing=None):
         """
         Add missing values to the time series data.
 
+        Args:
+            num_missing (int): The number of missing values, defaults to the configured percentage of the data.
+
         Returns:
             None
         """
-        num_missing = int(len(self.data) * self.percentage_missing)
-        missing_indices = np.random.choice(len(self.data), size=num_missing, replace=False)
+        if num_missing is None:
+            num_missing = int(len(self.data) * self.percentage_missing)
+        missing_indices = self.rng.choice(len(self.data), size=num_missing, replace=False)
         self.data[missing_indices] = np.nan
 
     def add_noise(self):
@@ -47,38 +56,43 @@ class EditData:
         Returns:
             None
         """
-
-        noise = np.zeros_like(self.data)
-        for i in range(len(self.data)):
-            # Get the noise from a normal distribution with mean 0 and std abs(self.data[i]) * noise_level
-            noise[i] = np.random.normal(loc=0, scale=abs(self.data[i]) * self.noise_level) if self.noise_level > 0 else 0
+        # Draw the noise for every point at once from the run's generator
+        noise = calculate_noise(self.data, self.noise_type, self.noise_level, self.rng)
         self.data = self.data + pd.Series(noise)
 
-    def add_outliers(self):
+    def add_outliers(self, num_outliers=None):
         """
         Add outliers to the time series data.
 
+        Args:
+            num_outliers (int): The number of outliers, defaults to the configured percentage of the data.
+
         Returns:
             numpy.ndarray: An anomaly mask indicating the positions of added outliers.
         """
-        num_outliers = int(len(self.data) * self.percentage_outliers)
-        outlier_indices = np.random.choice(len(self.data), size=num_outliers, replace=False)
+        if num_outliers is None:
+            num_outliers = int(len(self.data) * self.percentage_outliers)
+        outlier_indices = self.rng.choice(len(self.data), size=num_outliers, replace=False)
         # The outlier is 1 or -1 and replace with true data
-        outliers = np.random.uniform(-1, 1, num_outliers)
+        outliers = self.rng.uniform(-1, 1, num_outliers)
         anomaly_mask = np.zeros(len(self.data), dtype=bool)
         if len(outliers) > 0:
             self.data[outlier_indices] = outliers
             anomaly_mask[outlier_indices] = True
         return anomaly_mask
 
-    def apply(self):
+    def apply(self, num_missing=None, num_outliers=None):
         """
         Apply the data editing operations and return the edited data along with an anomaly mask.
 
+        Args:
+            num_missing (int): The number of missing values, defaults to the configured percentage.
+            num_outliers (int): The number of outliers, defaults to the configured percentage.
+
         Returns:
             tuple: A tuple containing the edited data and an anomaly mask.
         """
         self.add_noise()
-        anomaly_mask = self.add_outliers()
-        self.add_missing_values()
+        anomaly_mask = self.add_outliers(num_outliers)
+        self.add_missing_values(num_missing)
         return self.data, anomaly_mask
@@ -1,10 +1,15 @@
 import numpy as np
 import pandas as pd
 from sklearn.preprocessing import MinMaxScaler
-from simulator_api.timeseries.seasonality import calculate_seasonality
-from simulator_api.timeseries.trend import Trend
+from simulator_api.timeseries.seasonality import calculate_seasonality, calculate_seasonalities
+from simulator_api.timeseries.trend import Trend, calculate_trends
 from simulator_api.timeseries.edit_data import EditData
 from simulator_api.timeseries.configuration_manager import DatasetConfigurationManager
+from simulator_api.timeseries.series_data import SeriesData
+from simulator_api.timeseries.calendar_features import get_calendar_features
+
+# Number of points generated and handed to a producer at once in streaming mode
+DEFAULT_CHUNK_SIZE = 100000
 
 
 class TimeSeries:
@@ -20,6 +25,7 @@ class TimeSeries:
     Methods:
         _generate_time_series(): Generate the date-time index for the time series data.
         generate_data(): Generate the time series data based on seasonality and trend components.
+        generate_chunks(): Stream the time series data in fixed-size chunks with constant memory.
     """
 
     def __init__(self, start_date, end_date, data_types, data_size, dataset):
@@ -36,20 +42,31 @@ class TimeSeries:
         self.outlier_percentage = dataset.get_outlier_percentage()
         self.noise_level = dataset.get_noise_level()
         self.seasonality_components= dataset.get_seasonality_components()
+        self.noise_type = dataset.get_noise_type()
+        self.seed = dataset.get_seed()
 
 
-    def _generate_time_series(self):
+    def _calendar_features(self):
         """
-        Generate the date-time index for the time series data.
+        Get the date-time index and its calendar fields from the process-wide cache.
 
         Returns:
-            pandas.DatetimeIndex: A date-time index based on the configuration settings.
+            CalendarFeatures: The calendar features based on the configuration settings.
         """
         # if the request has no end date, generate the time series data based on the data size
         if self.end_date:
-            return pd.date_range(start=self.start_date, end=self.end_date, freq=self.frequencies)
+            return get_calendar_features(start=self.start_date, end=self.end_date, freq=self.frequencies)
         else:
-            return pd.date_range(start=self.start_date, periods=self.data_size, freq=self.frequencies)
+            return get_calendar_features(start=self.start_date, periods=self.data_size, freq=self.frequencies)
+
+    def _generate_time_series(self):
+        """
+        Generate the date-time index for the time series data.
+
+        Returns:
+            pandas.DatetimeIndex: A date-time index based on the configuration settings.
+        """
+        return self._calendar_features().index
 
     def _transform_data(self, data):
         """
@@ -65,22 +82,25 @@ class TimeSeries:
         data = pd.Series(np.concatenate(data))
 
         return data
-    def generate_data(self):
+    def _component(self, date_time_series, position=0):
         """
-        Generate the time series data based on seasonality and trend components.
+        Calculate the cycle, trend and seasonality components for a date-time index.
+
+        Args:
+            date_time_series (CalendarFeatures): The timestamps to calculate the components for.
+            position (int): The position of the first timestamp in the whole series, used by the trend.
 
         Returns:
-            tuple: A tuple containing the generated time series data and the corresponding date-time index.
+            pandas.Series: The combined components before scaling.
         """
-        date_time_series = self._generate_time_series()
         data_size=len(date_time_series)
         component = np.zeros(data_size) if self.data_types == 'additive' else np.ones(data_size)
         if self.data_types == 'additive':
             component += self.cycle_amplitude * np.sin(self.cycle_frequency* (date_time_series.dayofyear/365))
-            component += Trend(data_size,self.data_types,self.trend_coefficients).component()
+            component += Trend(data_size,self.data_types,self.trend_coefficients,position).component()
         else:
             component *= self.cycle_amplitude * np.sin(self.cycle_frequency* (date_time_series.dayofyear/365))
-            component *= Trend(data_size,self.data_types,self.trend_coefficients).component()
+            component *= Trend(data_size,self.data_types,self.trend_coefficients,position).component()
 
         # Iterate through Seasonality components
         for seasonality_component in self.seasonality_components:
@@ -89,10 +109,311 @@ class TimeSeries:
                 component += calculate_seasonality(date_time_series,self.data_types,seasonality_component)
             else:
                 component *= calculate_seasonality(date_time_series,self.data_types,seasonality_component)
+        return pd.Series(component)
+
+    def generate_data(self):
+        """
+        Generate the time series data based on seasonality and trend components.
 
-        # Iterate through the trend coefficients in reverse order
+        Returns:
+            tuple: A tuple containing the generated time series data and the corresponding date-time index.
+        """
+        calendar_features = self._calendar_features()
+        date_time_series = calendar_features.index
+        component = self._component(calendar_features)
         data = self._transform_data(component)
-        data, anomaly_mask = EditData(data,self.missing_percentage,self.noise_level,self.outlier_percentage).apply()
+        # A stored seed reproduces the noise, outliers and missing values of a run exactly
+        rng = np.random.default_rng(self.seed)
+        data, anomaly_mask = EditData(data,self.missing_percentage,self.noise_level,self.outlier_percentage,
+                                      self.noise_type,rng).apply()
         return date_time_series,data, anomaly_mask
 
+    def generate_chunks(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Stream the time series data in fixed-size chunks so memory does not grow with the series length.
+
+        Args:
+            chunk_size (int): The maximum number of points per chunk.
+
+        Yields:
+            SeriesData: The chunk's timestamps, data and anomaly mask.
+        """
+        for chunks in BatchTimeSeries([self]).generate_chunks(chunk_size):
+            yield chunks[0]
+
+
+def generate_time_series_chunks(start_date, end_date, data_size, frequency, chunk_size, position=0):
+    """
+    Generate a date-time index and its calendar fields in consecutive chunks without building the whole range.
+
+    The chunks come from the process-wide calendar cache, so sibling datasets, the scaling pass
+    and repeated runs reuse them instead of rebuilding them.
+
+    Args:
+        start_date: The first timestamp to generate.
+        end_date: The last timestamp of the series, or None to stop after data_size timestamps.
+        data_size (int): The number of timestamps of the series, or None to stop at the end date.
+        frequency (str): The frequency of the series.
+        chunk_size (int): The maximum number of timestamps per chunk.
+        position (int): The position of start_date in the series, when resuming a series.
+
+    Yields:
+        tuple: The position of the first timestamp in the series and the chunk's CalendarFeatures.
+    """
+    offset = pd.tseries.frequencies.to_offset(frequency)
+    start = pd.Timestamp(start_date)
+    end = align_timestamp(end_date, start) if end_date else None
+    remaining = data_size - position if data_size is not None else None
+    while remaining is None or remaining > 0:
+        periods = chunk_size if remaining is None else min(chunk_size, remaining)
+        if end is not None:
+            periods = _periods_until(start, end, offset, periods)
+            if periods == 0:
+                return
+        dates = get_calendar_features(start=start, periods=periods, freq=offset)
+        if end is not None:
+            dates = dates[:int(np.searchsorted(dates.index, end, side='right'))]
+        if len(dates) == 0:
+            return
+        yield position, dates
+        position += len(dates)
+        if remaining is not None:
+            remaining -= len(dates)
+        if len(dates) < periods:
+            return
+        start = dates.index[-1] + offset
+
+
+def _periods_until(start, end, offset, periods):
+    """
+    Get how many of periods timestamps from start fall before the end date.
+
+    A chunk of a coarse frequency can reach past the end of the timestamp range, e.g. 100000 days
+    from 2020, so the chunk is shortened to the end date instead of being built and sliced.
+
+    Returns:
+        int: The number of timestamps, at most periods.
+    """
+    try:
+        last = start + (periods - 1) * offset
+    except (OverflowError, pd.errors.OutOfBoundsDatetime):
+        last = None
+    if last is not None and last <= end:
+        return periods
+    # Fewer than periods timestamps are left, so the range up to the end is short
+    return len(pd.date_range(start, end, freq=offset))
+
+
+def align_timestamp(timestamp, like):
+    """
+    Convert a timestamp to the time zone awareness of another, naive timestamps being taken as UTC.
+
+    Args:
+        timestamp: The timestamp to convert.
+        like (pandas.Timestamp): The timestamp whose awareness to match.
+
+    Returns:
+        pandas.Timestamp: The converted timestamp.
+    """
+    timestamp = pd.Timestamp(timestamp)
+    if like.tz is None and timestamp.tz is not None:
+        return timestamp.tz_convert('UTC').tz_localize(None)
+    if like.tz is not None and timestamp.tz is None:
+        return timestamp.tz_localize('UTC').tz_convert(like.tz)
+    return timestamp
+
+
+def group_by_frequency(datasets):
+    """
+    Group datasets that share a frequency, so each group can be generated as one batch.
+
+    Args:
+        datasets (list): The dataset configurations.
+
+    Returns:
+        dict: The positions of the datasets in the list, keyed by frequency.
+    """
+    groups = {}
+    for i, dataset in enumerate(datasets):
+        groups.setdefault(DatasetConfigurationManager(dataset).get_frequency(), []).append(i)
+    return groups
+
+
+class BatchTimeSeries:
+    """
+    A class for generating several time series that share a date range and frequency in one vectorized pass.
+
+    The date range and calendar fields are built once per chunk, and the cycle, trend and seasonality
+    of every dataset are evaluated together as a 2-D array with shape (datasets, time). Scaling runs
+    on the whole array, then each dataset's noise and anomalies are drawn from its own generator.
+
+    Args:
+        time_series (list): The TimeSeries of each dataset, they must share the same frequency.
+
+    Methods:
+        generate_chunks(): Stream the time series data of all datasets in fixed-size chunks.
+    """
+
+    def __init__(self, time_series):
+        if len({series.frequencies for series in time_series}) != 1:
+            raise ValueError("Datasets in a batch must share the same frequency")
+        self.time_series = time_series
+        first = time_series[0]
+        self.start_date = first.start_date
+        self.end_date = first.end_date
+        self.data_size = first.data_size
+        self.data_types = first.data_types
+        self.frequencies = first.frequencies
+        self.cycle_amplitude = np.array([series.cycle_amplitude for series in time_series], dtype=float)[:, None]
+        self.cycle_frequency = np.array([series.cycle_frequency for series in time_series], dtype=float)[:, None]
+
+    def _component(self, date_time_series, position=0):
+        """
+        Calculate the cycle, trend and seasonality components of every dataset.
+
+        Returns:
+            numpy.ndarray: The combined components before scaling with shape (datasets, time).
+        """
+        data_size = len(date_time_series)
+        cycle = self.cycle_amplitude * np.sin(self.cycle_frequency * (date_time_series.dayofyear / 365))
+        trend = calculate_trends(data_size, self.data_types,
+                                 [series.trend_coefficients for series in self.time_series], position)
+        seasonality = calculate_seasonalities(date_time_series, self.data_types,
+                                              [series.seasonality_components for series in self.time_series])
+        if self.data_types == 'additive':
+            return cycle + trend + seasonality
+        return cycle * trend * seasonality
+
+    def _date_chunks(self, chunk_size, start=None, position=0, until=None):
+        """
+        Generate the date-time index chunks of the series, or of its part from start up to until.
+
+        Yields:
+            tuple: The position of the first timestamp in the series and the chunk's CalendarFeatures.
+        """
+        start = pd.Timestamp(start if start is not None else self.start_date)
+        end, data_size = (self.end_date, None) if self.end_date else (None, self.data_size)
+        if until is not None:
+            until = align_timestamp(until, start)
+            end = min(align_timestamp(end, start), until) if end else until
+        return generate_time_series_chunks(start, end, data_size, self.frequencies, chunk_size, position)
+
+    def _component_bounds(self, chunk_size, start=None, position=0, until=None):
+        """
+        Find the size and each dataset's minimum and maximum of the components in a first pass over the chunks.
+
+        Returns:
+            tuple: The number of points, the minimums and the maximums of the components.
+        """
+        data_size = 0
+        low = np.full(len(self.time_series), np.inf)
+        high = np.full(len(self.time_series), -np.inf)
+        for chunk_position, dates in self._date_chunks(chunk_size, start, position, until):
+            component = self._component(dates, chunk_position)
+            data_size += component.shape[1]
+            low, high = np.minimum(low, component.min(axis=1)), np.maximum(high, component.max(axis=1))
+        return data_size, low, high
+
+    def _resume(self, checkpoints):
+        """
+        Get where the datasets resume from their checkpoints.
+
+        Returns:
+            tuple: The first timestamp and position to generate, the minimums and maximums of the
+                components so far and the random generator of each dataset.
+        """
+        positions = {checkpoint.get('position', 0) for checkpoint in checkpoints}
+        if len(positions) != 1:
+            raise ValueError("Datasets in a batch must resume from the same position")
+        position = positions.pop()
+        start = None
+        if position:
+            last_timestamp = align_timestamp(checkpoints[0]['last_timestamp'], pd.Timestamp(self.start_date))
+            start = last_timestamp + pd.tseries.frequencies.to_offset(self.frequencies)
+        low = np.array([checkpoint.get('low', np.inf) for checkpoint in checkpoints], dtype=float)
+        high = np.array([checkpoint.get('high', -np.inf) for checkpoint in checkpoints], dtype=float)
+        rngs = []
+        for series, checkpoint in zip(self.time_series, checkpoints):
+            rng = np.random.default_rng(series.seed)
+            if checkpoint.get('rng_state'):
+                rng.bit_generator.state = checkpoint['rng_state']
+            rngs.append(rng)
+        return start, position, low, high, rngs
+
+    @staticmethod
+    def _scale(component, low, high):
+        """
+        Scale each dataset's components to (-1,1) from known bounds, the same way MinMaxScaler does.
+
+        Return:
+            numpy.ndarray: data after transformation
+        """
+        data_range = np.where(high > low, high - low, 1.0)
+        scale = 2 / data_range
+        return component * scale[:, None] + (-1 - low * scale)[:, None]
+
+    def generate_chunks(self, chunk_size=DEFAULT_CHUNK_SIZE, checkpoints=None, until=None):
+        """
+        Stream the time series data of all datasets in fixed-size chunks.
+
+        A cheap first pass over the deterministic components finds the scaling bounds, so the values
+        are scaled to (-1,1) exactly as TimeSeries.generate_data does. The missing values and outliers
+        are spread over the chunks so their totals match the configured percentages of the whole series.
+
+        With checkpoints, only the points after each dataset's checkpoint and up to until are generated.
+        The random generators continue from their saved state, the scaling bounds are the running
+        minimum and maximum of every point generated so far, and the percentages apply to the new
+        points. The checkpoints are updated in place as each chunk is yielded.
+
+        Args:
+            chunk_size (int): The maximum number of points per chunk.
+            checkpoints (list): The checkpoint dict of each dataset, empty for a dataset never generated.
+            until: The last timestamp to generate, defaults to the end of the series.
+
+        Yields:
+            list: The chunk of each dataset as SeriesData, sharing one timestamp array.
+        """
+        if checkpoints is not None:
+            start, position, low, high, rngs = self._resume(checkpoints)
+        else:
+            start, position = None, 0
+            low = np.full(len(self.time_series), np.inf)
+            high = np.full(len(self.time_series), -np.inf)
+            # A stored seed reproduces the noise, outliers and missing values of a run exactly
+            rngs = [np.random.default_rng(series.seed) for series in self.time_series]
+        data_size, chunk_low, chunk_high = self._component_bounds(chunk_size, start, position, until)
+        if data_size == 0:
+            return
+        low, high = np.minimum(low, chunk_low), np.maximum(high, chunk_high)
+        num_missing = [int(data_size * series.missing_percentage) for series in self.time_series]
+        num_outliers = [int(data_size * series.outlier_percentage) for series in self.time_series]
+        remaining = data_size
+        for chunk_position, dates in self._date_chunks(chunk_size, start, position, until):
+            size = len(dates)
+            data = self._scale(self._component(dates, chunk_position), low, high)
+            chunks = []
+            for i, series in enumerate(self.time_series):
+                rng = rngs[i]
+                # Draw how many of the remaining missing values and outliers fall in this chunk
+                chunk_missing = rng.hypergeometric(size, remaining - size, num_missing[i]) if num_missing[i] else 0
+                chunk_outliers = rng.hypergeometric(size, remaining - size, num_outliers[i]) if num_outliers[i] else 0
+                num_missing[i] -= chunk_missing
+                num_outliers[i] -= chunk_outliers
 
+                values, anomaly_mask = EditData(pd.Series(data[i]), series.missing_percentage, series.noise_level,
+                                                series.outlier_percentage, series.noise_type,
+                                                rng).apply(chunk_missing, chunk_outliers)
+                chunks.append(SeriesData(dates.timestamps, values.to_numpy(dtype=float), np.packbits(anomaly_mask),
+                                         dates.tz))
+            remaining -= size
+            if checkpoints is not None:
+                # Updated before the yield, so a consumer stopping after any chunk holds the checkpoint to resume from
+                for i, checkpoint in enumerate(checkpoints):
+                    checkpoint.update({
+                        'position': position + data_size - remaining,
+                        'last_timestamp': dates.index[-1].isoformat(),
+                        'rng_state': rngs[i].bit_generator.state,
+                        'low': float(low[i]),
+                        'high': float(high[i]),
+                    })
+            yield chunks
@@ -0,0 +1,236 @@
+import logging
+import multiprocessing
+import os
+import socket
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+from django.db.models import F, OuterRef, Subquery
+from django.utils import timezone
+
+
+class QueueFull(Exception):
+    """
+    Raised when a simulator run is queued while the queue already holds max_depth jobs.
+    """
+
+
+def enqueue(simulator_id, priority=0, max_depth=None):
+    """
+    Queue a run of a simulator for the worker pool and mark the simulator as running.
+
+    Args:
+        simulator_id (int): The ID of the simulator to run.
+        priority (int): Jobs with a higher priority are started first.
+        max_depth (int): The largest number of queued jobs, defaults to the SIMULATOR_QUEUE setting.
+
+    Raises:
+        QueueFull: When the queue already holds max_depth jobs.
+
+    Returns:
+        SimulatorJob: The queued job.
+    """
+    from simulator_api import models
+    max_depth = settings.SIMULATOR_QUEUE['max_depth'] if max_depth is None else max_depth
+    # The depth is checked before the insert, so concurrent requests can overshoot it by a few jobs
+    if models.SimulatorJob.objects.filter(status='Queued').count() >= max_depth:
+        raise QueueFull(f"The simulator queue is full with {max_depth} jobs, retry later")
+    # Workers only see the job once the simulator is marked running, so a fast run cannot be overwritten
+    with transaction.atomic():
+        models.Simulator.objects.filter(id=simulator_id).update(status='Running', process_id=None,
+                                                                updated_at=timezone.now())
+        return models.SimulatorJob.objects.create(simulator_id_id=simulator_id, priority=priority)
+
+
+def next_job():
+    """
+    Get the queued job to start next.
+
+    The highest priority goes first. Among jobs of equal priority, the simulator whose last run
+    started the longest ago goes first, so a simulator queued many times cannot starve the others,
+    and a simulator never runs twice at the same time.
+
+    Returns:
+        SimulatorJob: The job, or None when nothing can be started.
+    """
+    from simulator_api import models
+    running = models.SimulatorJob.objects.filter(status='Running').values('simulator_id')
+    last_started = models.SimulatorJob.objects.filter(simulator_id=OuterRef('simulator_id'),
+                                                      started_at__isnull=False) \
+        .order_by('-started_at').values('started_at')[:1]
+    return models.SimulatorJob.objects.filter(status='Queued').exclude(simulator_id__in=running) \
+        .annotate(last_started=Subquery(last_started)) \
+        .order_by('-priority', F('last_started').asc(nulls_first=True), 'id').first()
+
+
+def claim_job(worker):
+    """
+    Take the next queued job for a worker.
+
+    A job is claimed by moving it from 'Queued' to 'Running' in a single update, so two workers
+    never claim the same job.
+
+    Args:
+        worker (str): The name of the worker.
+
+    Returns:
+        SimulatorJob: The claimed job, or None when nothing can be started.
+    """
+    from simulator_api import models
+    while True:
+        job = next_job()
+        if job is None:
+            return None
+        started_at = timezone.now()
+        if models.SimulatorJob.objects.filter(id=job.id, status='Queued').update(status='Running', worker=worker,
+                                                                                 started_at=started_at):
+            job.status, job.worker, job.started_at = 'Running', worker, started_at
+            return job
+
+
+def finish_job(job, status):
+    """
+    Record the end of a job.
+
+    Returns:
+        None
+    """
+    from simulator_api import models
+    models.SimulatorJob.objects.filter(id=job.id).update(status=status, finished_at=timezone.now())
+
+
+def cancel_jobs(simulator_id):
+    """
+    Cancel the queued jobs of a simulator.
+
+    Returns:
+        int: The number of cancelled jobs.
+    """
+    from simulator_api import models
+    return models.SimulatorJob.objects.filter(simulator_id=simulator_id, status='Queued') \
+        .update(status='Cancelled', finished_at=timezone.now())
+
+
+def fail_worker_jobs(worker):
+    """
+    End the jobs a dead worker was running, failing their simulators unless they were stopped.
+
+    Returns:
+        None
+    """
+    from simulator_api import models
+    for job in models.SimulatorJob.objects.filter(worker=worker, status='Running'):
+        stopped = not models.Simulator.objects.filter(id=job.simulator_id_id, status='Running') \
+            .update(status='Failed', updated_at=timezone.now())
+        finish_job(job, 'Cancelled' if stopped else 'Failed')
+
+
+def run_job(job):
+    """
+    Run the simulator of a claimed job in the current process and record the outcome.
+
+    Returns:
+        None
+    """
+    from simulator_api import models
+    from simulator_api.timeseries.simulator import run_simulator
+    simulator_id = job.simulator_id_id
+    models.Simulator.objects.filter(id=simulator_id).update(process_id=os.getpid(), updated_at=timezone.now())
+    # The pool is long-lived, so every run logs to its own file like a dedicated process would
+    handler = logging.FileHandler(f'simulate_simulator_{simulator_id}.log')
+    logging.getLogger().addHandler(handler)
+    try:
+        status = run_simulator(simulator_id)
+    finally:
+        logging.getLogger().removeHandler(handler)
+        handler.close()
+    close_old_connections()
+    # A stopped run is resumed by the next job of the simulator
+    finish_job(job, 'Cancelled' if status == 'Stopped' else status)
+
+
+def work(worker, poll_interval=0.1, stop_event=None, drain=False):
+    """
+    Run queued jobs one after the other.
+
+    Args:
+        worker (str): The name of the worker.
+        poll_interval (float): The seconds to wait before looking again when the queue is empty.
+        stop_event: Stops working between two jobs when set, works forever when None.
+        drain (bool): Whether to return once nothing can be started instead of waiting.
+
+    Returns:
+        int: The number of jobs run.
+    """
+    jobs = 0
+    while stop_event is None or not stop_event.is_set():
+        close_old_connections()
+        job = claim_job(worker)
+        if job is None:
+            if drain:
+                break
+            time.sleep(poll_interval)
+            continue
+        try:
+            run_job(job)
+        except Exception as e:
+            logging.error(f'Error in job {job.id} of simulator {job.simulator_id_id}: {str(e)}')
+            finish_job(job, 'Failed')
+        jobs += 1
+    return jobs
+
+
+def _worker_main(worker, poll_interval, stop_event):
+    import django
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "djangoproject.settings")
+    # A no-op in a forked worker, which inherits the set up Django of the pool
+    django.setup()
+    logging.basicConfig(level=logging.INFO)
+    work(worker, poll_interval, stop_event)
+
+
+def serve_workers(concurrency=None, poll_interval=None, stop_event=None):
+    """
+    Keep a pool of worker processes running queued jobs, replacing the ones that die.
+
+    The workers are started once and reused for every job, so starting a run costs a queue handoff
+    instead of a process start and a Django set up.
+
+    Args:
+        concurrency (int): The number of worker processes, defaults to the SIMULATOR_QUEUE setting.
+        poll_interval (float): The seconds between two polls of the queue and of the workers.
+        stop_event (multiprocessing.Event): Stops the pool when set, serves forever when None.
+
+    Returns:
+        None
+    """
+    concurrency = concurrency or settings.SIMULATOR_QUEUE['concurrency']
+    poll_interval = poll_interval or settings.SIMULATOR_QUEUE['poll_interval']
+    stop_event = stop_event or multiprocessing.Event()
+    prefix = f'{socket.gethostname()}:{os.getpid()}'
+    workers = {}
+
+    def start(slot):
+        name = f'{prefix}/{slot}'
+        process = multiprocessing.Process(target=_worker_main, args=(name, poll_interval, stop_event), name=name)
+        process.start()
+        workers[slot] = (name, process)
+
+    # Forked workers must not share the connection of the pool
+    connections.close_all()
+    for slot in range(concurrency):
+        start(slot)
+    try:
+        while not stop_event.wait(poll_interval):
+            for slot, (name, process) in list(workers.items()):
+                if not process.is_alive():
+                    logging.error(f'Worker {name} exited with code {process.exitcode}, restarting it')
+                    close_old_connections()
+                    fail_worker_jobs(name)
+                    connections.close_all()
+                    start(slot)
+    finally:
+        stop_event.set()
+        for name, process in workers.values():
+            process.join()
@@ -0,0 +1,197 @@
+import atexit
+import json
+import os
+import threading
+import zlib
+from io import BytesIO
+
+# Avro schema of one generated point
+AVRO_SCHEMA = {
+    'type': 'record',
+    'name': 'SimulatorPoint',
+    'fields': [
+        {'name': 'simulator', 'type': ['null', 'long']},
+        {'name': 'dataset', 'type': 'int'},
+        {'name': 'timestamp', 'type': 'long'},
+        {'name': 'value', 'type': ['null', 'double']},
+        {'name': 'anomaly', 'type': 'boolean'},
+    ],
+}
+
+
+def get_serializer(schema):
+    """
+    Get the function encoding a point record for the given message schema.
+
+    Args:
+        schema (str): 'json', 'avro' (requires fastavro) or 'msgpack' (requires msgpack).
+
+    Returns:
+        callable: A function encoding a record dict to bytes.
+    """
+    if schema == 'json':
+        return lambda record: json.dumps(record, separators=(',', ':')).encode('utf-8')
+    if schema == 'msgpack':
+        try:
+            import msgpack
+        except ImportError:
+            raise ImportError("The msgpack package is required for the msgpack message schema")
+        return msgpack.packb
+    if schema == 'avro':
+        try:
+            import fastavro
+        except ImportError:
+            raise ImportError("The fastavro package is required for the avro message schema")
+        parsed_schema = fastavro.parse_schema(AVRO_SCHEMA)
+
+        def serialize(record):
+            buffer = BytesIO()
+            fastavro.schemaless_writer(buffer, parsed_schema, record)
+            return buffer.getvalue()
+        return serialize
+    raise ValueError("Unsupported message schema")
+
+
+def get_chunk_serializer(schema):
+    """
+    Get the function encoding every point of a chunk as a record for the given message schema.
+
+    JSON records are formatted from a template, giving the same bytes as encoding each record dict
+    with the 'json' serializer without building a dict and running the generic encoder per point.
+
+    Args:
+        schema (str): 'json', 'avro' (requires fastavro) or 'msgpack' (requires msgpack).
+
+    Returns:
+        callable: A function taking the simulator ID, the dataset number and the timestamp, value
+            and anomaly lists of a chunk, returning the encoded records.
+    """
+    if schema == 'json':
+        def serialize_chunk(simulator, dataset, timestamps, values, anomalies):
+            head = f'{{"simulator":{json.dumps(simulator)},"dataset":{json.dumps(dataset)},"timestamp":'
+            # float.__repr__ is what the json module writes a float with, NaN marks a missing value
+            texts = ['null' if value != value else repr(value) for value in values]
+            flags = ['true' if anomaly else 'false' for anomaly in anomalies]
+            return [f'{head}{timestamp},"value":{text},"anomaly":{flag}}}'.encode('utf-8')
+                    for timestamp, text, flag in zip(timestamps, texts, flags)]
+        return serialize_chunk
+    serialize = get_serializer(schema)
+
+    def serialize_chunk(simulator, dataset, timestamps, values, anomalies):
+        return [serialize({'simulator': simulator, 'dataset': dataset, 'timestamp': timestamp,
+                           'value': None if value != value else value, 'anomaly': anomaly})
+                for timestamp, value, anomaly in zip(timestamps, values, anomalies)]
+    return serialize_chunk
+
+
+class KafkaTransport:
+    """
+    A base class for the transports DataProducerKafka sends records through.
+
+    Methods:
+        send(topic, key, value, on_delivery): Send a record, on_delivery(error) is called once it is acknowledged.
+        flush(timeout): Block until every sent record is acknowledged, for at most timeout seconds.
+        close(): Release the transport.
+    """
+
+    def send(self, topic, key, value, on_delivery):
+        pass
+
+    def flush(self, timeout=None):
+        pass
+
+    def close(self):
+        pass
+
+
+class InMemoryKafkaTransport(KafkaTransport):
+    """
+    An in-process broker stand-in keeping records per topic partition, for tests and local runs.
+
+    Records are partitioned by a hash of their key like a Kafka producer does, and acknowledged
+    as soon as they are stored.
+
+    Args:
+        partitions (int): The number of partitions of every topic.
+    """
+
+    def __init__(self, partitions=4):
+        self.partitions = partitions
+        self.topics = {}
+
+    def partition(self, key):
+        return zlib.crc32(key) % self.partitions
+
+    def send(self, topic, key, value, on_delivery):
+        partitions = self.topics.setdefault(topic, [[] for _ in range(self.partitions)])
+        partitions[self.partition(key)].append((key, value))
+        on_delivery(None)
+
+    def records(self, topic):
+        """
+        Get every record of a topic, partition by partition.
+
+        Returns:
+            list: The (key, value) records.
+        """
+        return [record for partition in self.topics.get(topic, []) for record in partition]
+
+
+class KafkaPythonTransport(KafkaTransport):
+    """
+    A transport sending records to a Kafka cluster with kafka-python.
+
+    The client batches records per partition, so linger_ms and batch_size trade latency for larger,
+    better compressed requests.
+
+    Args:
+        bootstrap_servers (str): The Kafka brokers to connect to.
+        linger_ms (int): How long the client waits for more records before sending a batch.
+        batch_size (int): The maximum size in bytes of a batch per partition.
+        compression_type (str): 'gzip', 'snappy', 'lz4', 'zstd' or None.
+    """
+
+    def __init__(self, bootstrap_servers, linger_ms=20, batch_size=64 * 1024, compression_type='gzip'):
+        try:
+            from kafka import KafkaProducer
+        except ImportError:
+            raise ImportError("The kafka-python package is required for the kafka producer")
+        self.producer = KafkaProducer(bootstrap_servers=bootstrap_servers, linger_ms=linger_ms,
+                                      batch_size=batch_size, compression_type=compression_type)
+
+    def send(self, topic, key, value, on_delivery):
+        future = self.producer.send(topic, key=key, value=value)
+        future.add_callback(lambda metadata: on_delivery(None))
+        future.add_errback(on_delivery)
+
+    def flush(self, timeout=None):
+        self.producer.flush(timeout)
+
+    def close(self):
+        self.producer.close()
+
+
+_shared_transports = {}
+_shared_transports_lock = threading.Lock()
+
+
+def get_shared_transport(bootstrap_servers, linger_ms=20, batch_size=64 * 1024, compression_type='gzip'):
+    """
+    Get the KafkaPythonTransport of the current process for the given settings, creating it on first use.
+
+    Every producer of a run, and every run of a worker process, sends through one client, so the
+    connections and batches are not set up again for every dataset. The clients are closed when the
+    process exits. The process ID is part of the key, so a forked worker never uses the client of
+    its parent.
+
+    Returns:
+        KafkaPythonTransport: The shared transport.
+    """
+    key = (os.getpid(), bootstrap_servers, linger_ms, batch_size, compression_type)
+    with _shared_transports_lock:
+        transport = _shared_transports.get(key)
+        if transport is None:
+            transport = KafkaPythonTransport(bootstrap_servers, linger_ms, batch_size, compression_type)
+            _shared_transports[key] = transport
+            atexit.register(transport.close)
+        return transport
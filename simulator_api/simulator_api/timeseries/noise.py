@@ -0,0 +1,90 @@
+import numpy as np
+from abc import abstractmethod
+
+
+class Noise:
+    """
+    A base class for noise components drawn from a numpy random Generator.
+
+    Every component draws all of its samples in a single vectorized call, so the cost
+    of adding noise does not depend on a Python loop over the points.
+
+    Args:
+        noise_level (float): The scale of the noise.
+        rng (numpy.random.Generator): The generator used to draw the samples.
+    """
+
+    def __init__(self, noise_level, rng):
+        self.noise_level = noise_level
+        self.rng = rng
+
+    @abstractmethod
+    def calculate(self, data):
+        pass
+
+
+class GaussianNoise(Noise):
+    """Gaussian noise with a standard deviation of abs(value) * noise_level."""
+
+    def calculate(self, data):
+        return self.rng.normal(loc=0, scale=np.abs(data) * self.noise_level)
+
+
+class FixedGaussianNoise(Noise):
+    """Gaussian noise with a fixed standard deviation of noise_level."""
+
+    def calculate(self, data):
+        return self.rng.normal(loc=0, scale=self.noise_level, size=len(data))
+
+
+class LaplaceNoise(Noise):
+    """Laplace noise with a scale of noise_level."""
+
+    def calculate(self, data):
+        return self.rng.laplace(loc=0, scale=self.noise_level, size=len(data))
+
+
+class StudentTNoise(Noise):
+    """Heavy tailed Student's t noise scaled by noise_level."""
+
+    degrees_of_freedom = 3
+
+    def calculate(self, data):
+        return self.noise_level * self.rng.standard_t(self.degrees_of_freedom, size=len(data))
+
+
+class LognormalNoise(Noise):
+    """Multiplicative lognormal noise, returned as the difference it makes to each value."""
+
+    def calculate(self, data):
+        factor = self.rng.lognormal(mean=0, sigma=self.noise_level, size=len(data))
+        return np.asarray(data) * (factor - 1)
+
+
+NOISE_TYPES = {
+    'gaussian': GaussianNoise,
+    'fixed_gaussian': FixedGaussianNoise,
+    'laplace': LaplaceNoise,
+    'student_t': StudentTNoise,
+    'lognormal': LognormalNoise,
+}
+
+
+def calculate_noise(data, noise_type, noise_level, rng):
+    """
+    Draw the noise to be added to the data in one vectorized call.
+
+    Args:
+        data (array-like): The values the noise is added to.
+        noise_type (str): One of the keys of NOISE_TYPES.
+        noise_level (float): The scale of the noise, 0 disables it.
+        rng (numpy.random.Generator): The generator used to draw the samples.
+
+    Returns:
+        numpy.ndarray: The noise for every point of the data.
+    """
+    if noise_type not in NOISE_TYPES:
+        raise ValueError("Unsupported noise_type")
+    if noise_level <= 0:
+        return np.zeros(len(data))
+    return NOISE_TYPES[noise_type](noise_level, rng).calculate(np.asarray(data, dtype=float))
@@ -0,0 +1,86 @@
+import time
+
+from django.db.models import F
+from django.utils import timezone
+
+from simulator_api import models
+
+
+class ProgressReporter:
+    """
+    Count the points of a simulator run and save them to its SimulatorProgress at most once per interval.
+
+    Saving on every chunk would add a write per chunk to the run, so the counts are accumulated in
+    memory and saved as increments when interval seconds have passed since the last save.
+
+    Worker processes of a run are given a queue: their counts are put on it instead of saved, and the
+    process running the simulator saves them when draining the queue, so the workers never use the
+    database.
+
+    Args:
+        simulator_id (int): The ID of the simulator.
+        interval (float): The least number of seconds between two saves.
+        queue: The queue worker processes put their counts on, None to save them directly.
+
+    Methods:
+        start(): Reset the progress of the simulator for a new run.
+        add(dataset, generated, written): Count points of a dataset, saving them when the interval passed.
+        flush(): Save or queue the counted points now.
+        drain(): Save the points the worker processes queued.
+        finish(): Save the remaining points and mark the run as ended.
+    """
+
+    def __init__(self, simulator_id, interval=1.0, queue=None):
+        self.simulator_id = simulator_id
+        self.interval = interval
+        self.queue = queue
+        self.generated = 0
+        self.written = 0
+        self.dataset = None
+        self.flushed_at = time.monotonic()
+
+    def start(self):
+        now = timezone.now()
+        models.SimulatorProgress.objects.update_or_create(
+            simulator_id_id=self.simulator_id,
+            defaults={'points_generated': 0, 'points_written': 0, 'current_dataset': None, 'started_at': now,
+                      'updated_at': now, 'finished_at': None})
+        self.flushed_at = time.monotonic()
+
+    def add(self, dataset, generated=0, written=0):
+        self.generated += generated
+        self.written += written
+        self.dataset = dataset
+        if time.monotonic() - self.flushed_at >= self.interval:
+            self.flush()
+
+    def flush(self):
+        if self.generated or self.written:
+            if self.queue is not None:
+                self.queue.put((self.dataset, self.generated, self.written))
+            else:
+                self._save(self.dataset, self.generated, self.written)
+        self.generated = self.written = 0
+        self.flushed_at = time.monotonic()
+
+    def drain(self):
+        if self.queue is None:
+            return
+        dataset, generated, written = None, 0, 0
+        while not self.queue.empty():
+            dataset, queued_generated, queued_written = self.queue.get()
+            generated += queued_generated
+            written += queued_written
+        if generated or written:
+            self._save(dataset, generated, written)
+
+    def finish(self):
+        self.flush()
+        self.drain()
+        models.SimulatorProgress.objects.filter(simulator_id=self.simulator_id).update(finished_at=timezone.now())
+
+    def _save(self, dataset, generated, written):
+        # Increments, so the counts of concurrent runs of batches add up instead of overwriting each other
+        models.SimulatorProgress.objects.filter(simulator_id=self.simulator_id).update(
+            points_generated=F('points_generated') + generated, points_written=F('points_written') + written,
+            current_dataset=dataset, updated_at=timezone.now())
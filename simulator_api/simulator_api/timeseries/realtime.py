@@ -0,0 +1,177 @@
+import asyncio
+import json
+import logging
+
+import numpy as np
+import pandas as pd
+from asgiref.sync import sync_to_async
+
+from simulator_api.timeseries.generate_time_series import group_by_frequency
+
+# Points generated ahead of the wall clock per dataset, kept small as one process paces many simulators
+REALTIME_CHUNK_SIZE = 1024
+
+
+class PacedEmitter:
+    """
+    Emits a simulator's data on the wall clock, starting from its start date.
+
+    A point with timestamp t is emitted when (t - start_date) / speed_factor seconds have passed
+    since the emitter started. Every wait is computed from that fixed origin rather than from the
+    previous wait, so scheduling errors never accumulate: a late wake-up emits every point that
+    became due at once and the next wait is shorter.
+
+    Generating the chunks and opening, writing and closing the producers run in the default executor
+    of the loop, so neither the generation nor a slow producer delays the other emitters of the loop.
+
+    Args:
+        simulator (Simulator): The simulator to emit.
+        speed_factor (float): How much faster than the wall clock to emit, defaults to the simulator's.
+        producer_factory (callable): Creates the producer of a dataset number, defaults to the simulator's producer.
+        chunk_size (int): The number of points generated ahead of the wall clock per dataset.
+
+    Methods:
+        run(): Emit every dataset of the simulator until it ends or stop() is called.
+        stop(): Stop emitting after the points already due.
+    """
+
+    def __init__(self, simulator, speed_factor=None, producer_factory=None, chunk_size=REALTIME_CHUNK_SIZE):
+        self.simulator = simulator
+        self.speed_factor = speed_factor or simulator.speed_factor
+        self.producer_factory = producer_factory or simulator._producer
+        self.chunk_size = chunk_size
+        self.stopped = asyncio.Event()
+        self.points = 0
+
+    def stop(self):
+        self.stopped.set()
+
+    async def run(self):
+        """
+        Emit every dataset of the simulator until it ends or stop() is called.
+
+        Returns:
+            None
+        """
+        loop = asyncio.get_running_loop()
+        origin = pd.Timestamp(self.simulator.start_date).value
+        wall_origin = loop.time()
+        _, seeds = self.simulator._seeds()
+        await asyncio.gather(*[self._emit(indices, [seeds[i] for i in indices], origin, wall_origin)
+                               for indices in group_by_frequency(self.simulator.datasets).values()])
+
+    async def _sleep_until(self, wall_time):
+        loop = asyncio.get_running_loop()
+        try:
+            await asyncio.wait_for(self.stopped.wait(), max(0.0, wall_time - loop.time()))
+        except asyncio.TimeoutError:
+            pass
+
+    async def _emit(self, indices, seeds, origin, wall_origin):
+        loop = asyncio.get_running_loop()
+        producers = [self.producer_factory(i + 1) for i in indices]
+        opened = []
+        try:
+            for producer in producers:
+                if producer is not None:
+                    await asyncio.to_thread(producer.open)
+                    opened.append(producer)
+            batches = self.simulator.batch(indices, seeds).generate_chunks(self.chunk_size)
+            while (chunks := await asyncio.to_thread(next, batches, None)) is not None:
+                timestamps = chunks[0].timestamps
+                position = 0
+                while position < len(timestamps):
+                    if self.stopped.is_set():
+                        return
+                    # The simulated time the wall clock has reached, measured from the fixed origins
+                    simulated_now = origin + (loop.time() - wall_origin) * self.speed_factor * 1e9
+                    due = int(np.searchsorted(timestamps, simulated_now, side='right'))
+                    if due > position:
+                        await asyncio.to_thread(_write, producers, chunks, position, due)
+                        self.points += (due - position) * len(indices)
+                        position = due
+                    else:
+                        await self._sleep_until(
+                            wall_origin + (timestamps[position] - origin) / 1e9 / self.speed_factor)
+        finally:
+            for producer in opened:
+                await asyncio.to_thread(producer.close)
+
+
+def _write(producers, chunks, start, stop):
+    for chunk, producer in zip(chunks, producers):
+        if producer is not None:
+            producer.write(chunk[start:stop])
+
+
+def _running_realtime_simulators():
+    from simulator_api import models
+    return set(models.Simulator.objects.filter(emission_mode='realtime', status='Running')
+               .values_list('id', flat=True))
+
+
+def _load_simulator(simulator_id):
+    from simulator_api import models
+    from simulator_api.serializers import SimulatorSerializer, prefetch_simulators
+    from simulator_api.timeseries.simulator import Simulator
+    simulator = prefetch_simulators(models.Simulator.objects).get(id=simulator_id)
+    return Simulator(json.dumps(SimulatorSerializer(simulator).data))
+
+
+def _finish_simulator(simulator_id, status):
+    from django.utils import timezone
+    from simulator_api import models
+    # Only a simulator still running is finished, a stopped one keeps its status
+    models.Simulator.objects.filter(id=simulator_id, status='Running').update(status=status,
+                                                                              updated_at=timezone.now())
+
+
+async def _run_emitter(simulator_id, emitter):
+    try:
+        await emitter.run()
+        if not emitter.stopped.is_set():
+            await sync_to_async(_finish_simulator)(simulator_id, 'Succeeded')
+        logging.info(f'Real-time simulator {simulator_id} emitted {emitter.points} points')
+    except Exception as e:
+        logging.error(f'Error in real-time simulator {simulator_id}: {str(e)}')
+        await sync_to_async(_finish_simulator)(simulator_id, 'Failed')
+
+
+async def serve_realtime_simulators(poll_interval=5.0, stop_event=None):
+    """
+    Pace every running real-time simulator from one event loop.
+
+    The database is polled every poll_interval seconds: simulators that started running get an
+    emitter, and the emitters of simulators that are no longer running are stopped.
+
+    Args:
+        poll_interval (float): The seconds between two polls of the database.
+        stop_event (asyncio.Event): Stops serving when set, serves forever when None.
+
+    Returns:
+        None
+    """
+    emitters = {}
+    while stop_event is None or not stop_event.is_set():
+        running = await sync_to_async(_running_realtime_simulators)()
+        for simulator_id in running - emitters.keys():
+            try:
+                emitter = PacedEmitter(await sync_to_async(_load_simulator)(simulator_id))
+            except Exception as e:
+                logging.error(f'Error in real-time simulator {simulator_id}: {str(e)}')
+                await sync_to_async(_finish_simulator)(simulator_id, 'Failed')
+                continue
+            emitters[simulator_id] = (emitter, asyncio.create_task(_run_emitter(simulator_id, emitter)))
+        for simulator_id, (emitter, task) in list(emitters.items()):
+            if simulator_id not in running:
+                emitter.stop()
+            if task.done():
+                del emitters[simulator_id]
+        try:
+            await asyncio.wait_for(stop_event.wait() if stop_event else asyncio.Event().wait(), poll_interval)
+        except asyncio.TimeoutError:
+            pass
+
+    for emitter, _ in emitters.values():
+        emitter.stop()
+    await asyncio.gather(*[task for _, task in emitters.values()])
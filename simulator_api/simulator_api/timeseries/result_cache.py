@@ -0,0 +1,207 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+
+# Part of every key, bump it when a change to the generation or the file formats changes the output
+RESULT_CACHE_VERSION = 1
+
+ENTRY_FILE = 'entry.json'
+
+
+def result_key(spec):
+    """
+    Hash a normalized dataset spec into the key of its output.
+
+    Args:
+        spec (dict): Everything the output of the dataset depends on, made of JSON types.
+
+    Returns:
+        str: The hex SHA-256 of the spec.
+    """
+    document = json.dumps({'version': RESULT_CACHE_VERSION, 'spec': spec}, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(document.encode()).hexdigest()
+
+
+def _link(source, destination):
+    """
+    Hardlink source to destination through a temporary path, copying it when the file system cannot link.
+
+    Returns:
+        None
+    """
+    temporary = destination + '.tmp'
+    if os.path.exists(temporary):
+        os.remove(temporary)
+    try:
+        os.link(source, temporary)
+    except OSError:
+        shutil.copyfile(source, temporary)
+    os.replace(temporary, destination)
+
+
+class ResultCache:
+    """
+    A directory of dataset output files keyed by the hash of the spec that generated them, bounded in size.
+
+    A seeded dataset generates the same file every run, so a run finding its key in the cache links
+    the cached file to its output path instead of generating it. Each entry is a directory holding
+    the file and an entry.json with its size and number of points. The modification time of
+    entry.json is the last use of the entry, and the least recently used entries are evicted once
+    the files use more than max_bytes.
+
+    Entries are written to a temporary directory and renamed into place, so the worker processes of
+    concurrent runs can share the cache. The hit, miss and eviction counters are per process.
+
+    Args:
+        root (str): The directory of the cache.
+        max_bytes (int): The size of the files above which the least recently used entries are evicted.
+
+    Methods:
+        get(key, path): Link the cached output of a key to path, returning its number of points.
+        put(key, path, points): Add the output file at path under a key.
+        evict(): Remove the least recently used entries until the files fit in max_bytes.
+        stats(): Get the hit, miss and eviction counters, the hit rate and the size of the cache.
+    """
+
+    def __init__(self, root='result_cache', max_bytes=10 * 1024 ** 3):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def entry_path(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def get(self, key, path):
+        """
+        Link the cached output of a key to path, returning its number of points.
+
+        Args:
+            key (str): The key of the output, see result_key().
+            path (str): The output path of the dataset.
+
+        Returns:
+            int: The number of points of the output, None on a miss.
+        """
+        entry = self.entry_path(key)
+        try:
+            with open(os.path.join(entry, ENTRY_FILE)) as file:
+                metadata = json.load(file)
+            # Marks the entry as used, evicted last
+            os.utime(os.path.join(entry, ENTRY_FILE))
+            _link(os.path.join(entry, metadata['file']), path)
+        except (OSError, ValueError, KeyError):
+            # Not cached, or evicted by another process while being read
+            with self.lock:
+                self.misses += 1
+            return None
+        with self.lock:
+            self.hits += 1
+        return metadata['points']
+
+    def put(self, key, path, points):
+        """
+        Add the output file at path under a key, then evict the least recently used entries.
+
+        Args:
+            key (str): The key of the output, see result_key().
+            path (str): The output file.
+            points (int): The number of points of the output.
+
+        Returns:
+            None
+        """
+        size = os.path.getsize(path)
+        entry = self.entry_path(key)
+        if size > self.max_bytes or os.path.exists(entry):
+            return
+        temporary = f'{entry}.{os.getpid()}.{threading.get_ident()}.tmp'
+        os.makedirs(temporary)
+        name = 'data' + os.path.splitext(path)[1]
+        _link(path, os.path.join(temporary, name))
+        with open(os.path.join(temporary, ENTRY_FILE), 'w') as file:
+            json.dump({'file': name, 'bytes': size, 'points': points}, file)
+        try:
+            os.rename(temporary, entry)
+        except OSError:
+            # Another process added the same output first
+            shutil.rmtree(temporary, ignore_errors=True)
+        self.evict()
+
+    def _entries(self):
+        """
+        List the entries of the cache.
+
+        Returns:
+            list: The last use, size and directory of each entry.
+        """
+        entries = []
+        if not os.path.isdir(self.root):
+            return entries
+        for prefix in os.scandir(self.root):
+            if not prefix.is_dir():
+                continue
+            for entry in os.scandir(prefix.path):
+                if entry.name.endswith('.tmp'):
+                    continue
+                try:
+                    used_at = os.stat(os.path.join(entry.path, ENTRY_FILE)).st_mtime
+                    with open(os.path.join(entry.path, ENTRY_FILE)) as file:
+                        size = json.load(file)['bytes']
+                except (OSError, ValueError, KeyError):
+                    continue
+                entries.append((used_at, size, entry.path))
+        return entries
+
+    def evict(self):
+        """
+        Remove the least recently used entries until the files fit in max_bytes.
+
+        Returns:
+            int: The number of evicted entries.
+        """
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        evicted = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            evicted += 1
+        with self.lock:
+            self.evictions += evicted
+        return evicted
+
+    def stats(self):
+        """
+        Get the hit, miss and eviction counters, the hit rate and the size of the cache.
+
+        Returns:
+            dict: The cache statistics.
+        """
+        entries = self._entries()
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else None,
+                'evictions': self.evictions,
+                'entries': len(entries),
+                'bytes': sum(size for _, size, _ in entries),
+                'max_bytes': self.max_bytes,
+            }
@@ -11,27 +11,39 @@ class Seasonality:
         self.amplitude = seasonality_component.get_amplitude()
         self.phase_shift = seasonality_component.get_phase_shift()
 
+    @staticmethod
     @abstractmethod
-    def calculate(self, dates):
+    def feature(dates):
         pass
 
-
-class DailySeasonalityComponent(Seasonality):
     def calculate(self, dates):
         angular_frequency = 2 * np.pi * self.frequency_multiplier
-        return self.amplitude * np.sin(angular_frequency * (dates.hour / 24) + self.phase_shift)
+        return self.amplitude * np.sin(angular_frequency * self.feature(dates) + self.phase_shift)
+
+
+class DailySeasonalityComponent(Seasonality):
+    @staticmethod
+    def feature(dates):
+        return dates.hour / 24
 
 
 class WeeklySeasonalityComponent(Seasonality):
-    def calculate(self, dates):
-        angular_frequency = 2 * np.pi * self.frequency_multiplier
-        return self.amplitude * np.sin(angular_frequency * (dates.dayofweek / 7) + self.phase_shift)
+    @staticmethod
+    def feature(dates):
+        return dates.dayofweek / 7
 
 
 class MonthlySeasonalityComponent(Seasonality):
-    def calculate(self, dates):
-        angular_frequency = 2 * np.pi * self.frequency_multiplier
-        return self.amplitude * np.sin(angular_frequency * (dates.day / 30) + self.phase_shift)
+    @staticmethod
+    def feature(dates):
+        return dates.day / 30
+
+
+SEASONALITY_TYPES = {
+    'daily': DailySeasonalityComponent,
+    'weekly': WeeklySeasonalityComponent,
+    'monthly': MonthlySeasonalityComponent,
+}
 
 
 def calculate_seasonality(dates, series_type, seasonality_component):
@@ -49,3 +61,45 @@ def calculate_seasonality(dates, series_type, seasonality_component):
         raise ValueError("Unsupported frequency_type")
 
     return pd.Series(component)
+
+
+def calculate_seasonalities(dates, series_type, datasets_seasonality_components):
+    """
+    Calculate the seasonality of several datasets sharing the same dates in one vectorized pass.
+
+    The calendar features are derived once, and every dataset's components are padded to the same
+    count with zero amplitudes, which add nothing (additive) or multiply by one (multiplicative).
+
+    Args:
+        dates (pandas.DatetimeIndex): The dates shared by the datasets.
+        series_type (str): 'additive' or 'multiplicative'.
+        datasets_seasonality_components (list): The seasonality components of each dataset.
+
+    Returns:
+        numpy.ndarray: The seasonality with shape (datasets, dates).
+    """
+    datasets_seasonality_components = [components or [] for components in datasets_seasonality_components]
+    frequency_types = list(SEASONALITY_TYPES)
+    num_components = max((len(components) for components in datasets_seasonality_components), default=0)
+    shape = (len(datasets_seasonality_components), num_components)
+    feature_index, amplitude = np.zeros(shape, dtype=int), np.zeros(shape)
+    frequency_multiplier, phase_shift = np.zeros(shape), np.zeros(shape)
+    for i, components in enumerate(datasets_seasonality_components):
+        for j, seasonality_component in enumerate(components):
+            seasonality = SeasonalityConfigurationManager(seasonality_component)
+            if seasonality.get_frequency_type() not in SEASONALITY_TYPES:
+                raise ValueError("Unsupported frequency_type")
+            feature_index[i, j] = frequency_types.index(seasonality.get_frequency_type())
+            amplitude[i, j] = seasonality.get_amplitude()
+            frequency_multiplier[i, j] = seasonality.get_frequency_multiplier()
+            phase_shift[i, j] = seasonality.get_phase_shift()
+
+    features = np.stack([np.asarray(SEASONALITY_TYPES[frequency_type].feature(dates), dtype=float)
+                         for frequency_type in frequency_types])
+    angular_frequency = 2 * np.pi * frequency_multiplier
+    values = amplitude[..., None] * np.sin(angular_frequency[..., None] * features[feature_index]
+                                           + phase_shift[..., None])
+    if series_type == 'additive':
+        return values.sum(axis=1)
+    return (1 + values).prod(axis=1)
+
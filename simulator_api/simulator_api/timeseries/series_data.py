@@ -0,0 +1,148 @@
+import numpy as np
+import pandas as pd
+
+
+class SeriesData:
+    """
+    A compact columnar container for generated time series data.
+
+    Timestamps are kept as int64 nanoseconds since the epoch (UTC), values as float64 and the anomaly
+    mask packed eight points to a byte. Slicing returns views of the same buffers, and timestamps are
+    only formatted as text when a text sink asks for them.
+
+    Args:
+        timestamps (numpy.ndarray): The int64 epoch nanosecond timestamps.
+        values (numpy.ndarray): The float values, missing values are NaN.
+        packed_anomaly (numpy.ndarray): The anomaly mask packed with numpy.packbits.
+        tz (str): The time zone of the timestamps, None for naive timestamps.
+        bit_offset (int): The position of the first point's anomaly bit in packed_anomaly.
+
+    Attributes:
+        timestamps (numpy.ndarray): The int64 epoch nanosecond timestamps.
+        values (numpy.ndarray): The float values.
+        tz (str): The time zone of the timestamps.
+
+    Methods:
+        from_arrays(date_rng, data, anomaly): Create the data from a date-time index, values and anomaly mask.
+        concatenate(chunks): Join chunks into one SeriesData.
+        anomaly: The unpacked anomaly mask.
+        date_rng(): Get the timestamps as a pandas.DatetimeIndex.
+        format_timestamps(): Format the timestamps as text in one vectorized call.
+        to_frame(): Convert the data to a pandas.DataFrame.
+    """
+
+    def __init__(self, timestamps, values, packed_anomaly, tz=None, bit_offset=0):
+        self.timestamps = timestamps
+        self.values = values
+        self.packed_anomaly = packed_anomaly
+        self.tz = tz
+        self.bit_offset = bit_offset
+
+    @classmethod
+    def from_arrays(cls, date_rng, data, anomaly):
+        """
+        Create the data from a date-time index, values and anomaly mask.
+
+        Args:
+            date_rng (pandas.DatetimeIndex): The date-time index.
+            data (array-like): The values.
+            anomaly (array-like): The boolean anomaly mask.
+
+        Returns:
+            SeriesData: The columnar data.
+        """
+        date_rng = pd.DatetimeIndex(date_rng).as_unit('ns')
+        tz = str(date_rng.tz) if date_rng.tz is not None else None
+        return cls(date_rng.asi8, np.asarray(data, dtype=float), np.packbits(np.asarray(anomaly, dtype=bool)), tz)
+
+    @classmethod
+    def concatenate(cls, chunks):
+        """
+        Join chunks into one SeriesData.
+
+        Args:
+            chunks (iterable): The SeriesData chunks, in time order.
+
+        Returns:
+            SeriesData: The joined data.
+        """
+        chunks = list(chunks)
+        if not chunks:
+            return cls(np.empty(0, dtype=np.int64), np.empty(0), np.empty(0, dtype=np.uint8))
+        return cls(np.concatenate([chunk.timestamps for chunk in chunks]),
+                   np.concatenate([chunk.values for chunk in chunks]),
+                   np.packbits(np.concatenate([chunk.anomaly for chunk in chunks])), chunks[0].tz)
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            raise TypeError("SeriesData only supports slicing")
+        start, stop, step = key.indices(len(self))
+        if step != 1:
+            raise ValueError("SeriesData slices must be contiguous")
+        stop = max(start, stop)
+        first_bit = self.bit_offset + start
+        last_bit = self.bit_offset + stop
+        # Keep the packed bytes that cover the slice, the bit offset locates the first point
+        packed_anomaly = self.packed_anomaly[first_bit // 8:(last_bit + 7) // 8]
+        return SeriesData(self.timestamps[start:stop], self.values[start:stop], packed_anomaly, self.tz,
+                          first_bit % 8)
+
+    @property
+    def anomaly(self):
+        """
+        Get the unpacked anomaly mask.
+
+        Returns:
+            numpy.ndarray: The boolean anomaly mask.
+        """
+        bits = np.unpackbits(self.packed_anomaly, count=self.bit_offset + len(self))
+        return bits[self.bit_offset:].astype(bool)
+
+    def date_rng(self):
+        """
+        Get the timestamps as a pandas.DatetimeIndex.
+
+        Returns:
+            pandas.DatetimeIndex: The date-time index.
+        """
+        date_rng = pd.DatetimeIndex(self.timestamps.view('M8[ns]'))
+        return date_rng.tz_localize('UTC').tz_convert(self.tz) if self.tz is not None else date_rng
+
+    def format_timestamps(self):
+        """
+        Format the timestamps as text in one vectorized call, e.g. '2023-01-01 00:00:00+00:00'.
+
+        Time zone aware timestamps are written in UTC.
+
+        Returns:
+            numpy.ndarray: The formatted timestamps.
+        """
+        if len(self) == 0:
+            return np.empty(0, dtype=str)
+        unit = 's'
+        for candidate, nanoseconds in (('s', 10 ** 9), ('ms', 10 ** 6), ('us', 10 ** 3), ('ns', 1)):
+            unit = candidate
+            if not np.any(self.timestamps % nanoseconds):
+                break
+        text = np.datetime_as_string(self.timestamps.view('M8[ns]'), unit=unit)
+        suffix = '+00:00' if self.tz is not None else ''
+        # Every timestamp has the same width in ISO format
+        width = len(text[0])
+        # Edit the fixed-width characters directly: swap the ISO 'T' for a space and append the UTC offset
+        chars = np.empty((len(text), width + len(suffix)), dtype=np.uint32)
+        chars[:, :width] = text.view(np.uint32).reshape(len(text), -1)[:, :width]
+        chars[:, 10] = ord(' ')
+        chars[:, width:] = [ord(char) for char in suffix]
+        return chars.view(f'U{width + len(suffix)}').ravel()
+
+    def to_frame(self):
+        """
+        Convert the data to a pandas.DataFrame with 'value', 'timestamp' and 'anomaly' columns.
+
+        Returns:
+            pandas.DataFrame: The data.
+        """
+        return pd.DataFrame({'value': self.values, 'timestamp': self.date_rng(), 'anomaly': self.anomaly})
@@ -0,0 +1,164 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from simulator_api.timeseries.series_data import SeriesData
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# The file extension of each producer type that stores its output under 'sample_datasets/'
+STORED_EXTENSIONS = {
+    'csv': '.csv',
+    'parquet': '.parquet',
+    'feather': '.feather',
+}
+
+# Rows parsed at a time from a CSV file, so a short range of a long file does not load all of it
+CSV_CHUNK_SIZE = 100000
+
+
+def to_nanoseconds(timestamp):
+    """
+    Convert a timestamp to int64 nanoseconds since the epoch, naive timestamps being UTC like in the stored output.
+
+    Returns:
+        int: The epoch nanoseconds, or None for None.
+    """
+    if timestamp is None:
+        return None
+    timestamp = pd.Timestamp(timestamp)
+    if timestamp.tz is not None:
+        timestamp = timestamp.tz_convert('UTC').tz_localize(None)
+    return timestamp.as_unit('ns').value
+
+
+def stored_paths(file_name, dataset_number, producer_type):
+    """
+    Get the files holding the stored output of a dataset, the first file followed by its appended parts.
+
+    Args:
+        file_name (str): The base file name, the simulator name.
+        dataset_number (int): The dataset number.
+        producer_type (str): The producer type that wrote the output.
+
+    Returns:
+        list: The paths of the existing files, in write order.
+    """
+    extension = STORED_EXTENSIONS[producer_type]
+    base = 'sample_datasets/' + file_name + str(dataset_number)
+    paths = []
+    path, part = base + extension, 0
+    while os.path.exists(path):
+        paths.append(path)
+        part += 1
+        path = f'{base}-{part}{extension}'
+    return paths
+
+
+def _read_csv(path, start, end):
+    chunks = []
+    for frame in pd.read_csv(path, chunksize=CSV_CHUNK_SIZE):
+        timestamps = pd.to_datetime(frame['timestamp'], format='ISO8601', utc=True)
+        nanoseconds = timestamps.dt.tz_localize(None).values.astype('M8[ns]').view(np.int64)
+        if len(nanoseconds) and start is not None and nanoseconds[-1] < start:
+            continue
+        keep = np.ones(len(frame), dtype=bool)
+        if start is not None:
+            keep &= nanoseconds >= start
+        if end is not None:
+            keep &= nanoseconds <= end
+        # Time zone aware timestamps are written in UTC with their offset
+        tz = 'UTC' if len(frame) and str(frame['timestamp'].iloc[0]).endswith('+00:00') else None
+        chunks.append(SeriesData(nanoseconds[keep], frame['value'].to_numpy(dtype=float)[keep],
+                                 np.packbits(frame['anomaly'].to_numpy(dtype=bool)[keep]), tz))
+        # The points are written in time order, so the rest of the file is past the range
+        if len(nanoseconds) and end is not None and nanoseconds[-1] > end:
+            break
+    return chunks
+
+
+def _table_chunk(table):
+    timestamp_type = table.schema.field('timestamp').type
+    timestamps = table.column('timestamp').cast(pa.int64()).to_numpy(zero_copy_only=False)
+    values = table.column('value').to_numpy(zero_copy_only=False).astype(float)
+    anomaly = table.column('anomaly').to_numpy(zero_copy_only=False).astype(bool)
+    return SeriesData(timestamps, values, np.packbits(anomaly), timestamp_type.tz)
+
+
+def _range_filter(table, start, end):
+    timestamps = table.column('timestamp').cast(pa.int64())
+    mask = None
+    if start is not None:
+        mask = pc.greater_equal(timestamps, start)
+    if end is not None:
+        upper = pc.less_equal(timestamps, end)
+        mask = upper if mask is None else pc.and_(mask, upper)
+    return table if mask is None else table.filter(mask)
+
+
+def _read_parquet(path, start, end):
+    parquet_file = pq.ParquetFile(path)
+    chunks = []
+    for index in range(parquet_file.num_row_groups):
+        # Skip the row groups whose timestamp statistics fall outside the range without reading them
+        statistics = parquet_file.metadata.row_group(index).column(
+            parquet_file.schema_arrow.get_field_index('timestamp')).statistics
+        if statistics is not None and statistics.has_min_max:
+            low, high = to_nanoseconds(statistics.min), to_nanoseconds(statistics.max)
+            if (start is not None and high < start) or (end is not None and low > end):
+                continue
+        chunks.append(_table_chunk(_range_filter(parquet_file.read_row_group(index), start, end)))
+    return chunks
+
+
+def _read_feather(path, start, end):
+    with pa.memory_map(path) as source:
+        table = pa.ipc.open_file(source).read_all()
+    return [_table_chunk(_range_filter(table, start, end))]
+
+
+READERS = {
+    'csv': _read_csv,
+    'parquet': _read_parquet,
+    'feather': _read_feather,
+}
+
+
+def read_series(file_name, dataset_number, producer_type, start=None, end=None):
+    """
+    Read the stored output of a dataset between two timestamps.
+
+    Args:
+        file_name (str): The base file name, the simulator name.
+        dataset_number (int): The dataset number.
+        producer_type (str): 'csv', 'parquet' or 'feather'.
+        start: The first timestamp to read, from the beginning when None.
+        end: The last timestamp to read, to the end when None.
+
+    Raises:
+        ValueError: When the producer type does not store its output.
+        FileNotFoundError: When the dataset has not been generated.
+        ImportError: When reading a parquet or feather file without pyarrow.
+
+    Returns:
+        SeriesData: The points in the range, in time order.
+    """
+    if producer_type not in READERS:
+        raise ValueError(f"The {producer_type} producer does not store its output")
+    if producer_type != 'csv' and pa is None:
+        raise ImportError("The pyarrow package is required for the parquet and feather producers")
+    paths = stored_paths(file_name, dataset_number, producer_type)
+    if not paths:
+        raise FileNotFoundError(f"Dataset {dataset_number} of {file_name} has not been generated")
+    start, end = to_nanoseconds(start), to_nanoseconds(end)
+    chunks = []
+    for path in paths:
+        chunks += READERS[producer_type](path, start, end)
+    return SeriesData.concatenate(chunk for chunk in chunks if len(chunk))
@@ -1,20 +1,41 @@
 import logging
+import multiprocessing
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
 
+import numpy as np
+import pandas as pd
+from django.conf import settings
 from django.db import close_old_connections
+from django.utils import timezone
 
 from simulator_api import models
-from simulator_api.serializers import SimulatorSerializer
-from simulator_api.timeseries.generate_time_series import TimeSeries
-from simulator_api.timeseries.data_producer import DataProducerCSV
-from simulator_api.timeseries.configuration_manager import SimulatorConfigurationManager
+from simulator_api.serializers import SimulatorSerializer, prefetch_simulators
+from simulator_api.timeseries.generate_time_series import TimeSeries, BatchTimeSeries, DEFAULT_CHUNK_SIZE, \
+    group_by_frequency
+from simulator_api.timeseries.data_producer import DataProducerCSV, DataProducerParquet, DataProducerFeather, \
+    DataProducerKafka, DataProducerStore
+from simulator_api.timeseries.chunk_store import new_run_id
+from simulator_api.timeseries.calendar_features import calendar_cache
+from simulator_api.timeseries.progress import ProgressReporter
+from simulator_api.timeseries.cancellation import CancelToken
+from simulator_api.timeseries.result_cache import ResultCache, result_key
+from simulator_api.timeseries.configuration_manager import SimulatorConfigurationManager, \
+    DatasetConfigurationManager
 import requests
 import simplejson
 import json
 
+# The producers writing one file per dataset, whose output the result cache can hold
+CACHED_PRODUCER_TYPES = ('csv', 'parquet', 'feather')
+
+# The producers whose records cannot be rolled back, so a failed batch is not generated again one by one
+UNRETRIED_PRODUCER_TYPES = ('kafka',)
+
 
 class Simulator:
-    def __init__(self, simulator_data):
+    def __init__(self, simulator_data, chunk_size=DEFAULT_CHUNK_SIZE):
         simulator_data = json.loads(simulator_data)
         simulator = SimulatorConfigurationManager(simulator_data)
         self.start_date = simulator.get_start_date()
@@ -24,34 +45,511 @@ class Simulator:
         self.datasets = simulator.get_datasets()
         self.producer_type = simulator.get_producer_type()
         self.file_name = simulator.get_name()
+        self.simulator_id = simulator.get_id()
+        self.emission_mode = simulator.get_emission_mode()
+        self.speed_factor = simulator.get_speed_factor()
+        self.chunk_size = chunk_size
+        self.run_id = None
+        # The ProgressReporter counting the points of the run, no progress is reported when None
+        self.progress = None
+        # The CancelToken checked between chunks, the run cannot be stopped when None
+        self.cancel = None
+        # The ResultCache seeded datasets are reused from, every dataset is generated when None
+        self.result_cache = None
+
+    def _seeds(self, entropy=None):
+        """
+        Get the seed of every dataset, spawning an independent stream for datasets without a stored seed.
+
+        Args:
+            entropy (int): The entropy of the run, fresh entropy is drawn when None.
+
+        Returns:
+            tuple: The entropy of the run and the seed of each dataset.
+        """
+        seed_sequence = np.random.SeedSequence(entropy)
+        children = seed_sequence.spawn(len(self.datasets))
+        seeds = []
+        for dataset, child in zip(self.datasets, children):
+            seed = DatasetConfigurationManager(dataset).get_seed()
+            seeds.append(seed if seed is not None else child)
+        return seed_sequence.entropy, seeds
 
-    def generate_data(self):
+    def _tasks(self, workers, checkpoints=None):
+        """
+        Split the datasets into tasks, each a batch of datasets sharing a frequency and checkpoint position.
+
+        Returns:
+            list: The positions of the datasets of each task.
+        """
+        groups = {}
+        for frequency, indices in group_by_frequency(self.datasets).items():
+            for i in indices:
+                position = checkpoints[i].get('position', 0) if checkpoints is not None else 0
+                groups.setdefault((frequency, position), []).append(i)
+        tasks = []
+        # Datasets sharing a frequency are generated together as one batch, split over the workers
+        for indices in groups.values():
+            for shard in np.array_split(indices, min(workers, len(indices))):
+                tasks.append([int(i) for i in shard])
+        return tasks
+
+    def generate_data(self, workers=1, entropy=None, checkpoints=None, until=None, run_id=None):
         """
         Generate the time series data based on seasonality and trend components.
 
+        The datasets are fanned out to a pool of worker processes when more than one worker is allowed.
+        Each dataset draws from its own seed or SeedSequence stream, so the output does not depend on
+        the number of workers.
+
+        With checkpoints, each dataset only generates the points after its checkpoint and up to until,
+        and appends them to the output of the previous runs. This is how incremental runs move forward
+        and how a stopped run is resumed.
+
+        Args:
+            workers (int): The maximum number of worker processes.
+            entropy (int): The entropy of the run, pass a previous run's entropy to reproduce it.
+            checkpoints (list): The checkpoint dict of each dataset, empty for a dataset never generated.
+            until: The last timestamp an incremental run generates, defaults to the end of the series.
+            run_id (str): The ID the run is stored under by the store producer, a new one when None.
+
+        Returns:
+            dict: The entropy, run ID and number of workers of the run, and the wall time and error of
+                each dataset, with its updated checkpoint when given checkpoints and whether it was
+                cancelled when the run was stopped.
+        """
+        self.run_id = run_id or new_run_id()
+        entropy, seeds = self._seeds(entropy)
+        tasks = self._tasks(workers, checkpoints)
+        workers = max(1, min(workers, len(tasks)))
+        results = []
+        if workers > 1:
+            shared = [reporter for reporter in (self.progress, self.cancel) if reporter is not None]
+            manager = multiprocessing.Manager() if shared else None
+            if self.progress is not None:
+                # The workers get a copy of the reporter queuing their counts, saved here while waiting for them
+                self.progress.queue = manager.Queue()
+            if self.cancel is not None:
+                # The workers only read the event, set here when polling finds the simulator stopped
+                self.cancel.event = manager.Event()
+            try:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    futures = [(task, executor.submit(generate_datasets, self, task, [seeds[i] for i in task],
+                                                      self._task_checkpoints(task, checkpoints), until))
+                               for task in tasks]
+                    pending = {future for _, future in futures}
+                    timeout = max(min(reporter.interval for reporter in shared), 0.05) if shared else None
+                    while pending:
+                        _, pending = wait(pending, timeout=timeout)
+                        if self.progress is not None:
+                            self.progress.drain()
+                        if self.cancel is not None and pending:
+                            self.cancel.poll()
+                    for task, future in futures:
+                        try:
+                            results += future.result()
+                        except Exception as e:
+                            # The worker itself failed, so every dataset of the task is reported as failed
+                            results += [{'dataset': i + 1, 'wall_time': None, 'error': str(e)} for i in task]
+            finally:
+                if self.progress is not None:
+                    self.progress.queue = None
+                if self.cancel is not None:
+                    self.cancel.event = None
+                if manager is not None:
+                    manager.shutdown()
+        else:
+            for task in tasks:
+                results += generate_datasets(self, task, [seeds[i] for i in task],
+                                             self._task_checkpoints(task, checkpoints), until)
+
+        run_info = {
+            'entropy': str(entropy),
+            'run_id': self.run_id,
+            'workers': workers,
+            'datasets': sorted(results, key=lambda result: result['dataset']),
+        }
+        if self.result_cache is not None:
+            # Counted from the results, the counters of the cache only see the lookups of this process
+            lookups = [result['cached'] for result in results if 'cached' in result]
+            run_info['result_cache'] = {'hits': sum(lookups), 'misses': len(lookups) - sum(lookups),
+                                        'hit_rate': sum(lookups) / len(lookups) if lookups else None}
+        return run_info
+
+    def _result_key(self, i):
+        """
+        Get the result cache key of a dataset, from the normalized spec its output depends on.
+
+        Returns:
+            str: The key, None when the output cannot be cached: without a seed or an output file.
+        """
+        dataset = DatasetConfigurationManager(self.datasets[i])
+        if dataset.get_seed() is None or self.producer_type not in CACHED_PRODUCER_TYPES:
+            return None
+        return result_key({
+            'producer_type': self.producer_type,
+            # The missing values and outliers are drawn chunk by chunk, so the chunk size changes the output
+            'chunk_size': self.chunk_size,
+            'start_date': pd.Timestamp(self.start_date).isoformat(),
+            'end_date': pd.Timestamp(self.end_date).isoformat() if self.end_date else None,
+            'data_size': self.data_size,
+            'series_type': self.series_type,
+            'frequency': pd.tseries.frequencies.to_offset(dataset.get_frequency()).freqstr,
+            'trend_coefficient': [float(coefficient) for coefficient in dataset.get_trend_coefficient()],
+            'cycle_amplitude': float(dataset.get_cycle_amplitude()),
+            'cycle_frequency': float(dataset.get_cycle_frequency()),
+            'seasonality_components': [{
+                'frequency_type': component['frequency_type'],
+                'amplitude': float(component['amplitude']),
+                'phase_shift': float(component['phase_shift']),
+                'frequency_multiplier': float(component['frequency_multiplier']),
+            } for component in dataset.get_seasonality_components()],
+            'noise_level': float(dataset.get_noise_level()),
+            'noise_type': dataset.get_noise_type(),
+            'missing_percentage': float(dataset.get_missing_percentage()),
+            'outlier_percentage': float(dataset.get_outlier_percentage()),
+            'seed': int(dataset.get_seed()),
+        })
+
+    def _cacheable(self, checkpoints=None, until=None):
+        # An incremental or resumed run appends to earlier output, only a fresh run makes a whole file
+        return self.result_cache is not None and until is None and \
+            not (checkpoints and any(checkpoint.get('position') for checkpoint in checkpoints))
+
+    def link_cached(self, indices, checkpoints=None, until=None):
+        """
+        Link the cached output of the datasets of a batch to their output paths.
+
+        Args:
+            indices (list): The positions of the datasets in the simulator.
+            checkpoints (list): The checkpoint dict of each dataset to resume from.
+            until: The last timestamp an incremental run generates.
+
         Returns:
-            pandas.DataFrame: The generated time series data.
+            dict: Whether the output of each dataset that can be cached was found, by position.
         """
+        if not self._cacheable(checkpoints, until):
+            return {}
+        cached = {}
+        for i in indices:
+            key = self._result_key(i)
+            if key is None:
+                continue
+            points = self.result_cache.get(key, self._producer(i + 1).output_path())
+            cached[i] = points is not None
+            if points is not None and self.progress is not None:
+                self.progress.add(i + 1, written=points)
+        return cached
 
-        for i, dataset in enumerate(self.datasets):
-            date_time_series, data, anomaly_mask = TimeSeries(self.start_date, self.end_date, self.series_type,
-                                                              self.data_size, dataset).generate_data()
-            if self.producer_type == 'csv':
-                DataProducerCSV(data=data, date_rng=date_time_series, anomaly=anomaly_mask, file_name=self.file_name,
-                                dataset_number=i + 1).save()
+    @staticmethod
+    def _task_checkpoints(task, checkpoints):
+        return [checkpoints[i] for i in task] if checkpoints is not None else None
 
-            data_list = []
-            for i in range(len(date_time_series)):
-                date_time_string = date_time_series[i].strftime("%Y-%m-%d %H:%M:%S")
-                item = {
-                    "date_time_series": date_time_string,
-                    "data": data[i],
-                    "anomaly_mask": bool(anomaly_mask[i])
-                }
-                data_list.append(item)
+    def _producer(self, dataset_number, append=False):
+        """
+        Create the producer configured for the simulator.
+
+        Args:
+            dataset_number (int): The dataset number.
+            append (bool): Whether to add to the output of a previous run instead of replacing it.
+
+        Returns:
+            DataProducer: The producer for the dataset, or None when the producer type is not supported.
+        """
+        if self.producer_type == 'csv':
+            return DataProducerCSV(file_name=self.file_name, dataset_number=dataset_number, append=append)
+        if self.producer_type == 'parquet':
+            return DataProducerParquet(file_name=self.file_name, dataset_number=dataset_number, append=append)
+        if self.producer_type == 'feather':
+            return DataProducerFeather(file_name=self.file_name, dataset_number=dataset_number, append=append)
+        if self.producer_type == 'store':
+            dataset_id = self.datasets[dataset_number - 1].get('id')
+            return DataProducerStore(file_name=self.file_name, dataset_number=dataset_number,
+                                     simulator_id=self.simulator_id, dataset_id=dataset_id, run_id=self.run_id,
+                                     append=append, **settings.SIMULATOR_STORE)
+        if self.producer_type == 'kafka':
+            return DataProducerKafka(file_name=self.file_name, dataset_number=dataset_number,
+                                     simulator_id=self.simulator_id, **settings.SIMULATOR_KAFKA)
+        return None
 
+    def batch(self, indices, seeds=None):
+        """
+        Create the batch generating datasets that share a frequency.
 
+        Args:
+            indices (list): The positions of the datasets in the simulator.
+            seeds (list): The seed or numpy.random.SeedSequence of each dataset, defaults to the stored seeds.
 
+        Returns:
+            BatchTimeSeries: The batch of the datasets.
+        """
+        time_series = [TimeSeries(self.start_date, self.end_date, self.series_type, self.data_size,
+                                  self.datasets[i]) for i in indices]
+        for series, seed in zip(time_series, seeds or []):
+            series.seed = seed
+        return BatchTimeSeries(time_series)
+
+    def generate_batch(self, indices, seeds=None, checkpoints=None, until=None, wall_times=None):
+        """
+        Generate datasets sharing a frequency in one vectorized pass and stream each into its producer.
+
+        When the run is stopped, the batch ends after the chunk being written: the producers are closed
+        so the output holds every chunk written so far, and the checkpoints are moved to the last of them.
+
+        The wall time of a dataset is the time spent on its producer, plus an even share of the time
+        spent generating the chunks of all the datasets together.
+
+        Args:
+            indices (list): The positions of the datasets in the simulator.
+            seeds (list): The seed or numpy.random.SeedSequence of each dataset, defaults to the stored seeds.
+            checkpoints (list): The checkpoint dict of each dataset to resume from, updated in place.
+            until: The last timestamp an incremental run generates.
+            wall_times (list): The wall time of each dataset in seconds, added to in place.
+
+        Returns:
+            bool: Whether the batch was generated to the end, False when the run was stopped.
+        """
+        if self.cancel is not None and self.cancel.cancelled():
+            return False
+        wall_times = wall_times if wall_times is not None else [0.0] * len(indices)
+        shared_since = time.perf_counter()
+        append = checkpoints is not None and any(checkpoint.get('position') for checkpoint in checkpoints)
+        producers = [self._producer(i + 1, append) for i in indices]
+        if all(producer is None for producer in producers):
+            return True
+        cacheable = self._cacheable(checkpoints, until)
+        batch = self.batch(indices, seeds)
+        # Generate against copies, so a failed run leaves the checkpoints where they were
+        working = [dict(checkpoint) for checkpoint in checkpoints] if checkpoints is not None else None
+        opened = []
+        failed = True
+        completed = True
+        points = [0] * len(indices)
+
+        def share(since):
+            # Work done for every dataset together is split evenly between them
+            elapsed = (time.perf_counter() - since) / len(indices)
+            for position in range(len(indices)):
+                wall_times[position] += elapsed
+
+        try:
+            for position, producer in enumerate(producers):
+                if producer is not None:
+                    began = time.perf_counter()
+                    producer.open()
+                    opened.append(producer)
+                    wall_times[position] += time.perf_counter() - began
+            share(shared_since)
+            shared_since = time.perf_counter()
+            # Stream the series chunk by chunk so memory stays flat for long runs
+            for chunks in batch.generate_chunks(self.chunk_size, working, until):
+                share(shared_since)
+                for position, (i, chunk, producer) in enumerate(zip(indices, chunks, producers)):
+                    began = time.perf_counter()
+                    points[position] += len(chunk)
+                    if self.progress is not None:
+                        self.progress.add(i + 1, generated=len(chunk))
+                    if producer is not None:
+                        producer.write(chunk)
+                        if self.progress is not None:
+                            self.progress.add(i + 1, written=len(chunk))
+                    wall_times[position] += time.perf_counter() - began
+                if self.cancel is not None and self.cancel.cancelled():
+                    completed = False
+                    break
+                shared_since = time.perf_counter()
+            failed = False
+        finally:
+            for position, producer in enumerate(producers):
+                if producer not in opened:
+                    continue
+                began = time.perf_counter()
+                # A failed batch never publishes its partial files over the previous output
+                if failed:
+                    producer.abort()
+                else:
+                    producer.close()
+                wall_times[position] += time.perf_counter() - began
+            if self.progress is not None:
+                self.progress.flush()
+        if checkpoints is not None:
+            for checkpoint, updated in zip(checkpoints, working):
+                checkpoint.update(updated)
+        if cacheable and completed:
+            for i, producer, count in zip(indices, producers, points):
+                key = self._result_key(i)
+                if producer is not None and key is not None:
+                    self.result_cache.put(key, producer.output_path(), count)
+        return completed
+
+
+def generate_datasets(simulator, indices, seeds, checkpoints=None, until=None):
+    """
+    Generate a batch of datasets, the unit of work of the worker processes.
+
+    The datasets found in the result cache are linked from it, and only the others are generated.
+
+    Args:
+        simulator (Simulator): The simulator the datasets belong to.
+        indices (list): The positions of the datasets in the simulator.
+        seeds (list): The seed or numpy.random.SeedSequence of each dataset.
+        checkpoints (list): The checkpoint dict of each dataset to resume from.
+        until: The last timestamp an incremental run generates.
+
+    Returns:
+        list: The dataset number, wall time and error of each dataset, its updated checkpoint when
+            given checkpoints, whether it was cancelled when the run was stopped and whether it was
+            found in the result cache when it can be cached.
+    """
+    cached, wall_times = {}, {}
+    for i in indices:
+        start = time.perf_counter()
+        cached.update(simulator.link_cached([i], checkpoints, until))
+        wall_times[i] = time.perf_counter() - start
+    results = [{'dataset': i + 1, 'wall_time': wall_times[i], 'error': None} for i in indices if cached.get(i)]
+    rest = [position for position, i in enumerate(indices) if not cached.get(i)]
+    if rest:
+        results += _generate_datasets(simulator, [indices[position] for position in rest],
+                                      [seeds[position] for position in rest],
+                                      [checkpoints[position] for position in rest] if checkpoints is not None
+                                      else None, until)
+    for result in results:
+        if result['dataset'] - 1 in cached:
+            result['cached'] = cached[result['dataset'] - 1]
+    return results
+
+
+def _generate_datasets(simulator, indices, seeds, checkpoints=None, until=None):
+    """
+    Generate a batch of datasets.
+
+    When the batch fails, its datasets are generated again one by one, so each failure is
+    reported against the dataset that caused it. A kafka batch is not, as the records it sent
+    would be sent twice, and its error is reported against every dataset.
+
+    Args:
+        simulator (Simulator): The simulator the datasets belong to.
+        indices (list): The positions of the datasets in the simulator.
+        seeds (list): The seed or numpy.random.SeedSequence of each dataset.
+        checkpoints (list): The checkpoint dict of each dataset to resume from.
+        until: The last timestamp an incremental run generates.
+
+    Returns:
+        list: The dataset number, wall time and error of each dataset, its updated checkpoint when
+            given checkpoints and whether it was cancelled when the run was stopped.
+    """
+    start = time.perf_counter()
+    wall_times = [0.0] * len(indices)
+    try:
+        completed = simulator.generate_batch(indices, seeds, checkpoints, until, wall_times)
+    except Exception as e:
+        if len(indices) == 1 or simulator.producer_type in UNRETRIED_PRODUCER_TYPES:
+            wall_time = (time.perf_counter() - start) / len(indices)
+            return [{'dataset': i + 1, 'wall_time': wall_time, 'error': str(e)} for i in indices]
+        results = []
+        for position, (i, seed) in enumerate(zip(indices, seeds)):
+            results += _generate_datasets(simulator, [i], [seed],
+                                          [checkpoints[position]] if checkpoints is not None else None, until)
+        return results
+    results = [{'dataset': i + 1, 'wall_time': wall_time, 'error': None} for i, wall_time in zip(indices, wall_times)]
+    if not completed:
+        for result in results:
+            result['cancelled'] = True
+    if checkpoints is not None:
+        # Worker processes work on copies, so the updated checkpoints travel back with the results
+        for result, checkpoint in zip(results, checkpoints):
+            result['checkpoint'] = checkpoint
+    return results
+
+
+def load_checkpoints(datasets):
+    """
+    Load the checkpoint of each dataset for an incremental run.
+
+    Args:
+        datasets (list): The dataset configurations, with their 'id'.
+
+    Returns:
+        list: The checkpoint dict of each dataset, empty for a dataset never generated.
+    """
+    stored = {checkpoint.dataset_id_id: checkpoint for checkpoint in
+              models.DatasetCheckpoint.objects.filter(dataset_id__in=[dataset.get('id') for dataset in datasets])}
+    checkpoints = []
+    for dataset in datasets:
+        checkpoint = stored.get(dataset.get('id'))
+        checkpoints.append({} if checkpoint is None else {
+            'position': checkpoint.position,
+            'last_timestamp': checkpoint.last_timestamp.isoformat(),
+            'rng_state': checkpoint.rng_state,
+            'low': checkpoint.component_min,
+            'high': checkpoint.component_max,
+        })
+    return checkpoints
+
+
+def save_checkpoints(datasets, results):
+    """
+    Save the checkpoints a run moved forward, taking them out of the run results.
+
+    Args:
+        datasets (list): The dataset configurations, with their 'id'.
+        results (list): The result of each dataset, as returned by Simulator.generate_data().
+
+    Returns:
+        None
+    """
+    for result in results:
+        checkpoint = result.pop('checkpoint', None)
+        if not checkpoint:
+            continue
+        models.DatasetCheckpoint.objects.update_or_create(
+            dataset_id_id=datasets[result['dataset'] - 1]['id'],
+            defaults={
+                'position': checkpoint['position'],
+                'last_timestamp': checkpoint['last_timestamp'],
+                'rng_state': checkpoint['rng_state'],
+                'component_min': checkpoint['low'],
+                'component_max': checkpoint['high'],
+            })
+
+
+def discard_checkpoints(datasets, results):
+    """
+    Delete the checkpoints of datasets a batch run generated to the end, taking them out of the run results.
+
+    The next batch run then starts over instead of resuming.
+
+    Args:
+        datasets (list): The dataset configurations, with their 'id'.
+        results (list): The result of each dataset, as returned by Simulator.generate_data().
+
+    Returns:
+        None
+    """
+    for result in results:
+        result.pop('checkpoint', None)
+    models.DatasetCheckpoint.objects.filter(dataset_id__in=[dataset.get('id') for dataset in datasets]).delete()
+
+
+def scheduled_simulator_ids(days):
+    """
+    Get the simulators a daily schedule runs on a day, those whose interval of days divides the day.
+
+    The intervals due on the day are found first, so the simulators are fetched in two queries
+    whatever their number. Running and real-time simulators are left out. A stopped simulator stays
+    scheduled, and its next scheduled run resumes it from its checkpoints.
+
+    Args:
+        days (int): The number of days since the schedule started.
+
+    Returns:
+        list: The IDs of the due simulators.
+    """
+    intervals = models.Simulator.objects.filter(interval__gte=1).order_by('interval') \
+        .values_list('interval', flat=True).distinct()
+    due = [interval for interval in intervals if days % interval == 0]
+    return list(models.Simulator.objects.filter(interval__in=due).exclude(status='Running')
+                .exclude(emission_mode='realtime').order_by('id').values_list('id', flat=True))
 
 
 def simulate_simulator(simulator_id):
@@ -68,22 +566,73 @@ def simulate_simulator(simulator_id):
         None
     """
     logging.basicConfig(filename=f'simulate_simulator_{simulator_id}.log', level=logging.INFO)
+    run_simulator(simulator_id)
+
+
+def run_simulator(simulator_id):
+    """
+    Generate the data of a simulator and record the outcome of the run, in an already set up Django process.
+
+    Setting the status of the simulator to 'Stopped' ends the run after the chunk being written, keeping
+    the output written so far. The checkpoints of the datasets are saved, so the next run resumes from
+    them instead of generating the series again.
+
+    Args:
+        simulator_id: The ID of the simulator to run.
+
+    Returns:
+        str: The status the run ended with, 'Succeeded', 'Failed' or 'Stopped'.
+    """
     try:
         logging.info(f'Starting simulation for simulator {simulator_id}')
         close_old_connections()
         # Simulate some background process here
-        simulator = models.Simulator.objects.get(id=simulator_id)
+        simulator = prefetch_simulators(models.Simulator.objects).get(id=simulator_id)
         # convert to json
         #close_old_connections()
         simulator_json = json.dumps(SimulatorSerializer(simulator).data)
-        Simulator(simulator_json).generate_data()
+        time_series_simulator = Simulator(simulator_json)
+        time_series_simulator.progress = ProgressReporter(simulator_id, settings.SIMULATOR_PROGRESS_INTERVAL)
+        time_series_simulator.progress.start()
+        time_series_simulator.cancel = CancelToken(simulator_id, settings.SIMULATOR_CANCEL_INTERVAL)
+        if settings.SIMULATOR_RESULT_CACHE['max_bytes']:
+            time_series_simulator.result_cache = ResultCache(**settings.SIMULATOR_RESULT_CACHE)
+        incremental = simulator.emission_mode == 'incremental'
+        previous = (simulator.run_info or {}).get('datasets', [])
+        # A stopped run left checkpoints behind, so the next batch run resumes from them like an incremental one
+        if incremental or any(result.get('cancelled') for result in previous):
+            checkpoints = load_checkpoints(time_series_simulator.datasets)
+        else:
+            checkpoints = [{} for _ in time_series_simulator.datasets]
+        # An incremental run only generates the points since the previous run and appends them
+        run_info = time_series_simulator.generate_data(workers=settings.SIMULATOR_WORKERS, checkpoints=checkpoints,
+                                                       until=timezone.now() if incremental else None)
+        stopped = any(result.get('cancelled') for result in run_info['datasets'])
+        close_old_connections()
+        if incremental or stopped:
+            save_checkpoints(time_series_simulator.datasets, run_info['datasets'])
+        else:
+            discard_checkpoints(time_series_simulator.datasets, run_info['datasets'])
 
-        logging.info(f'Simulation completed for simulator {simulator_id}')
+        close_old_connections()
+        time_series_simulator.progress.finish()
+        failures = [result for result in run_info['datasets'] if result['error']]
+        for failure in failures:
+            logging.error(f'Error in dataset {failure["dataset"]} of simulator {simulator_id}: {failure["error"]}')
+        if stopped:
+            logging.info(f'Simulation stopped for simulator {simulator_id}, the next run resumes it')
+        else:
+            logging.info(f'Simulation completed for simulator {simulator_id} with {run_info["workers"]} workers')
+        logging.info(f'Calendar cache: {calendar_cache.stats()}')
+        if 'result_cache' in run_info:
+            logging.info(f'Result cache: {run_info["result_cache"]}')
 
         # Update the simulator status when the task is completed
         close_old_connections()
-        simulator.status = 'Succeeded'
+        simulator.run_info = run_info
+        simulator.status = 'Failed' if failures else 'Stopped' if stopped else 'Succeeded'
         simulator.save()
+        return simulator.status
 
     except Exception as e:
         # Update the simulator status when the task is completed
@@ -92,3 +641,4 @@ def simulate_simulator(simulator_id):
         simulator.status = 'Failed'
         simulator.save()
         logging.error(f'Error in simulation for simulator {simulator_id}: {str(e)}')
+        return 'Failed'
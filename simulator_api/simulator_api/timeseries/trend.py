@@ -14,16 +14,18 @@ class Trend:
         data_size (int): The number of days in the time series data.
         trend_coefficients (list): Coefficients for trend components (default is [0, 0, 0]).
         series_type (str): The data type configuration from the ConfigurationManager ('additive' or 'multiplicative').
+        start (int): The position of the first point in the whole series (default is 0).
 
     Methods:
         component(): Calculate the trend component for the given time series data.
     """
 
-    def __init__(self,data_size ,series_type, trend_coefficients : list):
+    def __init__(self,data_size ,series_type, trend_coefficients : list, start=0):
 
         self.data_size = data_size
         self.trend_coefficients = trend_coefficients
         self.data_type = series_type
+        self.start = start
 
     def component(self):
         # return values follow equation trend_coefficient[i] * x^2 +trend_cofficient[i+1] *x +trend coefficient[1]
@@ -35,6 +37,35 @@ class Trend:
             power = len(self.trend_coefficients) - 1 - i  # Calculate the exponent
 
             # Calculate the trend values for each data point
-            component += coefficient * (np.arange(self.data_size) ** power)
+            component += coefficient * (np.arange(self.start, self.start + self.data_size) ** power)
 
         return pd.Series(component)
+
+
+def calculate_trends(data_size, series_type, datasets_trend_coefficients, start=0):
+    """
+    Calculate the trend of several datasets in one vectorized pass.
+
+    Each power is added elementwise, so a dataset's trend does not depend on the other datasets in the batch.
+
+    Args:
+        data_size (int): The number of points.
+        series_type (str): 'additive' or 'multiplicative'.
+        datasets_trend_coefficients (list): The trend coefficients of each dataset.
+        start (int): The position of the first point in the whole series.
+
+    Returns:
+        numpy.ndarray: The trend with shape (datasets, data_size).
+    """
+    datasets_trend_coefficients = [trend_coefficients or [] for trend_coefficients in datasets_trend_coefficients]
+    num_powers = max((len(coefficients) for coefficients in datasets_trend_coefficients), default=0)
+    coefficients = np.zeros((len(datasets_trend_coefficients), num_powers))
+    for i, trend_coefficients in enumerate(datasets_trend_coefficients):
+        coefficients[i, :len(trend_coefficients)] = trend_coefficients
+    component = np.zeros((len(datasets_trend_coefficients), data_size)) if series_type == 'additive' \
+        else np.ones((len(datasets_trend_coefficients), data_size))
+    positions = np.arange(start, start + data_size)
+    for power in range(num_powers):
+        component += coefficients[:, power, None] * (positions ** power)
+    return component
+
@@ -1,13 +1,20 @@
 
+from django.conf import settings
 from django.urls import path
-from .views import SimulatorListCreateView,RunSimulatorView,StopSimulatorView
-from graphene_django.views import GraphQLView
+from .views import SimulatorListCreateView,BulkSimulatorCreateView,RunSimulatorView,StopSimulatorView,SimulatorStatusView,SimulatorProgressView,GraphQLMetricsView
+from .graphql_view import CachedGraphQLView, AsyncCachedGraphQLView
 from .schema import schema
+
+GraphQLView = AsyncCachedGraphQLView if settings.GRAPHQL_ASYNC else CachedGraphQLView
 urlpatterns = [
     path('api/simulators/', SimulatorListCreateView.as_view(), name='simulator-list-create'),
+    path('api/simulators/bulk', BulkSimulatorCreateView.as_view(), name='simulator-bulk-create'),
     path('api/run_simulator/<int:simulator_id>', RunSimulatorView.as_view(), name='run-simulator'),
     path('api/stop_simulator/<int:simulator_id>', StopSimulatorView.as_view(), name='stop-simulator'),
-    path("graphql",GraphQLView.as_view(graphiql=True,schema=schema))
+    path('api/simulator_status/<int:simulator_id>', SimulatorStatusView.as_view(), name='simulator-status'),
+    path('api/simulator_progress/<int:simulator_id>', SimulatorProgressView.as_view(), name='simulator-progress'),
+    path("graphql",GraphQLView.as_view(graphiql=True,schema=schema)),
+    path('api/graphql_metrics', GraphQLMetricsView.as_view(), name='graphql-metrics')
     #path('api/datasets/',DatasetListCreateView().as_view(), name="dataset-list-creat"),
     #path('api/seasonality/',SeasonalityListCreateView().as_view(), name="dataset-list-creat")
     # Add other API endpoints if needed
@@ -1,24 +1,104 @@
+import hashlib
+
 from drf_yasg.utils import swagger_auto_schema
-from rest_framework import generics
-from .models import Simulator, Dataset, Seasonality
-from .serializers import SimulatorSerializer, DatasetSerializer, SeasonalitySerializer
+from rest_framework import generics, status
+from rest_framework.response import Response
+from .models import Simulator, Dataset, Seasonality, SimulatorProgress
+from .pagination import OptionalCursorPagination
+from .serializers import SimulatorSerializer, DatasetSerializer, SeasonalitySerializer, prefetch_simulators, \
+    bulk_create_simulators, MAX_BULK_SIMULATORS
+from asgiref.sync import sync_to_async
+from django.db.models import Count, Max
 from django.views import View
-from multiprocessing import Process
+from django.views.decorators.http import condition
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
-import psutil
+from django.utils import timezone
+
+from .timeseries.job_queue import enqueue, cancel_jobs, QueueFull
+from .graphql_view import graphql_metrics
+
+
+def simulators_version(request):
+    """
+    Get the version of the simulator list, from the row count and latest updated_at of every table it nests.
+
+    A save changes the latest updated_at of its table and a delete changes its count, so the version
+    changes whenever the list does. It takes three indexed aggregate queries and is computed once per request.
 
-from .timeseries.simulator import simulate_simulator
+    Args:
+        request: The HTTP request object.
+
+    Returns:
+        tuple: The ETag of the list and its Last-Modified time.
+    """
+    version = getattr(request, 'simulators_version', None)
+    if version is None:
+        states = [model.objects.aggregate(count=Count('id'), updated_at=Max('updated_at'))
+                  for model in (Simulator, Dataset, Seasonality)]
+        key = '|'.join(f"{state['count']}:{state['updated_at'] and state['updated_at'].isoformat()}"
+                       for state in states)
+        # The browsable API and JSON are different representations of the same version
+        key += '|' + request.META.get('HTTP_ACCEPT', '')
+        last_modified = max((state['updated_at'] for state in states if state['updated_at'] is not None),
+                            default=None)
+        version = hashlib.sha256(key.encode('utf-8')).hexdigest()[:32], last_modified
+        request.simulators_version = version
+    return version
 
 
+@method_decorator(name='get', decorator=condition(
+    etag_func=lambda request, *args, **kwargs: simulators_version(request)[0],
+    last_modified_func=lambda request, *args, **kwargs: simulators_version(request)[1]))
 class SimulatorListCreateView(generics.ListCreateAPIView):
     """
     View for listing and creating Simulator objects.
+
+    GET answers with an ETag and a Last-Modified header, and a poll sending them back in If-None-Match
+    or If-Modified-Since gets 304 Not Modified without any row being read or serialized while nothing
+    changed. Pass page_size or cursor to page through the list instead of getting all of it.
+    """
+    queryset = prefetch_simulators(Simulator.objects.all())
+    serializer_class = SimulatorSerializer
+    pagination_class = OptionalCursorPagination
+
+
+class BulkSimulatorCreateView(generics.GenericAPIView):
+    """
+    View for creating many Simulator objects in one request.
     """
-    queryset = Simulator.objects.all()
     serializer_class = SimulatorSerializer
 
+    @swagger_auto_schema(
+        operation_description='Create a list of simulators with their datasets in one transaction',
+        request_body=SimulatorSerializer(many=True),
+        responses={
+            201: SimulatorSerializer(many=True),
+            400: 'The errors of each simulator, nothing is created.',
+        })
+    def post(self, request):
+        """
+        Validate every simulator of the posted list, then create them all or none.
+
+        Args:
+            request: The HTTP request object, its body a list of simulators like the ones posted to
+                SimulatorListCreateView.
+
+        Returns:
+            Response: The created simulators, or the errors of each simulator in posted order.
+        """
+        if not isinstance(request.data, list):
+            return Response({'errors': 'Expected a list of simulators.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(request.data) > MAX_BULK_SIMULATORS:
+            return Response({'errors': f'At most {MAX_BULK_SIMULATORS} simulators can be created at once.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        simulators, errors = bulk_create_simulators(request.data)
+        if any(errors):
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+        created = prefetch_simulators(Simulator.objects.filter(id__in=[simulator.id for simulator in simulators]))
+        return Response(SimulatorSerializer(created.order_by('id'), many=True).data, status=status.HTTP_201_CREATED)
+
 
 class DatasetListCreateView(generics.ListCreateAPIView):
     """
@@ -36,58 +116,73 @@ class SeasonalityListCreateView(generics.ListCreateAPIView):
     serializer_class = SeasonalitySerializer
 
 
+# The views below are async, so under ASGI a request waiting on the database
+# does not hold a worker thread. Blocking calls run in executor threads, never on the event loop.
 @method_decorator(csrf_exempt, name='dispatch')
-@method_decorator(name='post', decorator=swagger_auto_schema(
-    operation_description='Run a simulator process in the background',
-    operation_summary='Run a simulator process in the background',
-    responses={
-        200: 'Simulator is running in the background.',
-        400: 'Simulator is already running.',
-    }
-))
 class RunSimulatorView(View):
     """
-    View for starting and running a simulator process in the background.
+    View for queuing a simulator run for the worker pool of the run_simulator_workers command.
     """
-    def post(self, request, simulator_id):
+    @swagger_auto_schema(
+        operation_description='Queue a simulator run for the background workers, optionally with a priority '
+                              'query parameter, higher priorities being started first',
+        operation_summary='Run a simulator process in the background',
+        responses={
+            200: 'Simulator is running in the background.',
+            400: 'Simulator is already running.',
+            429: 'The queue is full, retry later.',
+        })
+    async def post(self, request, simulator_id):
         """
-        Start a simulator process in the background and update its status.
+        Queue a simulator run and update its status.
 
         Args:
-            request: The HTTP request object.
+            request: The HTTP request object, with an optional integer priority query parameter.
             simulator_id: The ID of the simulator to run.
 
         Returns:
             JsonResponse: JSON response indicating the status of the operation.
         """
         try:
-            simulator = Simulator.objects.get(id=simulator_id)
+            priority = int(request.GET.get('priority', 0))
+        except ValueError:
+            return JsonResponse({'error': 'priority must be an integer.'}, status=400)
+        try:
+            simulator = await Simulator.objects.aget(id=simulator_id)
             if simulator.status == 'Running':
                 return JsonResponse({'message': f'Simulator {simulator_id} is already running.'})
-            # Start the simulator process in the background
-            process = Process(target=simulate_simulator, args=(simulator_id,))
-            process.start()
-
-            # Update the simulator status when the task is completed and add the process_id
-            simulator.process_id = process.pid
-            simulator.status = 'Running'
-            simulator.save()
+            if simulator.emission_mode == 'realtime':
+                # Real-time simulators are paced by the run_realtime_simulators command, which picks up running ones
+                simulator.process_id = None
+                simulator.status = 'Running'
+                await simulator.asave()
+                return JsonResponse({'message': f'Simulator {simulator_id} is running in real time.'})
+            # The simulator is marked running with the job, the worker that picks it up sets the process_id
+            try:
+                job = await sync_to_async(enqueue)(simulator_id, priority)
+            except QueueFull as e:
+                response = JsonResponse({'error': str(e)}, status=429)
+                response['Retry-After'] = '30'
+                return response
 
             # Respond immediately to the user with a JSON response
-            return JsonResponse({'message': f'Simulator {simulator_id} is running in the background.'})
+            return JsonResponse({'message': f'Simulator {simulator_id} is running in the background.',
+                                 'job_id': job.id})
         except Exception as e:
             return JsonResponse({'error': str(e)})
 
 
-
 @method_decorator(csrf_exempt, name='dispatch')
 class StopSimulatorView(View):
     """
-    View for stopping a running simulator process.
+    View for stopping a running simulator.
+
+    The run is not killed: it sees the 'Stopped' status between two chunks, keeps the output written so
+    far and saves checkpoints, so running the simulator again resumes it.
     """
-    def post(self, request, simulator_id):
+    async def post(self, request, simulator_id):
         """
-        Stop a running simulator process by simulator_id.
+        Stop a running simulator by simulator_id.
 
         Args:
             request: The HTTP request object.
@@ -97,14 +192,86 @@ class StopSimulatorView(View):
             JsonResponse: JSON response indicating the status of the operation.
         """
         try:
-            # Find and terminate the simulator process by simulator_id
-            simulator = Simulator.objects.get(id=simulator_id)
+            simulator = await Simulator.objects.aget(id=simulator_id)
             if simulator.status == 'Running':
-                psutil.Process(simulator.process_id).terminate()
-                simulator.status = 'Stopped'
-                simulator.save()
+                # A run still waiting in the queue is simply dropped
+                await sync_to_async(cancel_jobs)(simulator_id)
+                # Only the status is updated, so the run saving its outcome at the same time is not overwritten
+                await Simulator.objects.filter(id=simulator_id, status='Running') \
+                    .aupdate(status='Stopped', updated_at=timezone.now())
                 return JsonResponse({'message': f'Simulator {simulator_id} has been stopped.'})
             else:
                 return JsonResponse({'message': f'Simulator {simulator_id} not Running to be stopped.'})
         except Exception as e:
             return JsonResponse({'error': str(e)})
+
+
+class SimulatorStatusView(View):
+    """
+    View for reading the status of a simulator.
+    """
+    async def get(self, request, simulator_id):
+        """
+        Get the status of a simulator and the results of its last run.
+
+        Args:
+            request: The HTTP request object.
+            simulator_id: The ID of the simulator.
+
+        Returns:
+            JsonResponse: The status, process ID and run info of the simulator.
+        """
+        try:
+            simulator = await Simulator.objects.only('status', 'process_id', 'run_info').aget(id=simulator_id)
+        except Simulator.DoesNotExist:
+            return JsonResponse({'error': f'Simulator {simulator_id} does not exist.'}, status=404)
+        return JsonResponse({'id': simulator.id, 'status': simulator.status, 'process_id': simulator.process_id,
+                             'run_info': simulator.run_info})
+
+
+class SimulatorProgressView(View):
+    """
+    View for reading the progress of the current or last run of a simulator.
+    """
+    async def get(self, request, simulator_id):
+        """
+        Get the points generated and written, the current dataset and the throughput of a simulator's run.
+
+        Args:
+            request: The HTTP request object.
+            simulator_id: The ID of the simulator.
+
+        Returns:
+            JsonResponse: The progress of the run.
+        """
+        try:
+            progress = await SimulatorProgress.objects.aget(simulator_id=simulator_id)
+        except SimulatorProgress.DoesNotExist:
+            return JsonResponse({'error': f'Simulator {simulator_id} has not been run.'}, status=404)
+        return JsonResponse({
+            'id': simulator_id,
+            'points_generated': progress.points_generated,
+            'points_written': progress.points_written,
+            'current_dataset': progress.current_dataset,
+            'points_per_second': progress.points_per_second,
+            'started_at': progress.started_at,
+            'updated_at': progress.updated_at,
+            'finished_at': progress.finished_at,
+        })
+
+
+class GraphQLMetricsView(View):
+    """
+    View for reading the counters of the /graphql endpoint.
+    """
+    def get(self, request):
+        """
+        Get the request, document cache, persisted query and rejection counters of this process.
+
+        Args:
+            request: The HTTP request object.
+
+        Returns:
+            JsonResponse: The counters.
+        """
+        return JsonResponse(graphql_metrics.snapshot())